@@ -1,14 +1,20 @@
 """OlmoOCR 2 method - adapted from clause_extraction/ocr/runner.py."""
 
 import asyncio
+import base64
 import json
 from pathlib import Path
 
 from openai import OpenAI
 from olmocr.pipeline import PageResult, build_page_query
-from olmocr.prompts import PageResponse
+from olmocr.prompts import PageResponse, build_no_anchoring_v4_yaml_prompt
 
 MODEL_NAME = "allenai_olmOCR-2-7B-1025-GGUF"
+TARGET_LONGEST_IMAGE_DIM = 1024
+MAX_TOKENS = 8000
+
+# Optional `pipeline.utils.render_cache.RenderCache`; set by run_experiment.py.
+RENDER_CACHE = None
 
 
 def _parse_response(raw: str) -> PageResponse:
@@ -67,7 +73,10 @@ async def extract_page(pdf_path: str, page: int, base_url: str = "http://localho
         Extracted text as a string.
     """
     client = OpenAI(api_key=api_key, base_url=base_url, timeout=120)
-    query = await build_page_query(pdf_path, page=page, target_longest_image_dim=1024)
+    if RENDER_CACHE is not None:
+        query = await asyncio.to_thread(_build_cached_page_query, pdf_path, page)
+    else:
+        query = await build_page_query(pdf_path, page=page, target_longest_image_dim=TARGET_LONGEST_IMAGE_DIM)
     query["model"] = MODEL_NAME
 
     response = client.chat.completions.create(**query)
@@ -76,6 +85,37 @@ async def extract_page(pdf_path: str, page: int, base_url: str = "http://localho
     return page_response.natural_text
 
 
+def _build_cached_page_query(pdf_path: str, page: int) -> dict:
+    """Build the same query as olmocr's `build_page_query` from a RENDER_CACHE image.
+
+    Pages are rendered with olmocr's pdftoppm renderer at the OCR stage's size,
+    so the cache entries are shared with `pipeline/01_ocr`.
+    """
+    from pipeline.utils.pdf_render import render_page_pdftoppm, renderer_id
+
+    png = RENDER_CACHE.get_or_render(
+        pdf_path,
+        page,
+        TARGET_LONGEST_IMAGE_DIM,
+        lambda: base64.b64decode(render_page_pdftoppm(pdf_path, page, TARGET_LONGEST_IMAGE_DIM)),
+        renderer=renderer_id("pdftoppm"),
+    )
+    image_base64 = base64.b64encode(png).decode("ascii")
+    return {
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": build_no_anchoring_v4_yaml_prompt()},
+                    {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{image_base64}"}},
+                ],
+            }
+        ],
+        "max_tokens": MAX_TOKENS,
+        "temperature": 0.0,
+    }
+
+
 async def extract_document(pdf_path: str, pages: list[int] | None = None, base_url: str = "http://localhost:1234/v1", api_key: str = "lm-studio") -> dict[int, str]:
     """Extract text from specified pages of a PDF.
 
@@ -11,6 +11,7 @@ import itertools
 import json
 import logging
 import random
+import sys
 import time
 from pathlib import Path
 
@@ -21,12 +22,23 @@ logging.getLogger("botocore").setLevel(logging.WARNING)
 
 import jiwer
 
+try:
+    from pipeline.utils.render_cache import RenderCache
+except ModuleNotFoundError:
+    ROOT_DIR = Path(__file__).resolve().parents[3]
+    if str(ROOT_DIR) not in sys.path:
+        sys.path.insert(0, str(ROOT_DIR))
+    from pipeline.utils.render_cache import RenderCache
+
 # Directories
 EXPERIMENT_DIR = Path(__file__).parent
 TEST_PDFS_DIR = EXPERIMENT_DIR / "test_pdfs"
 OUTPUT_DIR = EXPERIMENT_DIR / "output"
 RESULTS_FILE = EXPERIMENT_DIR / "results.csv"
 
+# Shared rendered-page cache handed to methods that render pages themselves.
+_RENDER_CACHE: RenderCache | None = None
+
 
 def _load_method(name: str):
     """Load a method module from its subdirectory, avoiding package name conflicts."""
@@ -34,6 +46,8 @@ def _load_method(name: str):
     spec = importlib.util.spec_from_file_location(f"ocr_methods.{name}", module_path)
     mod = importlib.util.module_from_spec(spec)
     spec.loader.exec_module(mod)
+    if hasattr(mod, "RENDER_CACHE"):
+        mod.RENDER_CACHE = _RENDER_CACHE
     return mod
 
 
@@ -193,8 +207,16 @@ async def main():
                         help="Number of random pages to sample from all PDFs combined (default: all)")
     parser.add_argument("--seed", type=int, default=42, help="Random seed for page sampling")
     parser.add_argument("--clear-cache", action="store_true", help="Clear cached outputs, results, and report before running")
+    parser.add_argument("--render-cache-dir", type=Path, default=None,
+                        help="Reuse rendered page images across runs and methods")
+    parser.add_argument("--render-cache-max-gb", type=float, default=5.0,
+                        help="Size cap for --render-cache-dir")
     args = parser.parse_args()
 
+    global _RENDER_CACHE
+    if args.render_cache_dir is not None:
+        _RENDER_CACHE = RenderCache(args.render_cache_dir, max_bytes=int(args.render_cache_max_gb * 1024**3))
+
     if args.clear_cache:
         import shutil
         for path in [OUTPUT_DIR, RESULTS_FILE, EXPERIMENT_DIR / "report.md"]:
@@ -237,6 +259,9 @@ async def main():
     else:
         print("\nNo results to save.")
 
+    if _RENDER_CACHE is not None:
+        print(f"Render cache: {_RENDER_CACHE.stats()}")
+
 
 if __name__ == "__main__":
     asyncio.run(main())
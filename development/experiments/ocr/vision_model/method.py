@@ -18,10 +18,28 @@ VERSIONS = {
 }
 DEFAULT_VERSION = "gemini-3-flash"
 
+# Optional `pipeline.utils.render_cache.RenderCache`; set by run_experiment.py.
+RENDER_CACHE = None
+
 PROMPT = "Extract all text from this document image exactly as it appears. Preserve the original formatting, line breaks, and structure as closely as possible. Output only the extracted text, nothing else."
 
 
 def _render_page_to_png(pdf_path: str, page: int, dpi: int = 200) -> bytes:
+    """Render a single PDF page to PNG bytes, reusing RENDER_CACHE when set."""
+    if RENDER_CACHE is not None:
+        from pipeline.utils.pdf_render import renderer_id
+
+        return RENDER_CACHE.get_or_render(
+            pdf_path,
+            page,
+            f"{dpi}dpi",
+            lambda: _render_page_uncached(pdf_path, page, dpi),
+            renderer=renderer_id("pdfium"),
+        )
+    return _render_page_uncached(pdf_path, page, dpi)
+
+
+def _render_page_uncached(pdf_path: str, page: int, dpi: int = 200) -> bytes:
     """Render a single PDF page to PNG bytes using pypdfium2."""
     import pypdfium2 as pdfium
 
@@ -0,0 +1,222 @@
+"""Compare page image encodings against the PNG baseline on a live OCR endpoint.
+
+Each sampled page is rendered and OCR'd once per encoding ("png", "jpeg:85",
+"webp:80:gray", ...). Every variant's text is scored against the PNG text with
+CER/WER, and the report gives request bytes per page and the reduction versus
+PNG. Use it to choose `--image-format`/`--image-quality`/`--grayscale` for
+the OCR runner.
+
+    python development/experiments/ocr_throughput/compare_encodings.py \\
+        --input-dir development/experiments/ocr/test_pdfs --n-pages 40 \\
+        --encodings png jpeg:85 jpeg:70 webp:80 jpeg:85:gray
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import jiwer
+from pypdf import PdfReader
+
+try:
+    from pipeline.utils.pdf_render import ImageEncoding, PageRenderPool
+except ModuleNotFoundError:
+    ROOT_DIR = Path(__file__).resolve().parents[3]
+    if str(ROOT_DIR) not in sys.path:
+        sys.path.insert(0, str(ROOT_DIR))
+    from pipeline.utils.pdf_render import ImageEncoding, PageRenderPool
+
+BENCHMARK_DIR = Path(__file__).parent
+REPO_ROOT = BENCHMARK_DIR.parents[2]
+RUNNER_PATH = REPO_ROOT / "pipeline" / "01_ocr" / "runner.py"
+DEFAULT_PDFS_DIR = REPO_ROOT / "development" / "experiments" / "ocr" / "test_pdfs"
+RESULTS_DIR = BENCHMARK_DIR / "results"
+GOOGLE_OPENAI_BASE_URL = "https://generativelanguage.googleapis.com/v1beta/openai/"
+
+
+def _load_runner_module():
+    """Load the OCR runner by path; `01_ocr` is not an importable package name."""
+    spec = importlib.util.spec_from_file_location("ocr_runner", RUNNER_PATH)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def parse_encoding(spec: str) -> ImageEncoding:
+    """Parse "format[:quality][:gray]", e.g. "png", "jpeg:85", "webp:80:gray"."""
+    parts = spec.lower().split(":")
+    fmt = parts[0]
+    quality = 85
+    grayscale = False
+    for part in parts[1:]:
+        if part in ("gray", "grey", "grayscale"):
+            grayscale = True
+        elif part:
+            quality = int(part)
+    return ImageEncoding(fmt, quality, grayscale)
+
+
+def _sample_pages(input_dir: Path, n_pages: int | None, seed: int) -> list[tuple[Path, int]]:
+    pool: list[tuple[Path, int]] = []
+    for pdf_path in sorted(input_dir.glob("*.pdf")):
+        with open(pdf_path, "rb") as f:
+            total = len(PdfReader(f, strict=False).pages)
+        pool.extend((pdf_path, page) for page in range(1, total + 1))
+    if not pool:
+        raise FileNotFoundError(f"No PDFs found in {input_dir}")
+    if n_pages is not None and n_pages < len(pool):
+        pool = random.Random(seed).sample(pool, n_pages)
+    return sorted(pool)
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def compute_metrics(reference: str, hypothesis: str) -> dict[str, float]:
+    reference = _normalize(reference)
+    hypothesis = _normalize(hypothesis)
+    if not reference and not hypothesis:
+        return {"cer": 0.0, "wer": 0.0}
+    if not reference or not hypothesis:
+        return {"cer": 1.0, "wer": 1.0}
+    return {"cer": jiwer.cer(reference, hypothesis), "wer": jiwer.wer(reference, hypothesis)}
+
+
+async def _run_variant(
+    runner_mod,
+    args: argparse.Namespace,
+    api_key: str,
+    encoding: ImageEncoding,
+    pages: list[tuple[Path, int]],
+) -> dict[tuple[str, int], dict]:
+    runner = runner_mod.OCRRunner(
+        base_url=args.base_url,
+        api_key=api_key,
+        model_name=args.model,
+        target_longest_image_dim=args.target_longest_image_dim,
+        workers=args.workers,
+        image_format=encoding.format,
+        image_quality=encoding.quality,
+        grayscale=encoding.grayscale,
+    )
+    runner.render_pool = PageRenderPool(args.render_workers, renderer=runner.renderer)
+    semaphore = asyncio.Semaphore(args.workers)
+    results: dict[tuple[str, int], dict] = {}
+
+    async def one(pdf_path: Path, page: int) -> None:
+        async with semaphore:
+            image_base64, _ = await runner.render_page(str(pdf_path), page)
+            started = time.perf_counter()
+            try:
+                result = await runner.process_page(str(pdf_path), page, image_base64)
+                text = result.response.natural_text or ""
+                error = None
+            except Exception as exc:
+                text, error = "", str(exc)
+            results[(pdf_path.name, page)] = {
+                "bytes": len(image_base64),
+                "latency": time.perf_counter() - started,
+                "text": text,
+                "error": error,
+            }
+
+    try:
+        await asyncio.gather(*(one(pdf_path, page) for pdf_path, page in pages))
+    finally:
+        runner.render_pool.close()
+        await runner.aclose()
+    return results
+
+
+async def run(args: argparse.Namespace) -> dict:
+    api_key = os.environ.get(args.api_key_env, "").strip() or "EMPTY"
+    encodings = [parse_encoding(spec) for spec in args.encodings]
+    if not any(e.is_default for e in encodings):
+        encodings.insert(0, ImageEncoding())
+    baseline = next(e for e in encodings if e.is_default)
+
+    pages = _sample_pages(args.input_dir, args.n_pages, args.seed)
+    print(f"Comparing {len(encodings)} encodings on {len(pages)} pages")
+    runner_mod = _load_runner_module()
+
+    outputs: dict[ImageEncoding, dict] = {}
+    for encoding in encodings:
+        print(f"  OCR'ing with {encoding.describe()} ...")
+        outputs[encoding] = await _run_variant(runner_mod, args, api_key, encoding, pages)
+
+    base = outputs[baseline]
+    base_bytes = statistics.mean(r["bytes"] for r in base.values())
+    summary = []
+    for encoding, results in outputs.items():
+        scored = [
+            compute_metrics(base[key]["text"], result["text"])
+            for key, result in results.items()
+            if result["error"] is None and base[key]["error"] is None
+        ]
+        mean_bytes = statistics.mean(r["bytes"] for r in results.values())
+        summary.append({
+            "encoding": encoding.describe(),
+            "format": encoding.format,
+            "quality": encoding.quality,
+            "grayscale": encoding.grayscale,
+            "mean_request_kb": round(mean_bytes / 1024, 1),
+            "bytes_vs_png": round(mean_bytes / base_bytes, 3) if base_bytes else None,
+            "mean_cer_vs_png": round(statistics.mean(m["cer"] for m in scored), 4) if scored else None,
+            "mean_wer_vs_png": round(statistics.mean(m["wer"] for m in scored), 4) if scored else None,
+            "mean_latency_s": round(statistics.mean(r["latency"] for r in results.values()), 3),
+            "errors": sum(1 for r in results.values() if r["error"] is not None),
+        })
+    return {
+        "model": args.model,
+        "base_url": args.base_url,
+        "pages": [f"{name}:{page}" for name, page in sorted(base)],
+        "summary": summary,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare OCR page image encodings against PNG")
+    parser.add_argument("--input-dir", type=Path, default=DEFAULT_PDFS_DIR)
+    parser.add_argument("--n-pages", type=int, default=40, help="Pages sampled across all PDFs")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--encodings", nargs="+", default=["png", "jpeg:85", "jpeg:70", "webp:80", "jpeg:85:gray"],
+                        help='Encodings as "format[:quality][:gray]"; PNG is always included as the baseline')
+    parser.add_argument("--base-url", default=GOOGLE_OPENAI_BASE_URL,
+                        help="OpenAI-compatible endpoint to OCR against")
+    parser.add_argument("--api-key-env", default="GOOGLE_API_KEY",
+                        help="Environment variable holding the API key")
+    parser.add_argument("--model", default="gemini-2.5-flash")
+    parser.add_argument("--target-longest-image-dim", type=int, default=1288)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--render-workers", type=int, default=4)
+    parser.add_argument("--output", type=Path, default=None,
+                        help="JSON report path (default: results/encodings_<timestamp>.json)")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    output = args.output or RESULTS_DIR / f"encodings_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    print(f"\n{'encoding':<22} {'KB/page':>9} {'vs PNG':>8} {'CER':>8} {'WER':>8} {'errors':>7}")
+    for row in report["summary"]:
+        cer = f"{row['mean_cer_vs_png']:.4f}" if row["mean_cer_vs_png"] is not None else "n/a"
+        wer = f"{row['mean_wer_vs_png']:.4f}" if row["mean_wer_vs_png"] is not None else "n/a"
+        print(
+            f"{row['encoding']:<22} {row['mean_request_kb']:>9.1f} {row['bytes_vs_png']:>8.3f} "
+            f"{cer:>8} {wer:>8} {row['errors']:>7}"
+        )
+    print(f"Report written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""Offline throughput benchmark for the OCR stage.
+
+Starts `stub_server.py` (a fake OpenAI-compatible vision endpoint with a
+configurable latency distribution, error rate and response size), points
+`OCRRunner.process_all` at it over a fixed set of PDFs, and writes a JSON
+report with pages/sec, request latency percentiles, the render / queue-wait /
+inference / write split and peak RSS. Rendering, queueing, caching and output
+writing all run for real, so runner changes can be compared without a GPU.
+
+    python development/experiments/ocr_throughput/run_benchmark.py \\
+        --input-dir development/experiments/ocr/test_pdfs --max-docs 5 \\
+        --workers 64 --latency-median 1.5 --error-rate 0.01
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime, timezone
+from pathlib import Path
+
+try:
+    from pipeline.utils.concurrency import AdaptiveConcurrencyLimiter, percentile
+except ModuleNotFoundError:
+    ROOT_DIR = Path(__file__).resolve().parents[3]
+    if str(ROOT_DIR) not in sys.path:
+        sys.path.insert(0, str(ROOT_DIR))
+    from pipeline.utils.concurrency import AdaptiveConcurrencyLimiter, percentile
+
+BENCHMARK_DIR = Path(__file__).parent
+REPO_ROOT = BENCHMARK_DIR.parents[2]
+RUNNER_PATH = REPO_ROOT / "pipeline" / "01_ocr" / "runner.py"
+DEFAULT_PDFS_DIR = REPO_ROOT / "development" / "experiments" / "ocr" / "test_pdfs"
+RESULTS_DIR = BENCHMARK_DIR / "results"
+
+
+def _load_runner_module():
+    """Load the OCR runner by path; `01_ocr` is not an importable package name."""
+    spec = importlib.util.spec_from_file_location("ocr_runner", RUNNER_PATH)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def _peak_rss_mb(who: int) -> float:
+    # ru_maxrss is reported in KiB on Linux.
+    return resource.getrusage(who).ru_maxrss / 1024
+
+
+def _start_stub(args: argparse.Namespace) -> subprocess.Popen:
+    cmd = [
+        sys.executable, str(BENCHMARK_DIR / "stub_server.py"),
+        "--port", str(args.port),
+        "--latency-median", str(args.latency_median),
+        "--latency-sigma", str(args.latency_sigma),
+        "--max-concurrency", str(args.server_concurrency),
+        "--error-rate", str(args.error_rate),
+        "--truncation-rate", str(args.truncation_rate),
+        "--response-words", str(args.response_words),
+        "--seed", str(args.seed),
+    ]
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Stub server exited: {proc.stderr.read().decode(errors='replace')}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{args.port}/v1/models", timeout=1):
+                return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError("Stub server did not become ready within 30s")
+
+
+def _stub_stats(port: int) -> dict | None:
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/v1/stats", timeout=2) as resp:
+            return json.loads(resp.read())
+    except OSError:
+        return None
+
+
+def _stage_pdfs(input_dir: Path, max_docs: int | None, dest: Path) -> list[Path]:
+    """Symlink the first `max_docs` PDFs (sorted) so every run sees the same set."""
+    pdfs = sorted(input_dir.glob("*.pdf"))
+    if max_docs is not None:
+        pdfs = pdfs[:max_docs]
+    if not pdfs:
+        raise FileNotFoundError(f"No PDFs found in {input_dir}")
+    dest.mkdir(parents=True, exist_ok=True)
+    for pdf in pdfs:
+        (dest / pdf.name).symlink_to(pdf.resolve())
+    return pdfs
+
+
+async def _run(args: argparse.Namespace, work_dir: Path) -> dict:
+    runner_mod = _load_runner_module()
+    request_latencies: list[float] = []
+    request_errors = 0
+
+    class TimedOCRRunner(runner_mod.OCRRunner):
+        async def process_page(self, *a, **kw):
+            nonlocal request_errors
+            started = time.perf_counter()
+            try:
+                return await super().process_page(*a, **kw)
+            except Exception:
+                request_errors += 1
+                raise
+            finally:
+                request_latencies.append(time.perf_counter() - started)
+
+    limiter = None
+    if args.adaptive_concurrency:
+        limiter = AdaptiveConcurrencyLimiter(
+            initial_limit=min(args.initial_workers, args.workers),
+            min_limit=args.min_workers,
+            max_limit=args.workers,
+        )
+    render_cache = None
+    if args.render_cache_dir is not None:
+        from pipeline.utils.render_cache import RenderCache
+
+        render_cache = RenderCache(args.render_cache_dir)
+
+    runner = TimedOCRRunner(
+        base_url=f"http://127.0.0.1:{args.port}/v1",
+        model_name="stub-ocr",
+        workers=args.workers,
+        max_connections=args.max_connections,
+        limiter=limiter,
+        render_workers=args.render_workers,
+        render_prefetch=args.render_prefetch,
+        render_cache=render_cache,
+        text_layer_fast_path=args.text_layer_fast_path,
+        dedup_pages=args.dedup_pages,
+        image_format=args.image_format,
+        image_quality=args.image_quality,
+        grayscale=args.grayscale,
+    )
+    input_dir = work_dir / "pdfs"
+    _stage_pdfs(args.input_dir, args.max_docs, input_dir)
+
+    started = time.perf_counter()
+    try:
+        stats = await runner.process_all(
+            input_dir=input_dir,
+            output_dir=work_dir / "output",
+            cache_file=work_dir / "01_ocr_cache.json",
+        )
+    finally:
+        await runner.aclose()
+    wall = time.perf_counter() - started
+
+    processed = stats.get("processed_pages", 0)
+    return {
+        "wall_seconds": round(wall, 3),
+        "pages_per_second": round(processed / wall, 3) if wall else 0.0,
+        "requests": len(request_latencies),
+        "request_errors": request_errors,
+        "latency_seconds": {
+            "p50": round(percentile(request_latencies, 50) or 0.0, 4),
+            "p95": round(percentile(request_latencies, 95) or 0.0, 4),
+            "p99": round(percentile(request_latencies, 99) or 0.0, 4),
+            "max": round(max(request_latencies, default=0.0), 4),
+        },
+        "time_split_seconds": {
+            "render": round(stats.get("render_seconds", 0.0), 3),
+            "queue_wait": round(stats.get("inference_idle_seconds", 0.0), 3),
+            "inference": round(stats.get("inference_seconds", 0.0), 3),
+            "write": round(stats.get("write_seconds", 0.0), 3),
+        },
+        "runner": stats,
+        "limiter": limiter.snapshot() if limiter is not None else None,
+        "render_cache": render_cache.stats() if render_cache is not None else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline OCR throughput benchmark against a stub endpoint")
+    parser.add_argument("--input-dir", type=Path, default=DEFAULT_PDFS_DIR,
+                        help="Directory of benchmark PDFs")
+    parser.add_argument("--max-docs", type=int, default=None,
+                        help="Use only the first N PDFs (sorted by name)")
+    parser.add_argument("--output", type=Path, default=None,
+                        help="Where to write the JSON report (default: results/<timestamp>_<commit>.json)")
+    parser.add_argument("--label", type=str, default=None,
+                        help="Free-form label stored in the report")
+    parser.add_argument("--port", type=int, default=8190, help="Port for the stub server")
+    # Runner knobs under test.
+    parser.add_argument("--workers", type=int, default=25)
+    parser.add_argument("--max-connections", type=int, default=None)
+    parser.add_argument("--adaptive-concurrency", action="store_true")
+    parser.add_argument("--initial-workers", type=int, default=8)
+    parser.add_argument("--min-workers", type=int, default=1)
+    parser.add_argument("--render-workers", type=int, default=4)
+    parser.add_argument("--render-prefetch", type=int, default=None)
+    parser.add_argument("--render-cache-dir", type=Path, default=None)
+    parser.add_argument("--text-layer-fast-path", action="store_true")
+    parser.add_argument("--dedup-pages", action="store_true")
+    parser.add_argument("--image-format", choices=["png", "jpeg", "webp"], default="png")
+    parser.add_argument("--image-quality", type=int, default=85)
+    parser.add_argument("--grayscale", action="store_true")
+    # Simulated endpoint behaviour.
+    parser.add_argument("--latency-median", type=float, default=1.5)
+    parser.add_argument("--latency-sigma", type=float, default=0.4)
+    parser.add_argument("--server-concurrency", type=int, default=64,
+                        help="Requests the stub serves at once before queueing (0 = unlimited)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--truncation-rate", type=float, default=0.0)
+    parser.add_argument("--response-words", type=int, default=450)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    commit = _git_commit()
+    stub = _start_stub(args)
+    try:
+        with tempfile.TemporaryDirectory(prefix="ocr_bench_") as tmp:
+            metrics = asyncio.run(_run(args, Path(tmp)))
+        metrics["stub_server"] = _stub_stats(args.port)
+    finally:
+        stub.terminate()
+        stub.wait(timeout=10)
+
+    metrics["peak_rss_mb"] = {
+        "runner": round(_peak_rss_mb(resource.RUSAGE_SELF), 1),
+        # Largest single child: render worker processes or the stub server.
+        "largest_child": round(_peak_rss_mb(resource.RUSAGE_CHILDREN), 1),
+    }
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "label": args.label,
+        "config": {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()},
+        "metrics": metrics,
+    }
+
+    output = args.output
+    if output is None:
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output = RESULTS_DIR / f"{stamp}_{commit or 'nogit'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    print(
+        f"\n{metrics['pages_per_second']:.2f} pages/s over {metrics['wall_seconds']:.1f}s | "
+        f"p50={metrics['latency_seconds']['p50']:.2f}s p95={metrics['latency_seconds']['p95']:.2f}s "
+        f"p99={metrics['latency_seconds']['p99']:.2f}s | peak RSS {metrics['peak_rss_mb']['runner']:.0f} MB"
+    )
+    print(f"Report written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""Fake OpenAI-compatible vision endpoint for offline OCR throughput runs.
+
+Answers `POST /v1/chat/completions` with a canned olmOCR-style YAML response
+after a simulated inference delay, and `GET /v1/models` for health checks.
+Nothing is decoded or run: the server only models the timing, failure and
+payload-size behaviour of a real vLLM deployment.
+
+    python development/experiments/ocr_throughput/stub_server.py --port 8100 \\
+        --latency-median 1.5 --latency-sigma 0.4 --error-rate 0.01 --max-concurrency 64
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 429: "Too Many Requests",
+           500: "Internal Server Error", 503: "Service Unavailable"}
+
+WORDS = (
+    "the employer shall pay each employee covered by this agreement at the rate "
+    "set out in schedule a for all hours worked in excess of forty in any week "
+    "grievance arbitration seniority overtime holiday vacation union steward"
+).split()
+
+
+class StubServer:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.slots = asyncio.Semaphore(args.max_concurrency) if args.max_concurrency > 0 else None
+        self.served = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.started = time.time()
+
+    def _latency(self) -> float:
+        mu = math.log(max(self.args.latency_median, 1e-6))
+        latency = self.rng.lognormvariate(mu, self.args.latency_sigma)
+        return min(latency, self.args.latency_max)
+
+    def _completion(self, body: dict) -> dict:
+        n_words = max(1, int(self.rng.gauss(self.args.response_words, self.args.response_words * 0.2)))
+        truncated = self.rng.random() < self.args.truncation_rate
+        text = " ".join(self.rng.choice(WORDS) for _ in range(n_words))
+        content = (
+            "---\nprimary_language: en\nis_rotation_valid: True\nrotation_correction: 0\n"
+            f"is_table: False\nis_diagram: False\n---\n{text}"
+        )
+        prompt_tokens = 1100
+        completion_tokens = int(n_words * 1.3)
+        return {
+            "id": f"chatcmpl-stub-{self.served}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "length" if truncated else "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    async def _chat(self, raw: bytes) -> tuple[int, dict]:
+        try:
+            body = json.loads(raw or b"{}")
+        except json.JSONDecodeError:
+            return 400, {"error": {"message": "invalid JSON body"}}
+
+        self.in_flight += 1
+        try:
+            if self.slots is not None:
+                # Requests beyond the batch size queue here, like a saturated GPU.
+                async with self.slots:
+                    await asyncio.sleep(self._latency())
+            else:
+                await asyncio.sleep(self._latency())
+        finally:
+            self.in_flight -= 1
+
+        if self.rng.random() < self.args.error_rate:
+            self.errors += 1
+            status = self.rng.choice(self.args.error_statuses)
+            return status, {"error": {"message": f"stub error {status}", "type": "stub"}}
+        self.served += 1
+        return 200, self._completion(body)
+
+    async def route(self, method: str, path: str, raw: bytes) -> tuple[int, dict]:
+        path = path.split("?", 1)[0].rstrip("/")
+        if method == "GET" and path.endswith("/models"):
+            return 200, {"object": "list", "data": [{"id": self.args.model, "object": "model"}]}
+        if method == "GET" and path.endswith("/stats"):
+            return 200, {
+                "served": self.served,
+                "errors": self.errors,
+                "in_flight": self.in_flight,
+                "uptime_seconds": time.time() - self.started,
+            }
+        if method == "POST" and path.endswith("/chat/completions"):
+            return await self._chat(raw)
+        return 404, {"error": {"message": f"no route for {method} {path}"}}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                except ValueError:
+                    break
+                headers: dict[str, str] = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", "0") or 0)
+                raw = await reader.readexactly(length) if length else b""
+
+                status, payload = await self.route(method, path, raw)
+                data = json.dumps(payload).encode("utf-8")
+                head = (
+                    f"HTTP/1.1 {status} {REASONS.get(status, 'Error')}\r\n"
+                    "Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    "Connection: keep-alive\r\n\r\n"
+                )
+                writer.write(head.encode("latin-1") + data)
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(args: argparse.Namespace) -> None:
+    stub = StubServer(args)
+    server = await asyncio.start_server(stub.handle, args.host, args.port, backlog=4096)
+    print(f"Stub OCR server listening on http://{args.host}:{args.port}/v1", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible OCR endpoint")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--model", default="stub-ocr")
+    parser.add_argument("--latency-median", type=float, default=1.5,
+                        help="Median simulated inference latency in seconds (lognormal)")
+    parser.add_argument("--latency-sigma", type=float, default=0.4,
+                        help="Lognormal sigma of the simulated latency; 0 for a fixed delay")
+    parser.add_argument("--latency-max", type=float, default=60.0,
+                        help="Cap on a single simulated latency in seconds")
+    parser.add_argument("--max-concurrency", type=int, default=64,
+                        help="Requests served at once before others queue (0 = unlimited)")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Fraction of requests that fail after their delay")
+    parser.add_argument("--error-statuses", type=int, nargs="+", default=[503, 500],
+                        help="HTTP statuses returned for simulated failures")
+    parser.add_argument("--truncation-rate", type=float, default=0.0,
+                        help="Fraction of responses returned with finish_reason=length")
+    parser.add_argument("--response-words", type=int, default=450,
+                        help="Mean number of words in each response body")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser
+
+
+if __name__ == "__main__":
+    asyncio.run(serve(build_parser().parse_args()))
@@ -0,0 +1,297 @@
+"""Serving-parameter sweep for VLLMServer.
+
+Launches `vllm serve` once per point in a grid of engine settings
+(max-num-seqs, prefix caching, chunked prefill, GPU memory utilization),
+replays a recorded workload against each, and writes a throughput/latency
+table. The best configuration can be saved as a named preset that
+`VLLMServer(preset=...)` and the OCR runner's `--vllm-preset` load.
+
+A workload is a JSONL file with one chat-completions request body per line
+(`messages`, `max_tokens`, ...; `model` is overwritten). Record an OCR workload
+from PDFs with:
+
+    python development/experiments/vllm_sweep/run_sweep.py record-ocr \\
+        --input-dir "$CACHE_DIR/dol_archive" --n-pages 200 --output ocr_workload.jsonl
+
+Classification or segmentation workloads can be replayed the same way by
+writing their request bodies to JSONL. Then sweep:
+
+    python development/experiments/vllm_sweep/run_sweep.py sweep \\
+        --model allenai/olmOCR-2-7B-1025-FP8 --workload ocr_workload.jsonl \\
+        --max-num-seqs 64 128 256 --prefix-caching on off --chunked-prefill on off \\
+        --gpu-memory-utilization 0.85 0.92 --save-preset olmocr-a100
+"""
+
+import argparse
+import asyncio
+import base64
+import csv
+import itertools
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from openai import AsyncOpenAI
+from pypdf import PdfReader
+
+try:
+    from pipeline.utils.concurrency import percentile
+    from pipeline.utils.vllm_server import VLLMServer, save_preset
+except ModuleNotFoundError:
+    ROOT_DIR = Path(__file__).resolve().parents[3]
+    if str(ROOT_DIR) not in sys.path:
+        sys.path.insert(0, str(ROOT_DIR))
+    from pipeline.utils.concurrency import percentile
+    from pipeline.utils.vllm_server import VLLMServer, save_preset
+
+SWEEP_DIR = Path(__file__).parent
+RESULTS_DIR = SWEEP_DIR / "results"
+
+OBJECTIVES = {
+    # name -> (metric key, higher is better)
+    "throughput": ("requests_per_second", True),
+    "output_tokens": ("output_tokens_per_second", True),
+    "p95_latency": ("latency_p95", False),
+}
+
+
+def _on_off(value: str) -> bool:
+    value = value.lower()
+    if value in ("on", "true", "1", "yes"):
+        return True
+    if value in ("off", "false", "0", "no"):
+        return False
+    raise argparse.ArgumentTypeError(f"expected on/off, got {value!r}")
+
+
+def record_ocr_workload(args: argparse.Namespace) -> None:
+    """Render sampled PDF pages into OCR requests shaped like the OCR runner's."""
+    from olmocr.prompts import build_no_anchoring_v4_yaml_prompt
+
+    from pipeline.utils.pdf_render import ImageEncoding, render_page_image
+
+    pool: list[tuple[Path, int]] = []
+    for pdf_path in sorted(args.input_dir.glob("*.pdf")):
+        try:
+            with open(pdf_path, "rb") as f:
+                total = len(PdfReader(f, strict=False).pages)
+        except Exception:
+            continue
+        pool.extend((pdf_path, page) for page in range(1, total + 1))
+    if not pool:
+        raise FileNotFoundError(f"No readable PDFs in {args.input_dir}")
+    if args.n_pages < len(pool):
+        pool = random.Random(args.seed).sample(pool, args.n_pages)
+
+    encoding = ImageEncoding(args.image_format, args.image_quality, args.grayscale)
+    prompt = build_no_anchoring_v4_yaml_prompt()
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with args.output.open("w", encoding="utf-8") as f:
+        for pdf_path, page in sorted(pool):
+            image = render_page_image(str(pdf_path), page, args.target_longest_image_dim, encoding)
+            image_base64 = base64.b64encode(image).decode("ascii")
+            body = {
+                "messages": [{
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": prompt},
+                        {"type": "image_url", "image_url": {"url": f"data:{encoding.mime_type};base64,{image_base64}"}},
+                    ],
+                }],
+                "max_tokens": args.max_tokens,
+                "temperature": 0.0,
+            }
+            f.write(json.dumps(body) + "\n")
+    print(f"Wrote {len(pool)} OCR requests to {args.output}")
+
+
+def load_workload(path: Path, limit: int | None) -> list[dict]:
+    with path.open("r", encoding="utf-8") as f:
+        requests = [json.loads(line) for line in f if line.strip()]
+    return requests[:limit] if limit else requests
+
+
+async def replay(base_url: str, model: str, requests: list[dict], concurrency: int, warmup: int) -> dict:
+    """Send every request with bounded concurrency and summarize the run."""
+    client = AsyncOpenAI(api_key="EMPTY", base_url=base_url, timeout=600, max_retries=0)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    output_tokens = 0
+    errors = 0
+
+    async def send(body: dict, record: bool) -> None:
+        nonlocal output_tokens, errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await client.chat.completions.create(**{**body, "model": model})
+            except Exception:
+                if record:
+                    errors += 1
+                return
+            if record:
+                latencies.append(time.perf_counter() - started)
+                if response.usage is not None:
+                    output_tokens += response.usage.completion_tokens
+
+    try:
+        # Warm-up requests fill the prefix cache and compile paths; not timed.
+        await asyncio.gather(*(send(body, False) for body in requests[:warmup]))
+        started = time.perf_counter()
+        await asyncio.gather(*(send(body, True) for body in requests))
+        wall = time.perf_counter() - started
+    finally:
+        await client.close()
+
+    return {
+        "requests": len(requests),
+        "errors": errors,
+        "wall_seconds": round(wall, 2),
+        "requests_per_second": round(len(latencies) / wall, 3) if wall else 0.0,
+        "output_tokens_per_second": round(output_tokens / wall, 1) if wall else 0.0,
+        "latency_mean": round(statistics.mean(latencies), 3) if latencies else None,
+        "latency_p50": round(percentile(latencies, 50), 3) if latencies else None,
+        "latency_p95": round(percentile(latencies, 95), 3) if latencies else None,
+        "latency_p99": round(percentile(latencies, 99), 3) if latencies else None,
+    }
+
+
+def build_grid(args: argparse.Namespace) -> list[dict]:
+    grid = []
+    for max_num_seqs, prefix, chunked, mem in itertools.product(
+        args.max_num_seqs, args.prefix_caching, args.chunked_prefill, args.gpu_memory_utilization
+    ):
+        grid.append({
+            "max_num_seqs": max_num_seqs,
+            "enable_prefix_caching": prefix,
+            "enable_chunked_prefill": chunked,
+            "gpu_memory_utilization": mem,
+        })
+    return grid
+
+
+def run_sweep(args: argparse.Namespace) -> None:
+    requests = load_workload(args.workload, args.limit)
+    grid = build_grid(args)
+    print(f"Sweeping {len(grid)} configurations over {len(requests)} requests from {args.workload}")
+
+    rows: list[dict] = []
+    for i, engine_args in enumerate(grid, start=1):
+        print(f"\n[{i}/{len(grid)}] {json.dumps(engine_args)}")
+        server = VLLMServer(
+            args.model,
+            port=args.port,
+            max_model_len=args.max_model_len,
+            cuda_visible_devices=args.gpus,
+            engine_args=engine_args,
+        )
+        row = dict(engine_args)
+        try:
+            server.start()
+            row.update(asyncio.run(
+                replay(server.base_url, args.served_model or args.model, requests, args.concurrency, args.warmup)
+            ))
+        except Exception as exc:
+            # Settings that OOM or fail to boot stay in the table as failures.
+            row["error"] = str(exc)
+        finally:
+            server.close()
+        rows.append(row)
+        print(f"  -> {json.dumps({k: v for k, v in row.items() if k not in engine_args})}")
+
+    stamp = time.strftime("%Y%m%d_%H%M%S")
+    out_dir = args.output_dir or RESULTS_DIR / f"{args.model.replace('/', '_')}_{stamp}"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    fieldnames = list(dict.fromkeys(k for row in rows for k in row))
+    with (out_dir / "sweep.csv").open("w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+    (out_dir / "sweep.json").write_text(json.dumps({
+        "model": args.model,
+        "workload": str(args.workload),
+        "concurrency": args.concurrency,
+        "objective": args.objective,
+        "rows": rows,
+    }, indent=2), encoding="utf-8")
+
+    metric, higher_is_better = OBJECTIVES[args.objective]
+    # A configuration that drops more than 1% of requests cannot win.
+    ok_rows = [
+        row for row in rows
+        if row.get(metric) is not None and row.get("errors", 0) <= 0.01 * row.get("requests", 0)
+    ]
+    print(f"\n{'max_num_seqs':>12} {'prefix':>7} {'chunked':>8} {'mem':>5} {'req/s':>8} {'tok/s':>9} {'p50':>7} {'p95':>7} {'errors':>7}")
+    for row in rows:
+        if "error" in row:
+            print(f"{row['max_num_seqs']:>12} {str(row['enable_prefix_caching']):>7} "
+                  f"{str(row['enable_chunked_prefill']):>8} {row['gpu_memory_utilization']:>5} failed: {row['error'][:60]}")
+            continue
+        print(
+            f"{row['max_num_seqs']:>12} {str(row['enable_prefix_caching']):>7} {str(row['enable_chunked_prefill']):>8} "
+            f"{row['gpu_memory_utilization']:>5} {row['requests_per_second']:>8.3f} {row['output_tokens_per_second']:>9.1f} "
+            f"{row['latency_p50'] or 0:>7.2f} {row['latency_p95'] or 0:>7.2f} {row['errors']:>7}"
+        )
+    print(f"Results written to {out_dir}")
+
+    if not ok_rows:
+        print("No configuration completed cleanly; no preset saved.")
+        return
+    best = (max if higher_is_better else min)(ok_rows, key=lambda row: row[metric])
+    best_args = {k: best[k] for k in grid[0]}
+    print(f"Best by {args.objective}: {json.dumps(best_args)} ({metric}={best[metric]})")
+    if args.save_preset:
+        path = save_preset(
+            args.save_preset,
+            args.model,
+            best_args,
+            metrics={k: v for k, v in best.items() if k not in best_args},
+        )
+        print(f"Saved preset '{args.save_preset}' to {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep vLLM engine settings against a recorded workload")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rec = sub.add_parser("record-ocr", help="Record an OCR workload from sampled PDF pages")
+    rec.add_argument("--input-dir", type=Path, required=True)
+    rec.add_argument("--output", type=Path, required=True)
+    rec.add_argument("--n-pages", type=int, default=200)
+    rec.add_argument("--seed", type=int, default=42)
+    rec.add_argument("--target-longest-image-dim", type=int, default=1288)
+    rec.add_argument("--max-tokens", type=int, default=3000)
+    rec.add_argument("--image-format", choices=["png", "jpeg", "webp"], default="png")
+    rec.add_argument("--image-quality", type=int, default=85)
+    rec.add_argument("--grayscale", action="store_true")
+
+    sw = sub.add_parser("sweep", help="Run the configuration grid")
+    sw.add_argument("--model", required=True, help="Model passed to `vllm serve`")
+    sw.add_argument("--served-model", default=None, help="Model name sent in requests (default: --model)")
+    sw.add_argument("--workload", type=Path, required=True, help="JSONL of chat-completions request bodies")
+    sw.add_argument("--limit", type=int, default=None, help="Replay only the first N requests")
+    sw.add_argument("--warmup", type=int, default=8, help="Untimed requests sent before each measurement")
+    sw.add_argument("--concurrency", type=int, default=64, help="Requests in flight during replay")
+    sw.add_argument("--port", type=int, default=8100)
+    sw.add_argument("--gpus", type=str, default=None, help="CUDA_VISIBLE_DEVICES for the server")
+    sw.add_argument("--max-model-len", type=int, default=16384)
+    sw.add_argument("--max-num-seqs", type=int, nargs="+", default=[64, 128, 256])
+    sw.add_argument("--prefix-caching", type=_on_off, nargs="+", default=[True, False])
+    sw.add_argument("--chunked-prefill", type=_on_off, nargs="+", default=[True, False])
+    sw.add_argument("--gpu-memory-utilization", type=float, nargs="+", default=[0.9])
+    sw.add_argument("--objective", choices=sorted(OBJECTIVES), default="throughput")
+    sw.add_argument("--save-preset", type=str, default=None, help="Save the best configuration under this name")
+    sw.add_argument("--output-dir", type=Path, default=None)
+
+    args = parser.parse_args()
+    if args.command == "record-ocr":
+        record_ocr_workload(args)
+    else:
+        run_sweep(args)
+
+
+if __name__ == "__main__":
+    main()
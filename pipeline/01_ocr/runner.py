@@ -1,6 +1,7 @@
 import asyncio
 import argparse
-from functools import partial
+import base64
+import dataclasses
 import json
 import logging
 import os
@@ -9,23 +10,58 @@ import random
 import re
 import sys
 import time
-from typing import Any
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
 from tqdm import tqdm
 
 from dotenv import load_dotenv
-from openai import OpenAI
-from pypdf import PdfReader
+import httpx
+import openai
+from openai import AsyncOpenAI
 
-from olmocr.data.renderpdf import render_pdf_to_base64png
 from olmocr.pipeline import PageResult, build_dolma_document
 from olmocr.prompts import PageResponse, build_no_anchoring_v4_yaml_prompt
 
 try:
+    from pipeline.utils.concurrency import AdaptiveConcurrencyLimiter
+    from pipeline.utils.endpoint_pool import EndpointPool
+    from pipeline.utils.journal import CacheJournal
+    from pipeline.utils.page_hash import DuplicatePageIndex, PageFingerprint, page_fingerprint
+    from pipeline.utils.pdf_manifest import PdfManifest
+    from pipeline.utils.pdf_render import (
+        DEFAULT_RENDERER,
+        RENDERERS,
+        ImageEncoding,
+        PageRenderPool,
+        join_split_text,
+        render_page_pdftoppm,
+        renderer_id,
+        split_image_base64,
+    )
+    from pipeline.utils.render_cache import RenderCache
+    from pipeline.utils.text_layer import extract_text_layer, score_text_layer
     from pipeline.utils.vllm_server import VLLMServer
 except ModuleNotFoundError:
     ROOT_DIR = Path(__file__).resolve().parents[2]
     if str(ROOT_DIR) not in sys.path:
         sys.path.insert(0, str(ROOT_DIR))
+    from pipeline.utils.concurrency import AdaptiveConcurrencyLimiter
+    from pipeline.utils.endpoint_pool import EndpointPool
+    from pipeline.utils.journal import CacheJournal
+    from pipeline.utils.page_hash import DuplicatePageIndex, PageFingerprint, page_fingerprint
+    from pipeline.utils.pdf_manifest import PdfManifest
+    from pipeline.utils.pdf_render import (
+        DEFAULT_RENDERER,
+        RENDERERS,
+        ImageEncoding,
+        PageRenderPool,
+        join_split_text,
+        render_page_pdftoppm,
+        renderer_id,
+        split_image_base64,
+    )
+    from pipeline.utils.render_cache import RenderCache
+    from pipeline.utils.text_layer import extract_text_layer, score_text_layer
     from pipeline.utils.vllm_server import VLLMServer
 
 load_dotenv()
@@ -36,19 +72,118 @@ class OCRRunner:
 
     def __init__(
         self,
-        base_url: str = "http://localhost:8101/v1",
+        base_url: str | list[str] = "http://localhost:8101/v1",
         api_key: str = "EMPTY",
         model_name: str | None = None,
         target_longest_image_dim: int = 1288,
+        workers: int = 25,
+        max_connections: int | None = None,
+        timeout: float = 120.0,
+        limiter: AdaptiveConcurrencyLimiter | None = None,
+        render_workers: int = 4,
+        renderer: str = DEFAULT_RENDERER,
+        render_prefetch: int | None = None,
+        render_cache: RenderCache | None = None,
+        text_layer_fast_path: bool = False,
+        text_layer_min_chars: int = 200,
+        text_layer_min_word_ratio: float = 0.25,
+        text_layer_max_garbage_ratio: float = 0.02,
+        dedup_pages: bool = False,
+        blank_max_ink_ratio: float = 0.0,
+        dedup_hash_size: int = 64,
+        max_tokens: int = 3000,
+        max_tokens_ceiling: int = 12000,
+        split_truncated: bool = True,
+        image_format: str = "png",
+        image_quality: int = 85,
+        grayscale: bool = False,
+        manifest_workers: int | None = None,
     ):
-        self.client = OpenAI(
-            api_key=api_key,
-            base_url=base_url,
-            timeout=120,
-        )
+        self.workers = max(1, int(workers))
+        # 0 render workers falls back to olmocr's pdftoppm renderer in a thread.
+        self.render_workers = max(0, int(render_workers))
+        if renderer not in RENDERERS:
+            raise ValueError(f"Unsupported renderer {renderer!r}; expected one of {RENDERERS}")
+        if renderer != DEFAULT_RENDERER and self.render_workers == 0:
+            raise ValueError(f"renderer {renderer!r} needs at least one render worker")
+        self.renderer = renderer
+        self.render_prefetch = max(1, int(render_prefetch or self.workers * 2))
+        self.render_pool: PageRenderPool | None = None
+        self.render_cache = render_cache
+        # Render-cache entries are keyed by renderer and version; resolve it once.
+        self.renderer_id = renderer_id(renderer) if render_cache is not None else renderer
+        self.image_encoding = ImageEncoding(image_format, image_quality, grayscale)
+        self.image_payload_bytes = 0
+        # Processes used to hash and count pages of new or changed PDFs.
+        self.manifest_workers = manifest_workers
+        self.text_layer_fast_path = text_layer_fast_path
+        self.text_layer_thresholds = {
+            "min_chars": text_layer_min_chars,
+            "min_word_ratio": text_layer_min_word_ratio,
+            "max_garbage_ratio": text_layer_max_garbage_ratio,
+        }
+        self.dedup_pages = dedup_pages
+        self.blank_max_ink_ratio = blank_max_ink_ratio
+        self.dedup_hash_size = dedup_hash_size
+        # Truncated pages are retried with a doubling budget up to the ceiling,
+        # then optionally as two half-page crops.
+        self.max_tokens = max(1, int(max_tokens))
+        self.max_tokens_ceiling = max(self.max_tokens, int(max_tokens_ceiling))
+        self.split_truncated = split_truncated
+        # When set, `workers` is only the ceiling and the limiter decides how
+        # many of them may have a request in flight.
+        self.limiter = limiter
+        # The SDK retries 429/503/timeouts internally, which would hide them
+        # from the limiter and inflate the latencies it sees. With a limiter,
+        # `_request_page` retries instead, one limiter slot per attempt.
+        max_retries = 0 if limiter is not None else openai.DEFAULT_MAX_RETRIES
+        # One pooled connection per in-flight page unless told otherwise.
+        self.max_connections = max(1, int(max_connections or self.workers))
+        base_urls = [base_url] if isinstance(base_url, str) else list(base_url)
+        self.endpoint_pool: EndpointPool | None = None
+        self.client: AsyncOpenAI | None = None
+        if len(base_urls) > 1:
+            self.endpoint_pool = EndpointPool(
+                base_urls,
+                api_key=api_key,
+                max_connections=self.max_connections,
+                timeout=timeout,
+                max_retries=max_retries,
+            )
+        else:
+            self.http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                timeout=httpx.Timeout(timeout, connect=10.0),
+            )
+            self.client = AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_urls[0],
+                timeout=timeout,
+                max_retries=max_retries,
+                http_client=self.http_client,
+            )
         self.model_name = model_name
         self.target_longest_image_dim = target_longest_image_dim
 
+    async def aclose(self) -> None:
+        """Close the pooled HTTP connections held by the async client(s)."""
+        if self.endpoint_pool is not None:
+            await self.endpoint_pool.aclose()
+        else:
+            await self.client.close()
+
+    @asynccontextmanager
+    async def _lease_client(self) -> AsyncIterator[AsyncOpenAI]:
+        """Yield the client for one request, routed through the endpoint pool if any."""
+        if self.endpoint_pool is None:
+            yield self.client
+            return
+        async with self.endpoint_pool.lease() as endpoint:
+            yield endpoint.client
+
     @staticmethod
     def configure_logging() -> None:
         # Silence noisy per-request transport logs while keeping runner prints.
@@ -108,26 +243,18 @@ class OCRRunner:
             natural_text=raw.strip(),
         )
 
-    @staticmethod
-    def _load_cache(path: Path) -> dict[str, Any]:
-        if not path.exists():
-            return {"documents": {}}
-        try:
-            return json.loads(path.read_text(encoding="utf-8"))
-        except Exception:
-            return {"documents": {}}
-
-    @staticmethod
-    def _save_cache(path: Path, cache: dict[str, Any]) -> None:
-        path.parent.mkdir(parents=True, exist_ok=True)
-        path.write_text(json.dumps(cache, indent=2, ensure_ascii=False), encoding="utf-8")
-
     @staticmethod
     def _backfill_cache_from_output(output_dir: Path, cache: dict[str, Any]) -> None:
+        """Add page files missing from the journal-replayed cache (e.g. after a crash)."""
         docs = cache.setdefault("documents", {})
         for doc_dir in sorted(p for p in output_dir.iterdir() if p.is_dir()) if output_dir.exists() else []:
             doc_id = doc_dir.name
-            pages = set(docs.get(doc_id, {}).get("processed_pages", []))
+            doc_cache = docs.get(doc_id, {})
+            pages = set(doc_cache.get("processed_pages", []))
+            total_pages = doc_cache.get("total_pages")
+            if isinstance(total_pages, int) and total_pages > 0 and len(pages) >= total_pages:
+                # The journal already accounts for every page; skip the directory scan.
+                continue
             for p in doc_dir.glob("page_*.txt"):
                 m = re.match(r"page_(\d+)\.txt$", p.name)
                 if m:
@@ -149,27 +276,114 @@ class OCRRunner:
         return True
 
     @staticmethod
-    def _safe_page_count(pdf_path: Path) -> int | None:
-        """Return PDF page count with explicit file-handle cleanup."""
-        try:
-            with pdf_path.open("rb") as f:
-                reader = PdfReader(f, strict=False)
-                return len(reader.pages)
-        except Exception:
-            return None
+    def _is_overload_error(exc: Exception) -> bool:
+        """Return True for errors that mean the backend is saturated."""
+        if isinstance(exc, (openai.RateLimitError, openai.APITimeoutError)):
+            return True
+        return isinstance(exc, openai.APIStatusError) and exc.status_code in (429, 503)
+
+    def _finalize_document(
+        self,
+        doc_id: str,
+        pdf_path: Path,
+        results_map: dict[int, PageResult],
+        output_dir: Path,
+    ) -> bool:
+        """Write dolma.jsonl for this run's pages and reassemble the full text."""
+        doc_dir = output_dir / doc_id
+        if results_map:
+            results = [results_map[p] for p in sorted(results_map)]
+            doc = build_dolma_document(str(pdf_path), results)
+            (doc_dir / "dolma.jsonl").write_text(json.dumps(doc) + "\n", encoding="utf-8")
+        return self._write_full_text_from_pages(doc_dir)
 
-    async def process_page(self, pdf_path: str, page: int) -> PageResult:
+    @staticmethod
+    def _invalidate_changed_documents(
+        pdfs: list[Path],
+        manifest: PdfManifest,
+        cache: dict[str, Any],
+        output_dir: Path,
+    ) -> list[str]:
+        """Forget cached pages of PDFs whose content hash changed since they were OCR'd.
+
+        Also stamps every document's cache entry with its current hash, which
+        is what the next run compares against.
+        """
+        docs = cache.setdefault("documents", {})
+        changed: list[str] = []
+        for pdf_path in pdfs:
+            entry = manifest.get(pdf_path)
+            if entry is None or entry.sha256 is None:
+                continue
+            doc_id = pdf_path.stem
+            doc_cache = docs.get(doc_id)
+            previous = doc_cache.get("pdf_sha256") if doc_cache else None
+            if previous is not None and previous != entry.sha256:
+                changed.append(doc_id)
+                docs[doc_id] = {}
+                doc_dir = output_dir / doc_id
+                if doc_dir.exists():
+                    for stale in [*doc_dir.glob("page_*.txt"), doc_dir / "full_text.txt",
+                                  doc_dir / "full.txt", doc_dir / "dolma.jsonl"]:
+                        stale.unlink(missing_ok=True)
+            docs.setdefault(doc_id, {})["pdf_sha256"] = entry.sha256
+        return changed
+
+    async def render_page(self, pdf_path: str, page: int) -> tuple[str, float]:
+        """Render a page to a base64 image, returning the image and render seconds."""
+        started = time.perf_counter()
+        encoding = self.image_encoding
+        cache_size = encoding.cache_size_key(self.target_longest_image_dim)
+        if self.render_cache is not None:
+            cached = await asyncio.to_thread(
+                self.render_cache.get,
+                pdf_path,
+                page,
+                cache_size,
+                encoding.format,
+                renderer=self.renderer_id,
+            )
+            if cached is not None:
+                return base64.b64encode(cached).decode("ascii"), time.perf_counter() - started
+
+        if self.render_pool is not None:
+            image_base64, seconds = await self.render_pool.render(
+                pdf_path, page, self.target_longest_image_dim, encoding
+            )
+        else:
+            image_base64 = await asyncio.to_thread(
+                render_page_pdftoppm, pdf_path, page, self.target_longest_image_dim, encoding
+            )
+            seconds = time.perf_counter() - started
+
+        if self.render_cache is not None:
+            await asyncio.to_thread(
+                self.render_cache.put,
+                pdf_path,
+                page,
+                cache_size,
+                base64.b64decode(image_base64),
+                encoding.format,
+                renderer=self.renderer_id,
+            )
+        return image_base64, seconds
+
+    async def process_page(
+        self,
+        pdf_path: str,
+        page: int,
+        image_base64: str | None = None,
+        max_tokens: int | None = None,
+    ) -> PageResult:
+        """OCR one page; `is_valid` is False when the output hit the token budget."""
         if not self.model_name:
             raise ValueError(
                 "No model name configured. Pass --model or ensure --vllm-model is set."
             )
-        image_base64 = await asyncio.to_thread(
-            render_pdf_to_base64png,
-            local_pdf_path=pdf_path,
-            page_num=page - 1,
-            target_longest_image_dim=self.target_longest_image_dim,
-        )
+        if image_base64 is None:
+            image_base64, _ = await self.render_page(pdf_path, page)
         prompt = build_no_anchoring_v4_yaml_prompt()
+        self.image_payload_bytes += len(image_base64)
         query = {
             "model": self.model_name,
             "messages": [
@@ -179,18 +393,20 @@ class OCRRunner:
                         {"type": "text", "text": prompt},
                         {
                             "type": "image_url",
-                            "image_url": {"url": f"data:image/png;base64,{image_base64}"},
+                            "image_url": {
+                                "url": f"data:{self.image_encoding.mime_type};base64,{image_base64}"
+                            },
                         },
                     ],
                 }
             ],
-            "max_tokens": 3000,
+            "max_tokens": max_tokens or self.max_tokens,
         }
 
-        response = await asyncio.to_thread(
-            partial(self.client.chat.completions.create, **query)
-        )
+        async with self._lease_client() as client:
+            response = await client.chat.completions.create(**query)
         raw = response.choices[0].message.content or ""
+        truncated = response.choices[0].finish_reason == "length"
 
         page_response = self._parse_response(raw)
 
@@ -201,9 +417,173 @@ class OCRRunner:
             input_tokens=response.usage.prompt_tokens if response.usage else 0,
             output_tokens=response.usage.completion_tokens if response.usage else 0,
             is_fallback=False,
+            is_valid=not truncated,
+        )
+
+    @staticmethod
+    def _text_page_result(pdf_path: str, page: int, text: str) -> PageResult:
+        """Wrap text that did not come from the model in a PageResult."""
+        return PageResult(
+            s3_path=pdf_path,
+            page_num=page,
+            response=PageResponse(
+                primary_language="en",
+                is_rotation_valid=True,
+                rotation_correction=0,
+                is_table=False,
+                is_diagram=False,
+                natural_text=text,
+            ),
+            input_tokens=0,
+            output_tokens=0,
+            is_fallback=False,
             is_valid=True,
         )
 
+    async def _text_layer_pass(
+        self,
+        page_jobs: list[tuple[str, Path, int, int]],
+        output_dir: Path,
+        journal: CacheJournal,
+        results_by_doc: dict[str, dict[int, PageResult]],
+        concurrency: int = 8,
+    ) -> list[tuple[str, Path, int, int]]:
+        """Write pages whose embedded text passes the quality checks; return the rest."""
+        pdf_paths = {doc_id: pdf_path for doc_id, pdf_path, _, _ in page_jobs}
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def _extract(doc_id: str, pdf_path: Path) -> tuple[str, list[str]]:
+            async with semaphore:
+                try:
+                    return doc_id, await asyncio.to_thread(extract_text_layer, pdf_path)
+                except Exception as exc:
+                    tqdm.write(f"  {pdf_path.name}: text layer unavailable - {exc}")
+                    return doc_id, []
+
+        text_layers = dict(
+            await asyncio.gather(*(_extract(d, p) for d, p in pdf_paths.items()))
+        )
+
+        remaining: list[tuple[str, Path, int, int]] = []
+        for job in page_jobs:
+            doc_id, pdf_path, page, total_pages = job
+            layer = text_layers.get(doc_id, [])
+            # A page count mismatch means pdftotext's page split can't be trusted.
+            if len(layer) != total_pages:
+                remaining.append(job)
+                continue
+            text = layer[page - 1]
+            score = score_text_layer(text, **self.text_layer_thresholds)
+            if not score.passes:
+                remaining.append(job)
+                continue
+
+            page_path = output_dir / doc_id / f"page_{page:04d}.txt"
+            page_path.write_text(text, encoding="utf-8")
+            results_by_doc.setdefault(doc_id, {})[page] = self._text_page_result(
+                str(pdf_path), page, text
+            )
+            journal.record_page(
+                doc_id,
+                page,
+                meta={"source": "text_layer", "quality": score.to_dict()},
+            )
+        return remaining
+
+    @staticmethod
+    def _read_page_text(output_dir: Path, doc_id: str, page: int) -> str | None:
+        try:
+            return (output_dir / doc_id / f"page_{page:04d}.txt").read_text(encoding="utf-8")
+        except OSError:
+            return None
+
+    async def _request_page(
+        self,
+        pdf_path: str,
+        page: int,
+        image_base64: str,
+        max_tokens: int | None = None,
+    ) -> PageResult:
+        """Run `process_page` under the adaptive limiter when one is configured.
+
+        The clients do not retry on their own when a limiter is set, so each
+        overload reaches `limiter.release` and is retried here after a backoff,
+        as the SDK would have done.
+        """
+        if self.limiter is None:
+            return await self.process_page(pdf_path, page, image_base64, max_tokens)
+
+        for attempt in range(openai.DEFAULT_MAX_RETRIES + 1):
+            await self.limiter.acquire()
+            started = time.perf_counter()
+            outcome = "error"
+            try:
+                result = await self.process_page(pdf_path, page, image_base64, max_tokens)
+                outcome = "ok"
+                return result
+            except Exception as exc:
+                if not self._is_overload_error(exc):
+                    raise
+                outcome = "overload"
+                if attempt == openai.DEFAULT_MAX_RETRIES:
+                    raise
+            finally:
+                await self.limiter.release(time.perf_counter() - started, outcome)
+            await asyncio.sleep(min(8.0, 0.5 * 2**attempt) * random.uniform(0.75, 1.0))
+
+    async def _ocr_page(
+        self,
+        pdf_path: str,
+        page: int,
+        image_base64: str,
+    ) -> tuple[PageResult, dict[str, Any] | None]:
+        """OCR a page, escalating the token budget for truncated outputs.
+
+        Retries run inline in the calling worker rather than being re-queued:
+        the worker already holds the rendered image and the page's duplicate
+        claim, and putting work back on the bounded ready queue could block
+        every worker at once. A truncated page therefore occupies its worker
+        slot for up to log2(ceiling / max_tokens) escalations plus two
+        half-page requests.
+
+        Returns the result and, when any retry happened, a record of the
+        budgets tried for the run cache.
+        """
+        budgets = [self.max_tokens]
+        result = await self._request_page(pdf_path, page, image_base64, budgets[-1])
+        while not result.is_valid and budgets[-1] < self.max_tokens_ceiling:
+            budgets.append(min(budgets[-1] * 2, self.max_tokens_ceiling))
+            result = await self._request_page(pdf_path, page, image_base64, budgets[-1])
+
+        split = False
+        if not result.is_valid and self.split_truncated:
+            split = True
+            halves = await asyncio.to_thread(split_image_base64, image_base64, self.image_encoding)
+            parts = [
+                await self._request_page(pdf_path, page, half, self.max_tokens_ceiling)
+                for half in halves
+            ]
+            result = dataclasses.replace(
+                parts[0],
+                response=dataclasses.replace(
+                    parts[0].response,
+                    natural_text=join_split_text(
+                        parts[0].response.natural_text or "", parts[1].response.natural_text or ""
+                    ),
+                ),
+                input_tokens=sum(part.input_tokens for part in parts),
+                output_tokens=sum(part.output_tokens for part in parts),
+                is_valid=all(part.is_valid for part in parts),
+            )
+
+        if len(budgets) == 1 and not split:
+            return result, None
+        return result, {
+            "token_budgets": budgets,
+            "split": split,
+            "truncated": not result.is_valid,
+        }
+
     async def process_all(
         self,
         input_dir: Path,
@@ -212,15 +592,18 @@ class OCRRunner:
         sample_size: int | None = None,
         seed: int = 42,
         document: str | None = None,
-    ):
+        manifest_file: Path | None = None,
+    ) -> dict[str, Any]:
+        """OCR every uncached page under `input_dir` and return run statistics."""
         output_dir.mkdir(parents=True, exist_ok=True)
-        cache = self._load_cache(cache_file)
-        self._backfill_cache_from_output(output_dir, cache)
+        # A page costs seconds of inference, so an fsync per event is cheap.
+        journal = CacheJournal(cache_file, fsync=True)
+        cache = journal.load()
 
         pdfs = sorted(input_dir.glob("*.pdf"))
         if not pdfs:
             print(f"No PDFs found in {input_dir}")
-            return
+            return {}
 
         if document:
             requested = document.strip()
@@ -242,6 +625,21 @@ class OCRRunner:
 
         print(f"Found {len(pdfs)} candidate PDFs in {input_dir}")
 
+        manifest = PdfManifest(
+            manifest_file or cache_file.with_name(f"{cache_file.stem}.manifest.json")
+        )
+        manifest_start = time.perf_counter()
+        await asyncio.to_thread(manifest.refresh, pdfs, self.manifest_workers)
+        changed_documents = self._invalidate_changed_documents(pdfs, manifest, cache, output_dir)
+        print(
+            f"PDF manifest: {manifest.scanned} scanned, {manifest.reused} unchanged, "
+            f"{len(changed_documents)} changed since last OCR "
+            f"({time.perf_counter() - manifest_start:.1f}s)"
+        )
+        if changed_documents:
+            journal.compact(cache)
+        self._backfill_cache_from_output(output_dir, cache)
+
         total_pages_queued = 0
         total_pages_processed = 0
         failed_pages = 0
@@ -253,10 +651,29 @@ class OCRRunner:
         doc_pdf_paths: dict[str, Path] = {}
         doc_processed_pages: dict[str, set[int]] = {}
         run_start = time.perf_counter()
-        worker_count = 25
+        worker_count = self.workers
+        render_task_count = max(1, self.render_workers) * 2
         queue: asyncio.Queue[tuple[str, Path, int, int] | None] = asyncio.Queue(
             maxsize=worker_count * 4
         )
+        # Rendered pages wait here so inference workers never block on rasterization.
+        ready_queue: asyncio.Queue[
+            tuple[
+                tuple[str, Path, int, int],
+                str | None,
+                PageFingerprint | None,
+                Exception | None,
+            ]
+            | None
+        ] = asyncio.Queue(maxsize=self.render_prefetch)
+        duplicate_index = DuplicatePageIndex.from_cache(cache) if self.dedup_pages else None
+        blank_pages = 0
+        duplicate_pages = 0
+        truncation_retries = 0
+        render_seconds = 0.0
+        inference_seconds = 0.0
+        inference_idle_seconds = 0.0
+        write_seconds = 0.0
         cache_lock = asyncio.Lock()
         progress_lock = asyncio.Lock()
         for pdf_path in pdfs:
@@ -273,11 +690,8 @@ class OCRRunner:
                 skipped_documents += 1
                 continue
 
-            total_pages = (
-                cached_total_pages
-                if isinstance(cached_total_pages, int) and cached_total_pages > 0
-                else self._safe_page_count(pdf_path)
-            )
+            manifest_entry = manifest.get(pdf_path)
+            total_pages = manifest_entry.page_count if manifest_entry is not None else None
             if total_pages is None:
                 unreadable_documents += 1
                 tqdm.write(f"Skipping {pdf_path.name}: unable to read page count")
@@ -298,8 +712,42 @@ class OCRRunner:
             for page in pages_to_process:
                 page_jobs.append((doc_id, pdf_path, page, total_pages))
 
+        text_layer_pages = 0
+        if self.text_layer_fast_path and page_jobs:
+            remaining_jobs = await self._text_layer_pass(
+                page_jobs, output_dir, journal, results_by_doc
+            )
+            text_layer_pages = len(page_jobs) - len(remaining_jobs)
+            page_jobs = remaining_jobs
+            print(f"Pages taken from the embedded text layer: {text_layer_pages}")
+
         total_pages_queued = len(page_jobs)
-        self._save_cache(cache_file, cache)
+        journal.compact(cache)
+
+        # Documents are assembled as soon as their last queued page finishes,
+        # so their PageResults can be dropped instead of held until the end.
+        pages_left_by_doc: dict[str, int] = {}
+        for doc_id, _, _, _ in page_jobs:
+            pages_left_by_doc[doc_id] = pages_left_by_doc.get(doc_id, 0) + 1
+        finalized_docs: set[str] = set()
+        full_text_docs = 0
+
+        async def finalize_document(doc_id: str) -> None:
+            nonlocal full_text_docs
+            finalized_docs.add(doc_id)
+            results_map = results_by_doc.pop(doc_id, {})
+            try:
+                if await asyncio.to_thread(
+                    self._finalize_document, doc_id, doc_pdf_paths[doc_id], results_map, output_dir
+                ):
+                    full_text_docs += 1
+            except Exception as exc:
+                tqdm.write(f"  {doc_id}: failed to assemble document - {exc}")
+
+        for doc_id in doc_pdf_paths:
+            if doc_id not in pages_left_by_doc:
+                # Every page came from the text-layer pass.
+                await finalize_document(doc_id)
         print(f"Total uncached pages to process: {total_pages_queued}")
 
         progress_bar = tqdm(total=total_pages_queued, desc="OCR pages", unit="page")
@@ -311,17 +759,21 @@ class OCRRunner:
             progress_pct = (
                 (progress_bar.n / total_pages_queued) * 100 if total_pages_queued else 100.0
             )
+            limit_str = (
+                f", limit={self.limiter.current_limit}" if self.limiter is not None else ""
+            )
             progress_bar.set_postfix_str(
                 f"done={int(progress_bar.n)}/{total_pages_queued}, processed={total_pages_processed}, "
                 f"failed={failed_pages}, avg/page={avg_per_page_str}, progress={progress_pct:.2f}%"
+                f"{limit_str}"
             )
 
         async def enqueue_jobs() -> None:
             for job in page_jobs:
                 await queue.put(job)
 
-        async def worker() -> None:
-            nonlocal total_pages_processed, failed_pages
+        async def render_worker() -> None:
+            nonlocal render_seconds
 
             while True:
                 job = await queue.get()
@@ -329,34 +781,119 @@ class OCRRunner:
                     queue.task_done()
                     return
 
+                _, pdf_path, page, _ = job
+                image_base64: str | None = None
+                fingerprint: PageFingerprint | None = None
+                error: Exception | None = None
+                try:
+                    image_base64, seconds = await self.render_page(str(pdf_path), page)
+                    render_seconds += seconds
+                    if self.dedup_pages:
+                        fingerprint = await asyncio.to_thread(
+                            page_fingerprint,
+                            base64.b64decode(image_base64),
+                            self.dedup_hash_size,
+                        )
+                except Exception as exc:
+                    error = exc
+                try:
+                    await ready_queue.put((job, image_base64, fingerprint, error))
+                finally:
+                    queue.task_done()
+
+        async def worker() -> None:
+            nonlocal total_pages_processed, failed_pages, inference_seconds, inference_idle_seconds
+            nonlocal blank_pages, duplicate_pages, truncation_retries, write_seconds
+
+            while True:
+                wait_start = time.perf_counter()
+                item = await ready_queue.get()
+                inference_idle_seconds += time.perf_counter() - wait_start
+                if item is None:
+                    ready_queue.task_done()
+                    return
+
+                job, image_base64, fingerprint, render_error = item
                 doc_id, pdf_path, page, total_pages = job
+                owned_hash: str | None = None
+                source: tuple[str, int] | None = None
                 try:
-                    result = await self.process_page(str(pdf_path), page)
+                    if render_error is not None:
+                        raise RuntimeError(f"render failed: {render_error}") from render_error
+
+                    result: PageResult | None = None
+                    page_meta: dict[str, Any] | None = None
+                    if fingerprint is not None and fingerprint.is_blank(self.blank_max_ink_ratio):
+                        result = self._text_page_result(str(pdf_path), page, "")
+                        page_meta = {"source": "blank", "ink_ratio": fingerprint.ink_ratio}
+                        blank_pages += 1
+                    elif fingerprint is not None:
+                        duplicate_of = await duplicate_index.acquire(fingerprint.phash)
+                        if duplicate_of is None:
+                            owned_hash = fingerprint.phash
+                        else:
+                            text = self._read_page_text(output_dir, *duplicate_of)
+                            if text is not None:
+                                result = self._text_page_result(str(pdf_path), page, text)
+                                page_meta = {
+                                    "source": "duplicate",
+                                    "phash": fingerprint.phash,
+                                    "duplicate_of": {
+                                        "document_id": duplicate_of[0],
+                                        "page": duplicate_of[1],
+                                    },
+                                }
+                                duplicate_pages += 1
+
+                    if result is None:
+                        request_start = time.perf_counter()
+                        try:
+                            result, retry_meta = await self._ocr_page(
+                                str(pdf_path), page, image_base64
+                            )
+                        finally:
+                            inference_seconds += time.perf_counter() - request_start
+                        if fingerprint is not None:
+                            page_meta = {"source": "model", "phash": fingerprint.phash}
+                        if retry_meta is not None:
+                            truncation_retries += 1
+                            page_meta = {"source": "model", **(page_meta or {}), **retry_meta}
                 except Exception as exc:
                     failed_pages += 1
                     tqdm.write(
                         f"  {pdf_path.name} page {page}/{total_pages}: FAILED - {exc}"
                     )
                 else:
+                    write_start = time.perf_counter()
                     page_path = output_dir / doc_id / f"page_{page:04d}.txt"
                     page_path.write_text(result.response.natural_text, encoding="utf-8")
                     results_by_doc.setdefault(doc_id, {})[page] = result
 
                     async with cache_lock:
-                        processed_pages = doc_processed_pages[doc_id]
-                        processed_pages.add(page)
-                        doc_cache = cache.setdefault("documents", {}).setdefault(doc_id, {})
-                        doc_cache["processed_pages"] = sorted(processed_pages)
-                        doc_cache["last_processed_page"] = max(processed_pages)
-                        self._save_cache(cache_file, cache)
+                        doc_processed_pages[doc_id].add(page)
+                        journal.record_page(doc_id, page, meta=page_meta)
+                    write_seconds += time.perf_counter() - write_start
 
+                    source = (doc_id, page)
                     total_pages_processed += 1
                 finally:
+                    if owned_hash is not None:
+                        duplicate_index.release(owned_hash, source)
+                    pages_left_by_doc[doc_id] -= 1
+                    if pages_left_by_doc[doc_id] == 0:
+                        write_start = time.perf_counter()
+                        await finalize_document(doc_id)
+                        write_seconds += time.perf_counter() - write_start
                     async with progress_lock:
                         progress_bar.update(1)
                         _set_progress_postfix()
-                    queue.task_done()
+                    ready_queue.task_done()
 
+        if self.render_workers > 0 and total_pages_queued > 0:
+            self.render_pool = PageRenderPool(self.render_workers, renderer=self.renderer)
+        if self.endpoint_pool is not None:
+            self.endpoint_pool.start_health_checks()
+        render_tasks = [asyncio.create_task(render_worker()) for _ in range(render_task_count)]
         workers = [asyncio.create_task(worker()) for _ in range(worker_count)]
         try:
             await enqueue_jobs()
@@ -365,20 +902,26 @@ class OCRRunner:
             async with progress_lock:
                 _set_progress_postfix()
         finally:
-            for _ in workers:
+            for _ in render_tasks:
                 await queue.put(None)
             await queue.join()
+            await asyncio.gather(*render_tasks, return_exceptions=True)
+            for _ in workers:
+                await ready_queue.put(None)
+            await ready_queue.join()
             await asyncio.gather(*workers, return_exceptions=True)
             progress_bar.close()
+            if self.render_pool is not None:
+                self.render_pool.close()
+                self.render_pool = None
+            if self.endpoint_pool is not None:
+                await self.endpoint_pool.stop_health_checks()
+            journal.compact(cache)
 
-        for doc_id, results_map in results_by_doc.items():
-            results = [results_map[p] for p in sorted(results_map)]
-            doc_dir = output_dir / doc_id
-            doc = build_dolma_document(str(doc_pdf_paths[doc_id]), results)
-            (doc_dir / "dolma.jsonl").write_text(json.dumps(doc) + "\n", encoding="utf-8")
-
-        full_text_docs = 0
+        # Documents with no work this run (or interrupted ones) still get full text.
         for pdf_path in pdfs:
+            if pdf_path.stem in finalized_docs:
+                continue
             doc_dir = output_dir / pdf_path.stem
             if self._write_full_text_from_pages(doc_dir):
                 full_text_docs += 1
@@ -386,10 +929,52 @@ class OCRRunner:
         elapsed = time.perf_counter() - run_start
         print(
             f"\nQueued pages this run: {total_pages_queued} | Processed pages this run: {total_pages_processed} | "
-            f"Failed pages: {failed_pages} | "
+            f"Failed pages: {failed_pages} | Text-layer pages: {text_layer_pages} | "
+            f"Blank pages: {blank_pages} | Duplicate pages: {duplicate_pages} | "
+            f"Truncation retries: {truncation_retries} | "
             f"Docs with work: {docs_with_work} | full_text docs: {full_text_docs} | Skipped cached docs: {skipped_documents} | "
             f"Unreadable docs: {unreadable_documents} | Elapsed: {self._format_elapsed(elapsed)}"
         )
+        if total_pages_queued:
+            print(
+                f"Render time: {render_seconds:.1f}s ({render_seconds / total_pages_queued:.2f}s/page, "
+                f"{max(1, self.render_workers)} render worker(s)) | "
+                f"Inference time: {inference_seconds:.1f}s ({inference_seconds / total_pages_queued:.2f}s/page) | "
+                f"Inference worker idle time: {inference_idle_seconds:.1f}s | "
+                f"Write time: {write_seconds:.1f}s"
+            )
+            print(
+                f"Image payload ({self.image_encoding.describe()}): "
+                f"{self.image_payload_bytes / 1024**2:.1f} MB base64 "
+                f"({self.image_payload_bytes / 1024 / total_pages_queued:.0f} KB/page)"
+            )
+        if self.limiter is not None:
+            print(f"Adaptive concurrency: {json.dumps(self.limiter.snapshot())}")
+        if self.render_cache is not None:
+            print(f"Render cache: {json.dumps(self.render_cache.stats())}")
+        if self.endpoint_pool is not None:
+            print(f"Endpoints: {json.dumps(self.endpoint_pool.snapshot())}")
+
+        return {
+            "documents": len(pdfs),
+            "docs_with_work": docs_with_work,
+            "skipped_documents": skipped_documents,
+            "unreadable_documents": unreadable_documents,
+            "changed_documents": len(changed_documents),
+            "queued_pages": total_pages_queued,
+            "processed_pages": total_pages_processed,
+            "failed_pages": failed_pages,
+            "text_layer_pages": text_layer_pages,
+            "blank_pages": blank_pages,
+            "duplicate_pages": duplicate_pages,
+            "truncation_retries": truncation_retries,
+            "elapsed_seconds": elapsed,
+            "render_seconds": render_seconds,
+            "inference_seconds": inference_seconds,
+            "inference_idle_seconds": inference_idle_seconds,
+            "write_seconds": write_seconds,
+            "image_payload_bytes": self.image_payload_bytes,
+        }
 
 async def main():
     parser = argparse.ArgumentParser(description="Run OlmoOCR over CBA PDFs with resumable caching.")
@@ -399,6 +984,10 @@ async def main():
                         help="Directory where OCR outputs are written")
     parser.add_argument("--cache-file", type=Path, default=Path(os.environ.get("CACHE_DIR")) / "01_ocr_output" / "01_ocr_cache.json",
                         help="JSON file tracking processed pages")
+    parser.add_argument("--manifest-file", type=Path, default=None,
+                        help="PDF manifest (size, mtime, SHA-256, page count); defaults next to --cache-file")
+    parser.add_argument("--manifest-workers", type=int, default=None,
+                        help="Processes used to hash and count pages of new or changed PDFs (default: CPU count)")
     parser.add_argument("--sample-size", type=int, default=None,
                         help="Randomly sample N documents")
     parser.add_argument("--seed", type=int, default=42,
@@ -420,6 +1009,50 @@ async def main():
                         help="Model to serve with vLLM")
     parser.add_argument("--vllm-port", type=int, default=8102,
                         help="Port for the managed vLLM server")
+    parser.add_argument(
+        "--vllm-ports",
+        type=int,
+        nargs="+",
+        default=None,
+        help="Start one managed vLLM server per port and route pages across them",
+    )
+    parser.add_argument(
+        "--vllm-gpus",
+        type=str,
+        nargs="+",
+        default=None,
+        help="CUDA_VISIBLE_DEVICES for each server in --vllm-ports, e.g. 0 1 or 0,1 2,3",
+    )
+    parser.add_argument(
+        "--vllm-daemon",
+        action="store_true",
+        help=(
+            "Attach to (or start) a shared vLLM daemon registered under $CACHE_DIR/vllm_daemons "
+            "instead of a server that is stopped when this run ends"
+        ),
+    )
+    parser.add_argument(
+        "--vllm-preset",
+        type=str,
+        default=None,
+        help="Named vLLM engine preset (see development/experiments/vllm_sweep/run_sweep.py)",
+    )
+    parser.add_argument(
+        "--vllm-idle-timeout",
+        type=float,
+        default=900.0,
+        help="Seconds a --vllm-daemon server with no attached runs stays up",
+    )
+    parser.add_argument(
+        "--endpoint",
+        dest="endpoints",
+        action="append",
+        default=None,
+        help=(
+            "Base URL of an already-running OpenAI-compatible server (repeatable). "
+            "With --provider vllm, no local server is started."
+        ),
+    )
     parser.add_argument(
         "--vllm-max-model-len",
         type=int,
@@ -437,10 +1070,116 @@ async def main():
             "(olmOCR-2 model card recommends 1288)."
         ),
     )
+    parser.add_argument("--workers", type=int, default=25,
+                        help="Number of concurrent page requests kept in flight")
+    parser.add_argument(
+        "--max-connections",
+        type=int,
+        default=None,
+        help="Size of the shared HTTP connection pool; defaults to --workers",
+    )
+    parser.add_argument(
+        "--adaptive-concurrency",
+        action="store_true",
+        help=(
+            "Grow or shrink in-flight page requests from observed p95 latency, timeouts "
+            "and 429/503 responses. --workers becomes the ceiling."
+        ),
+    )
+    parser.add_argument(
+        "--render-workers",
+        type=int,
+        default=4,
+        help="Processes used to render PDF pages ahead of inference; 0 renders in threads with pdftoppm",
+    )
+    parser.add_argument(
+        "--renderer",
+        choices=RENDERERS,
+        default=DEFAULT_RENDERER,
+        help=(
+            "Page rasterizer used by the render workers. pdftoppm (olmocr's renderer) is the default; "
+            "pdfium is faster but its images are not pixel-identical."
+        ),
+    )
+    parser.add_argument("--render-prefetch", type=int, default=None,
+                        help="Rendered pages buffered ahead of inference; defaults to 2x --workers")
+    parser.add_argument(
+        "--render-cache-dir",
+        type=Path,
+        default=None,
+        help="Reuse rendered page images across runs, keyed by PDF hash, page and image size",
+    )
+    parser.add_argument("--render-cache-max-gb", type=float, default=20.0,
+                        help="Size cap for --render-cache-dir; least recently used pages are evicted")
+    parser.add_argument(
+        "--text-layer-fast-path",
+        action="store_true",
+        help="Skip the model for pages whose embedded text layer passes the quality checks",
+    )
+    parser.add_argument("--text-layer-min-chars", type=int, default=200,
+                        help="Minimum non-whitespace characters for a text-layer page")
+    parser.add_argument("--text-layer-min-word-ratio", type=float, default=0.25,
+                        help="Minimum share of tokens found in the common-word list")
+    parser.add_argument("--text-layer-max-garbage-ratio", type=float, default=0.02,
+                        help="Maximum share of control, private-use or replacement glyphs")
+    parser.add_argument(
+        "--dedup-pages",
+        action="store_true",
+        help=(
+            "Fingerprint rendered pages: skip blank pages and reuse the text of pages "
+            "that render identically to one already OCR'd"
+        ),
+    )
+    parser.add_argument("--blank-max-ink-ratio", type=float, default=0.0,
+                        help=(
+                            "Pages with at most this share of dark pixels at render resolution are "
+                            "treated as blank (default: no ink at all; a lone page number is ~1e-5)"
+                        ))
+    parser.add_argument("--dedup-hash-size", type=int, default=64,
+                        help="Side length of the binarized thumbnail used as the duplicate key")
+    parser.add_argument("--max-tokens", type=int, default=3000,
+                        help="Initial completion budget per page")
+    parser.add_argument(
+        "--max-tokens-ceiling",
+        type=int,
+        default=12000,
+        help="Largest budget used when re-requesting pages whose output was truncated",
+    )
+    parser.add_argument(
+        "--no-split-truncated",
+        dest="split_truncated",
+        action="store_false",
+        help="Do not fall back to half-page crops when a page is still truncated at the ceiling",
+    )
+    parser.add_argument("--image-format", choices=["png", "jpeg", "webp"], default="png",
+                        help="Encoding of page images sent to the model")
+    parser.add_argument("--image-quality", type=int, default=85,
+                        help="JPEG/WebP quality (1-100); ignored for PNG")
+    parser.add_argument("--grayscale", action="store_true",
+                        help="Render pages in grayscale before encoding")
+    parser.add_argument("--initial-workers", type=int, default=8,
+                        help="Starting in-flight limit when --adaptive-concurrency is set")
+    parser.add_argument("--min-workers", type=int, default=1,
+                        help="Lowest in-flight limit when --adaptive-concurrency is set")
     args = parser.parse_args()
 
     OCRRunner.configure_logging()
 
+    render_cache = None
+    if args.render_cache_dir is not None:
+        render_cache = RenderCache(
+            args.render_cache_dir,
+            max_bytes=int(args.render_cache_max_gb * 1024**3),
+        )
+
+    limiter = None
+    if args.adaptive_concurrency:
+        limiter = AdaptiveConcurrencyLimiter(
+            initial_limit=min(args.initial_workers, args.workers),
+            min_limit=args.min_workers,
+            max_limit=args.workers,
+        )
+
     if args.provider == "google":
         api_key = os.environ.get("GOOGLE_API_KEY", "").strip()
         if not api_key:
@@ -451,43 +1190,112 @@ async def main():
             api_key=api_key,
             model_name=args.model or "gemini-2.5-flash",
             target_longest_image_dim=args.target_longest_image_dim,
+            workers=args.workers,
+            max_connections=args.max_connections,
+            limiter=limiter,
+            render_workers=args.render_workers,
+            renderer=args.renderer,
+            render_prefetch=args.render_prefetch,
+            render_cache=render_cache,
+            text_layer_fast_path=args.text_layer_fast_path,
+            text_layer_min_chars=args.text_layer_min_chars,
+            text_layer_min_word_ratio=args.text_layer_min_word_ratio,
+            text_layer_max_garbage_ratio=args.text_layer_max_garbage_ratio,
+            dedup_pages=args.dedup_pages,
+            blank_max_ink_ratio=args.blank_max_ink_ratio,
+            dedup_hash_size=args.dedup_hash_size,
+            max_tokens=args.max_tokens,
+            max_tokens_ceiling=args.max_tokens_ceiling,
+            split_truncated=args.split_truncated,
+            image_format=args.image_format,
+            image_quality=args.image_quality,
+            grayscale=args.grayscale,
+            manifest_workers=args.manifest_workers,
         )
-        await runner.process_all(
-            input_dir=args.input_dir,
-            output_dir=args.output_dir,
-            cache_file=args.cache_file,
-            sample_size=args.sample_size,
-            seed=args.seed,
-            document=args.document,
-        )
+        try:
+            await runner.process_all(
+                input_dir=args.input_dir,
+                output_dir=args.output_dir,
+                cache_file=args.cache_file,
+                manifest_file=args.manifest_file,
+                sample_size=args.sample_size,
+                seed=args.seed,
+                document=args.document,
+            )
+        finally:
+            await runner.aclose()
         return
 
     if not args.vllm_model:
         raise ValueError("--vllm-model is required when --provider vllm")
 
-    vllm_server = VLLMServer(
-        args.vllm_model,
-        port=args.vllm_port,
-        max_model_len=args.vllm_max_model_len,
-    )
+    vllm_servers: list[VLLMServer] = []
+    if args.endpoints:
+        base_urls = list(args.endpoints)
+    else:
+        ports = args.vllm_ports or [args.vllm_port]
+        gpus = args.vllm_gpus or [None] * len(ports)
+        if len(gpus) != len(ports):
+            raise ValueError("--vllm-gpus needs one entry per --vllm-ports entry")
+        vllm_servers = [
+            VLLMServer(
+                args.vllm_model,
+                port=port,
+                max_model_len=args.vllm_max_model_len,
+                cuda_visible_devices=gpu,
+                daemon=args.vllm_daemon,
+                idle_timeout=args.vllm_idle_timeout,
+                preset=args.vllm_preset,
+            )
+            for port, gpu in zip(ports, gpus)
+        ]
     try:
-        await asyncio.to_thread(vllm_server.start)
+        await asyncio.gather(*(asyncio.to_thread(server.start) for server in vllm_servers))
+        if vllm_servers:
+            # An attached daemon may be serving on a different port than requested.
+            base_urls = [server.base_url for server in vllm_servers]
         runner = OCRRunner(
-            base_url=f"http://localhost:{args.vllm_port}/v1",
+            base_url=base_urls,
             api_key="EMPTY",
             model_name=args.model or args.vllm_model,
             target_longest_image_dim=args.target_longest_image_dim,
+            workers=args.workers,
+            max_connections=args.max_connections,
+            limiter=limiter,
+            render_workers=args.render_workers,
+            renderer=args.renderer,
+            render_prefetch=args.render_prefetch,
+            render_cache=render_cache,
+            text_layer_fast_path=args.text_layer_fast_path,
+            text_layer_min_chars=args.text_layer_min_chars,
+            text_layer_min_word_ratio=args.text_layer_min_word_ratio,
+            text_layer_max_garbage_ratio=args.text_layer_max_garbage_ratio,
+            dedup_pages=args.dedup_pages,
+            blank_max_ink_ratio=args.blank_max_ink_ratio,
+            dedup_hash_size=args.dedup_hash_size,
+            max_tokens=args.max_tokens,
+            max_tokens_ceiling=args.max_tokens_ceiling,
+            split_truncated=args.split_truncated,
+            image_format=args.image_format,
+            image_quality=args.image_quality,
+            grayscale=args.grayscale,
+            manifest_workers=args.manifest_workers,
         )
-        await runner.process_all(
-            input_dir=args.input_dir,
-            output_dir=args.output_dir,
-            cache_file=args.cache_file,
-            sample_size=args.sample_size,
-            seed=args.seed,
-            document=args.document,
-        )
+        try:
+            await runner.process_all(
+                input_dir=args.input_dir,
+                output_dir=args.output_dir,
+                cache_file=args.cache_file,
+                manifest_file=args.manifest_file,
+                sample_size=args.sample_size,
+                seed=args.seed,
+                document=args.document,
+            )
+        finally:
+            await runner.aclose()
     finally:
-        vllm_server.close()
+        for server in vllm_servers:
+            server.close()
 
 
 if __name__ == "__main__":
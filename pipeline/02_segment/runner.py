@@ -9,6 +9,29 @@ Operational notes for collaborators:
 - The script entrypoint currently targets `01_ocr_output/dol_archive`.
 - The CLI defaults to cached reruns, but can be switched to process all
   documents with `--no-cached-only`.
+- Boundary evaluations for all selected documents share one event loop and a
+  bounded global queue, so `--boundary-concurrency` requests stay in flight
+  across document boundaries instead of per document.
+- With `--boundary-batch-size K` (K > 1), up to K numbered candidate windows
+  share one request and the model answers with a JSON array of decisions.
+  Batches also stop at `--boundary-batch-chars`, so K shrinks for wide windows.
+- `--boundary-prefilter PATH` loads a model trained with
+  `python -m pipeline.utils.boundary_prefilter train`; candidates it is
+  confident about are decided locally and never sent to the boundary model.
+- Header rules from the plan are validated and matched rule by rule
+  in a worker process; a rule that runs past `--header-rule-timeout` seconds
+  is dropped instead of stalling the run.
+- Planner output is indexed by header fingerprint in
+  `02_segmentation_output/plan_library.json`. A new document reuses a stored
+  plan when that plan's rules hit its header lines, and the planning model is
+  only called on a miss (`--no-plan-reuse` disables this).
+- Input directories are streamed from a generator and each document is
+  released once it is written, so memory stays flat on full-archive runs.
+  `--no-segment-files` keeps segments as spans in `document_meta.json` over
+  `full_text.txt` instead of also writing `segments/segment_*.txt`. Segment
+  files left by earlier runs are kept, with a warning, since they may be out
+  of date. Only use it when every reader goes through `SegmentStore`
+  (classification and the generosity stages do), which prefers the spans.
 """
 
 import argparse
@@ -19,22 +42,40 @@ from dotenv import load_dotenv
 import numpy as np
 from dataclasses import dataclass 
 import random
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from pydantic import BaseModel, ConfigDict, Field, ValidationError
 import json
 import re
 from tqdm import tqdm
 import sys
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
-from typing import Literal
+from typing import Iterable, Iterator, Literal
 
 try:
     import pipeline.utils.utils as utils
+    from pipeline.utils.header_rules import HeaderMatcher
+    from pipeline.utils.plan_library import PlanLibrary
+    from pipeline.utils.llm_cache import (
+        accept_response,
+        open_response_cache,
+        reject_response,
+        with_response_cache,
+    )
+    from pipeline.utils.boundary_prefilter import BoundaryPrefilter, candidate_features
 except ModuleNotFoundError:
     ROOT_DIR = Path(__file__).resolve().parents[2]
     if str(ROOT_DIR) not in sys.path:
         sys.path.insert(0, str(ROOT_DIR))
     from pipeline.utils import utils
+    from pipeline.utils.header_rules import HeaderMatcher
+    from pipeline.utils.plan_library import PlanLibrary
+    from pipeline.utils.llm_cache import (
+        accept_response,
+        open_response_cache,
+        reject_response,
+        with_response_cache,
+    )
+    from pipeline.utils.boundary_prefilter import BoundaryPrefilter, candidate_features
 
 load_dotenv()
 
@@ -60,6 +101,7 @@ class Document:
     segments: dict[int, Segment]
     full_text: str
     plan: dict | None = None
+    plan_reused_from: str | None = None
 
 class SegmentationRunner:
     """Plan, score, and materialize document segments for OCR'd CBAs."""
@@ -73,13 +115,26 @@ class SegmentationRunner:
         planning_perc: float,
         boundary_model: str,
         boundary_padding: int,
-        provider: str = Literal["openai", "openrouter"]
+        provider: str = Literal["openai", "openrouter"],
+        boundary_concurrency: int = 32,
+        planning_concurrency: int = 4,
+        boundary_batch_size: int = 1,
+        boundary_batch_chars: int = 24000,
+        boundary_prefilter: str | Path | None = None,
+        header_rule_timeout: float = 20.0,
+        plan_reuse: bool = True,
+        plan_min_hit_rate: float = 0.9,
+        write_segment_files: bool = True,
+        llm_cache: bool = True,
     ): 
         
         self.cache_dir: Path = Path(cache_dir)
         self.input_dir: Path = self.cache_dir / input_dir
         self.output_dir: Path = self.cache_dir / output_dir
+        # Only documents currently being prepared or evaluated; each one is
+        # dropped as soon as it has been written.
         self.documents: dict[str, Document] = {}
+        self.write_segment_files: bool = write_segment_files
         
         self.planning_model: str = planning_model
         self.planning_perc: float = planning_perc
@@ -94,14 +149,42 @@ class SegmentationRunner:
         
         self.max_token_param: str = "max_completion_tokens" if provider == "openai" else "max_tokens"
         
-        self.client = OpenAI(
-            api_key=api_key,
-            base_url=base_url, 
-            timeout=120
+        self.llm_cache = open_response_cache(self.cache_dir) if llm_cache else None
+        self.client = with_response_cache(
+            OpenAI(
+                api_key=api_key,
+                base_url=base_url, 
+                timeout=120
+            ),
+            self.llm_cache,
+        )
+        # Boundary evaluations run on the event loop; thread-offloading the
+        # sync client would cap concurrency at the default executor size.
+        self.async_client = with_response_cache(
+            AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                timeout=120,
+            ),
+            self.llm_cache,
         )
         
         self.boundary_model: str = boundary_model
         self.boundary_padding = boundary_padding
+        self.boundary_concurrency: int = max(1, int(boundary_concurrency))
+        self.planning_concurrency: int = max(1, int(planning_concurrency))
+        # Candidates per boundary request (1 = one request per candidate) and
+        # the character budget of candidate windows packed into one request.
+        self.boundary_batch_size: int = max(1, int(boundary_batch_size))
+        self.boundary_batch_chars: int = max(1, int(boundary_batch_chars))
+        self.boundary_prefilter: BoundaryPrefilter | None = (
+            BoundaryPrefilter.load(boundary_prefilter) if boundary_prefilter else None
+        )
+        self.header_matcher = HeaderMatcher(timeout=header_rule_timeout)
+        self.plan_library: PlanLibrary | None = (
+            PlanLibrary(self.output_dir.parent / "plan_library.json", min_hit_rate=plan_min_hit_rate)
+            if plan_reuse else None
+        )
         
     def _process_pages(self, path: Path):
         """Load page text files and record their character spans in the full text."""
@@ -136,12 +219,27 @@ class SegmentationRunner:
     def _plan_segmentation(self, path: Path):
         """Infer header patterns for the document's top-level segmentation scheme."""
         
+        char_perc = int(len(self.documents[path.name].full_text) * self.planning_perc)
+        text = self.documents[path.name].full_text[:char_perc]
+
         if os.path.exists(self.output_dir / path.name / "document_meta.json"):
-            self.documents[path.name].plan = json.load(open(self.output_dir / path.name / "document_meta.json")).get("plan")
+            meta = json.load(open(self.output_dir / path.name / "document_meta.json"))
+            self.documents[path.name].plan = meta.get("plan")
+            self.documents[path.name].plan_reused_from = meta.get("plan_reused_from")
+            if self.plan_library is not None and meta.get("plan") and not meta.get("plan_reused_from"):
+                # Cached planner output seeds the library on reruns.
+                self.plan_library.add(path.name, text, meta["plan"], self._match_spans)
             return 
+
+        if self.plan_library is not None:
+            reused = self.plan_library.lookup(text, self._match_spans)
+            if reused is not None:
+                plan, source_id, hit_rate = reused
+                self.documents[path.name].plan = plan
+                self.documents[path.name].plan_reused_from = source_id
+                tqdm.write(f"  {path.name}: reusing plan from {source_id} (header hit rate {hit_rate:.0%})")
+                return
         
-        char_perc = int(len(self.documents[path.name].full_text) * self.planning_perc)
-        text = self.documents[path.name].full_text[:char_perc]
         system_prompt = "\n".join([
             "You are an expert in understanding formal document structures.",
             "You've been asked to identify the organization of a collective bargaining agreement.",
@@ -187,7 +285,7 @@ class SegmentationRunner:
             },
         }
         
-        response = self.client.chat.completions.create(
+        request = dict(
             model=self.planning_model,
             messages=[
                 {
@@ -203,56 +301,87 @@ class SegmentationRunner:
             **{self.max_token_param: 4800},
             **({"temperature": 0.0} if self.provider != "openai" else {}),
         )
+        response = self.client.chat.completions.create(**request)
         
-        payload = json.loads(response.choices[0].message.content)
+        try:
+            payload = json.loads(response.choices[0].message.content)
+            if not isinstance(payload.get("segment_header_rules"), list):
+                raise ValueError("plan has no segment_header_rules list")
+        except (TypeError, ValueError, AttributeError):
+            reject_response(self.client, request)
+            raise
+        accept_response(self.client, request, response)
         self.documents[path.name].plan = payload
+        if self.plan_library is not None:
+            self.plan_library.add(path.name, text, payload, self._match_spans)
+
+    def _match_spans(self, text: str, rules: list[str]) -> list[tuple[int, int]]:
+        return self.header_matcher.match(text, rules).spans
         
     def _get_boundary_candidates(self, path: Path):
         
         text = self.documents[path.name].full_text
-        candidates = []
-        for rule in self.documents[path.name].plan["segment_header_rules"]:
-            try:
-                candidates.extend(re.finditer(rule, text, flags=re.MULTILINE))
-            except re.error:
-                continue
-        
-        # order and deduplicate candidates
-        candidates = sorted(candidates, key=lambda c: c.start())
-        unique_candidates = []
-        last_end = -1
-        for candidate in candidates:
-            if candidate.start() >= last_end:
-                unique_candidates.append(candidate)
-                last_end = candidate.end()
-        candidates = unique_candidates
+        result = self.header_matcher.match(
+            text, self.documents[path.name].plan["segment_header_rules"]
+        )
+        for rule, reason in result.rejected.items():
+            tqdm.write(f"  {path.name}: dropped header rule {rule!r} ({reason})")
+        candidates = result.spans
         
         candidate_texts = []
-        for candidate in candidates:
+        for start, end in candidates:
         
-            pretext = text[candidate.start() - self.boundary_padding:candidate.start()]
-            posttext = text[candidate.end():candidate.end() + self.boundary_padding]
+            pretext = text[max(0, start - self.boundary_padding):start]
+            posttext = text[end:end + self.boundary_padding]
         
             candidate_texts.append(
                 "".join([
                     pretext,
                     "<BOUNDARY/>",
-                    text[candidate.start():candidate.end()],
+                    text[start:end],
                     posttext
                 ])
             )
             
         return candidates, candidate_texts
             
-    def _evaluate_candidates(self, path: Path, candidates: list[re.Match], candidate_texts: list[str]):
-        """Ask the boundary model which regex candidates are true segment starts."""
-        
-        if os.path.exists(self.output_dir / path.name / "boundary_evaluations.json"):
-            with open(self.output_dir / path.name / "boundary_evaluations.json", "r") as f:
-                evaluations = json.load(f)
-            return evaluations
-        
-        plan = self.documents[path.name].plan
+    def _load_cached_evaluations(
+        self, path: Path, candidates: list[tuple[int, int]]
+    ) -> list[dict] | None:
+        evaluations_path = self.output_dir / path.name / "boundary_evaluations.json"
+        if not evaluations_path.exists():
+            return None
+        with open(evaluations_path, "r") as f:
+            evaluations = json.load(f)
+        if len(evaluations) != len(candidates):
+            # Cached against a different candidate list (e.g. before a rule was dropped).
+            tqdm.write(
+                f"  {path.name}: cached evaluations cover {len(evaluations)} of "
+                f"{len(candidates)} candidates; re-evaluating"
+            )
+            return None
+        # Evaluations saved with their spans must line up span for span; older
+        # files without spans can only be checked by count.
+        if any(
+            isinstance(e, dict) and "span" in e and tuple(e["span"]) != tuple(candidate)
+            for e, candidate in zip(evaluations, candidates)
+        ):
+            tqdm.write(f"  {path.name}: cached evaluations are for different candidate spans; re-evaluating")
+            return None
+        return evaluations
+
+    def _save_evaluations(self, path: Path, candidates: list[tuple[int, int]], evaluations: list[dict]):
+        os.makedirs(self.output_dir / path.name, exist_ok=True)
+        with open(self.output_dir / path.name / "boundary_evaluations.json", "w") as f:
+            json.dump(
+                [{**evaluation, "span": list(candidate)} for evaluation, candidate in zip(evaluations, candidates)],
+                f,
+                indent=4,
+            )
+
+    @staticmethod
+    def _boundary_prompt(plan: dict) -> tuple[str, dict]:
+        """Return the system prompt and response schema for one boundary decision."""
         
         system_prompt = "\n".join([
             "You are an expert in understanding formal document structures.",
@@ -284,54 +413,157 @@ class SegmentationRunner:
                 }
             }
         }
+        return system_prompt, schema
+
+    @staticmethod
+    def _batch_boundary_prompt(plan: dict) -> tuple[str, dict]:
+        """Return the system prompt and response schema for a batch of boundary decisions."""
         
-        @retry(
-            retry=retry_if_exception_type(Exception),
-            wait=wait_exponential(multiplier=1, min=1, max=8),
-            stop=stop_after_attempt(3),
-            reraise=True,
-        )
-        async def _evaluate_one(idx: int, candidate_text: str):
-            response = await asyncio.to_thread(
-                self.client.chat.completions.create,
-                model=self.boundary_model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": system_prompt
+        system_prompt = "\n".join([
+            "You are an expert in understanding formal document structures.",
+            "You've been asked to segment a collective bargaining agreement",
+            f"by reviewing candidate boundaries between {plan['segment_type']} of the document.",
+            "You will receive several numbered candidates, each wrapped in <CANDIDATE index=\"N\"> tags.",
+            f"For each candidate, decide whether the boundary marked by <BOUNDARY/> is above the {plan['segment_type']} header",
+            f"Some examples of {plan['segment_type']} headers are: {', '.join(plan['segment_header_examples'])}",
+            f"You should aim for high precision in identifying true {plan['segment_type']} boundaries,",
+            f"so only mark a boundary as valid if you are confident it indicates the start of a new {plan['segment_type']}.",
+            "If the boundary is in a list of sections like a table of contents, it is not a true boundary.",
+            "Judge each candidate on its own text; windows of neighbouring candidates may overlap.",
+            "Return a JSON object with one decision per candidate, in index order:",
+            '{',
+            '  "decisions": [{"index": 0, "is_new_segment": true/false}, ...]',
+            "}",
+            ''
+        ])
+        schema = {
+            "type": "json_schema",
+            "json_schema": {
+                "name": "boundary_evaluation_batch",
+                "strict": True,
+                "schema": {
+                    "type": "object",
+                    "additionalProperties": False,
+                    "properties": {
+                        "decisions": {
+                            "type": "array",
+                            "items": {
+                                "type": "object",
+                                "additionalProperties": False,
+                                "properties": {
+                                    "index": {"type": "integer"},
+                                    "is_new_segment": {"type": "boolean"},
+                                },
+                                "required": ["index", "is_new_segment"],
+                            },
+                        },
                     },
-                    {
-                        "role": "user",
-                        "content": candidate_text
-                    }
-                ],
-                response_format=schema,
-                **{self.max_token_param: 4800},
-                 **({"temperature": 0.0} if self.provider != "openai" else {}),
-            )
-            payload = json.loads(response.choices[0].message.content)
-            return idx, payload
+                    "required": ["decisions"],
+                }
+            }
+        }
+        return system_prompt, schema
 
-        async def _evaluate_all():
-            payloads = [None] * len(candidate_texts)
-            tasks = [
-                asyncio.create_task(_evaluate_one(i, candidate_text))
-                for i, candidate_text in enumerate(candidate_texts)
-            ]
-            for task in tqdm(asyncio.as_completed(tasks), total=len(tasks), desc="Evaluating candidates"):
-                idx, payload = await task
-                payloads[idx] = payload
-            return payloads
+    def _batch_candidates(self, candidate_texts: list[str]) -> list[list[int]]:
+        """Group candidate indices into requests of at most K windows and the char budget."""
+        batches: list[list[int]] = []
+        current: list[int] = []
+        current_chars = 0
+        for idx, candidate_text in enumerate(candidate_texts):
+            if current and (
+                len(current) >= self.boundary_batch_size
+                or current_chars + len(candidate_text) > self.boundary_batch_chars
+            ):
+                batches.append(current)
+                current, current_chars = [], 0
+            current.append(idx)
+            current_chars += len(candidate_text)
+        if current:
+            batches.append(current)
+        return batches
 
-        evaluations = asyncio.run(_evaluate_all())
-            
-        os.makedirs(self.output_dir / path.name, exist_ok=True)
-        with open(self.output_dir / path.name / "boundary_evaluations.json", "w") as f:
-            json.dump(evaluations, f, indent=4)
-            
-        return evaluations
+    @retry(
+        retry=retry_if_exception_type(Exception),
+        wait=wait_exponential(multiplier=1, min=1, max=8),
+        stop=stop_after_attempt(3),
+        reraise=True,
+    )
+    async def _evaluate_batch(self, system_prompt: str, schema: dict, candidate_texts: list[str]) -> list[dict]:
+        """Decide several candidates in one request; raises if any decision is missing."""
+        user_content = "\n\n".join(
+            f'<CANDIDATE index="{i}">\n{candidate_text}\n</CANDIDATE>'
+            for i, candidate_text in enumerate(candidate_texts)
+        )
+        request = dict(
+            model=self.boundary_model,
+            messages=[
+                {
+                    "role": "system",
+                    "content": system_prompt
+                },
+                {
+                    "role": "user",
+                    "content": user_content
+                }
+            ],
+            response_format=schema,
+            # Reasoning budget as for a single decision, plus room for the array.
+            **{self.max_token_param: 4800 + 32 * len(candidate_texts)},
+            **({"temperature": 0.0} if self.provider != "openai" else {}),
+        )
+        response = await self.async_client.chat.completions.create(**request)
+        try:
+            payload = json.loads(response.choices[0].message.content)
+            decisions = {
+                d["index"]: bool(d["is_new_segment"])
+                for d in payload.get("decisions", [])
+                if isinstance(d, dict) and isinstance(d.get("index"), int) and "is_new_segment" in d
+            }
+            missing = [i for i in range(len(candidate_texts)) if i not in decisions]
+            if missing:
+                raise ValueError(f"batch response is missing decisions for candidates {missing}")
+        except (TypeError, ValueError, AttributeError):
+            await asyncio.to_thread(reject_response, self.async_client, request)
+            raise
+        await asyncio.to_thread(accept_response, self.async_client, request, response)
+        return [{"is_new_segment": decisions[i]} for i in range(len(candidate_texts))]
+
+    @retry(
+        retry=retry_if_exception_type(Exception),
+        wait=wait_exponential(multiplier=1, min=1, max=8),
+        stop=stop_after_attempt(3),
+        reraise=True,
+    )
+    async def _evaluate_one(self, system_prompt: str, schema: dict, candidate_text: str) -> dict:
+        """Ask the boundary model whether one regex candidate is a true segment start."""
+        request = dict(
+            model=self.boundary_model,
+            messages=[
+                {
+                    "role": "system",
+                    "content": system_prompt
+                },
+                {
+                    "role": "user",
+                    "content": candidate_text
+                }
+            ],
+            response_format=schema,
+            **{self.max_token_param: 4800},
+            **({"temperature": 0.0} if self.provider != "openai" else {}),
+        )
+        response = await self.async_client.chat.completions.create(**request)
+        try:
+            payload = json.loads(response.choices[0].message.content)
+            if not isinstance(payload, dict) or "is_new_segment" not in payload:
+                raise ValueError("boundary response has no is_new_segment field")
+        except (TypeError, ValueError):
+            await asyncio.to_thread(reject_response, self.async_client, request)
+            raise
+        await asyncio.to_thread(accept_response, self.async_client, request, response)
+        return payload
     
-    def _create_segments(self, path: Path, candidates: list[re.Match], evaluations: list[dict]):
+    def _create_segments(self, path: Path, candidates: list[tuple[int, int]], evaluations: list[dict]):
         
         plan = self.documents[path.name].plan
         text = self.documents[path.name].full_text
@@ -342,7 +574,7 @@ class SegmentationRunner:
             spans.append((0, len(text)))
         else:
             valid_boundary_starts = [
-                candidate.start()
+                candidate[0]
                 for i, candidate in enumerate(candidates)
                 if i < len(evaluations) and evaluations[i].get("is_new_segment", False)
             ]
@@ -389,19 +621,48 @@ class SegmentationRunner:
                     for s in self.documents[path.name].segments.values()
                 },
                 "plan": self.documents[path.name].plan,
+                "plan_reused_from": self.documents[path.name].plan_reused_from,
             }, f, indent=4)
             
         with open(doc_output_dir / "full_text.txt", "w") as f:
             f.write(self.documents[path.name].full_text)
             
         segment_path = doc_output_dir / "segments"
+        if not self.write_segment_files:
+            # Spans in document_meta.json are the current copy. Older segment
+            # files are kept for readers that do not use SegmentStore yet.
+            if any(segment_path.glob("segment_*.txt")):
+                tqdm.write(
+                    f"  {path.name}: keeping segment files from an earlier run in {segment_path}; "
+                    "they may not match the new spans"
+                )
+            return
         os.makedirs(segment_path, exist_ok=True)
         for segment in self.documents[path.name].segments.values():
             segment_text = self.documents[path.name].full_text[segment.span[0]:segment.span[1]]
             with open(doc_output_dir / "segments" / f"segment_{segment.number}.txt", "w") as f:
                 f.write(segment_text)
         
-    def _process_document(self, path: Path):
+    async def _evaluate_indices(self, state: dict, batch_texts: list[str]) -> list[dict]:
+        """Evaluate one queued group of candidates, batched when it has several."""
+        if len(batch_texts) == 1:
+            system_prompt, schema = state["prompt"]
+            return [await self._evaluate_one(system_prompt, schema, batch_texts[0])]
+        system_prompt, schema = state["batch_prompt"]
+        try:
+            return await self._evaluate_batch(system_prompt, schema, batch_texts)
+        except Exception as exc:
+            # A batch the model cannot answer completely is decided one by one,
+            # sequentially, so this evaluator still holds one request in flight.
+            tqdm.write(f"  batch of {len(batch_texts)} failed ({exc}); evaluating individually")
+            system_prompt, schema = state["prompt"]
+            return [
+                await self._evaluate_one(system_prompt, schema, candidate_text)
+                for candidate_text in batch_texts
+            ]
+
+    def _prepare_document(self, path: Path) -> tuple[list[tuple[int, int]], list[str]]:
+        """Load pages, plan the segmentation and find boundary candidates."""
         
         self.documents[path.name] = Document(
             document_id=path.name,
@@ -413,12 +674,172 @@ class SegmentationRunner:
         
         self._process_pages(path)
         self._plan_segmentation(path)
-        candidates, candidate_texts = self._get_boundary_candidates(path)
-        print(f"Assessing {len(candidates)} boundary candidates for document {path.name}")
-        evaluations = self._evaluate_candidates(path, candidates, candidate_texts)
-        self._create_segments(path, candidates, evaluations)
-        self._save_documents(path)
-        
+        return self._get_boundary_candidates(path)
+
+    def _prefilter_candidates(self, path: Path, candidates: list[tuple[int, int]]) -> list[dict | None]:
+        """Decide confident candidates locally; None entries still need the LLM."""
+        if self.boundary_prefilter is None or not candidates:
+            return [None] * len(candidates)
+        features = candidate_features(self.documents[path.name].full_text, candidates)
+        return [
+            None if decision is None
+            else {"is_new_segment": decision, "source": "prefilter", "confidence": round(p, 4)}
+            for decision, p in self.boundary_prefilter.decide(features)
+        ]
+
+    def _finish_document(self, path: Path, candidates: list[tuple[int, int]], evaluations: list[dict]):
+        try:
+            self._create_segments(path, candidates, evaluations)
+            self._save_documents(path)
+        finally:
+            self.documents.pop(path.name, None)
+
+    async def _run_async(self, paths: Iterable[Path]):
+        """Prepare documents concurrently and evaluate all their candidates from one queue.
+
+        Preparation (page loading, planning, regex matching) runs in threads,
+        `planning_concurrency` documents at a time. Every uncached candidate
+        goes onto a single bounded queue drained by `boundary_concurrency`
+        workers, and a document is written and released as soon as its last
+        candidate is decided. `paths` is consumed lazily, and the bounded
+        queues keep only a few documents in memory at once.
+        """
+        path_queue: asyncio.Queue[Path | None] = asyncio.Queue(maxsize=self.planning_concurrency * 2)
+        eval_queue: asyncio.Queue[tuple[Path, list[int], list[str]] | None] = asyncio.Queue(
+            maxsize=self.boundary_concurrency * 4
+        )
+        pending: dict[str, dict] = {}
+        failed_documents: list[str] = []
+        finished = 0
+        queued = 0
+        prefiltered = 0
+        progress = tqdm(total=0, desc="Evaluating candidates", unit="candidate")
+
+        async def finish(path: Path, candidates: list[tuple[int, int]], evaluations: list[dict]):
+            nonlocal finished
+            await asyncio.to_thread(self._finish_document, path, candidates, evaluations)
+            finished += 1
+
+        async def feeder():
+            nonlocal queued
+            for path in paths:
+                await path_queue.put(path)
+                queued += 1
+            for _ in range(self.planning_concurrency):
+                await path_queue.put(None)
+
+        async def preparer():
+            nonlocal prefiltered
+            while True:
+                path = await path_queue.get()
+                if path is None:
+                    return
+                try:
+                    candidates, candidate_texts = await asyncio.to_thread(self._prepare_document, path)
+                    evaluations = self._load_cached_evaluations(path, candidates)
+                    if evaluations is None and not candidates:
+                        evaluations = []
+                        await asyncio.to_thread(self._save_evaluations, path, candidates, evaluations)
+                    if evaluations is not None:
+                        await finish(path, candidates, evaluations)
+                        continue
+
+                    evaluations = await asyncio.to_thread(self._prefilter_candidates, path, candidates)
+                    undecided = [i for i, evaluation in enumerate(evaluations) if evaluation is None]
+                    prefiltered += len(candidates) - len(undecided)
+                    if not undecided:
+                        await asyncio.to_thread(self._save_evaluations, path, candidates, evaluations)
+                        await finish(path, candidates, evaluations)
+                        continue
+
+                    # Batch positions refer to `undecided`; map them back to candidate indices.
+                    batches = [
+                        [undecided[i] for i in batch]
+                        for batch in self._batch_candidates([candidate_texts[i] for i in undecided])
+                    ]
+                    tqdm.write(
+                        f"Queueing {len(undecided)} boundary candidates for document {path.name} "
+                        f"in {len(batches)} request(s)"
+                        + (
+                            f"; {len(candidates) - len(undecided)} decided by the prefilter"
+                            if len(undecided) < len(candidates) else ""
+                        )
+                    )
+                    plan = self.documents[path.name].plan
+                    pending[path.name] = {
+                        "path": path,
+                        "candidates": candidates,
+                        "evaluations": evaluations,
+                        "remaining": len(undecided),
+                        "prompt": self._boundary_prompt(plan),
+                        "batch_prompt": self._batch_boundary_prompt(plan),
+                        "failed": False,
+                    }
+                    progress.total += len(undecided)
+                    progress.refresh()
+                    for batch in batches:
+                        await eval_queue.put((path, batch, [candidate_texts[i] for i in batch]))
+                except Exception as exc:
+                    self.documents.pop(path.name, None)
+                    failed_documents.append(path.name)
+                    tqdm.write(f"  {path.name}: FAILED during preparation - {exc}")
+
+        async def evaluator():
+            while True:
+                item = await eval_queue.get()
+                if item is None:
+                    return
+                path, indices, batch_texts = item
+                state = pending[path.name]
+                try:
+                    if not state["failed"]:
+                        results = await self._evaluate_indices(state, batch_texts)
+                        for idx, evaluation in zip(indices, results):
+                            state["evaluations"][idx] = evaluation
+                except Exception as exc:
+                    state["failed"] = True
+                    failed_documents.append(path.name)
+                    tqdm.write(f"  {path.name} candidates {indices[0]}-{indices[-1]}: FAILED - {exc}")
+                finally:
+                    progress.update(len(indices))
+                    state["remaining"] -= len(indices)
+                    if state["remaining"] == 0:
+                        del pending[path.name]
+                        if state["failed"]:
+                            self.documents.pop(path.name, None)
+                        else:
+                            try:
+                                await asyncio.to_thread(self._save_evaluations, path, state["candidates"], state["evaluations"])
+                                await finish(path, state["candidates"], state["evaluations"])
+                            except Exception as exc:
+                                failed_documents.append(path.name)
+                                tqdm.write(f"  {path.name}: FAILED while saving - {exc}")
+
+        feeder_task = asyncio.create_task(feeder())
+        preparers = [asyncio.create_task(preparer()) for _ in range(self.planning_concurrency)]
+        evaluators = [asyncio.create_task(evaluator()) for _ in range(self.boundary_concurrency)]
+        try:
+            await asyncio.gather(feeder_task, *preparers)
+            for _ in evaluators:
+                await eval_queue.put(None)
+            await asyncio.gather(*evaluators)
+        finally:
+            for task in [feeder_task, *preparers, *evaluators]:
+                task.cancel()
+            progress.close()
+            await self.async_client.close()
+            if self.plan_library is not None:
+                self.plan_library.save()
+            self.header_matcher.close()
+
+        print(
+            f"Segmented {finished}/{queued} documents"
+            + (f"; {prefiltered} candidates decided by the prefilter" if self.boundary_prefilter else "")
+            + (f"; failed: {', '.join(sorted(set(failed_documents)))}" if failed_documents else "")
+        )
+        if self.llm_cache is not None:
+            print(self.llm_cache.summary())
+
     def run(
         self,
         sample_size: int | None = None,
@@ -427,30 +848,32 @@ class SegmentationRunner:
     ):
         """Process all selected OCR documents and write segment files to disk."""
         
-        paths = sorted(self.input_dir.glob("*/"), key=lambda p: p.name)
-
-        if document_id is not None:
-            paths = [p for p in paths if p.name == document_id]
-
-        if cached_only:
-            paths = [
-                p for p in paths
-                if (self.output_dir / p.name / "document_meta.json").exists()
-                or (self.output_dir / p.name / "boundary_evaluations.json").exists()
-            ]
+        paths: Iterable[Path] = self._iter_input_dirs(document_id=document_id, cached_only=cached_only)
 
         if sample_size is not None:
+            paths = list(paths)
             random.shuffle(paths)
             paths = paths[:sample_size]
         
         print(
-            f"Processing {len(paths)} documents from {self.input_dir} "
-            f"(cached_only={cached_only})"
+            f"Processing {f'{len(paths)} ' if isinstance(paths, list) else ''}documents from {self.input_dir} "
+            f"(cached_only={cached_only}, boundary_concurrency={self.boundary_concurrency})"
         )
-            
-        for path in paths:
-            print(f"Processing document: {path.name}")
-            self._process_document(path)
+
+        asyncio.run(self._run_async(paths))
+
+    def _iter_input_dirs(self, document_id: str | None = None, cached_only: bool = False) -> Iterator[Path]:
+        """Yield selected OCR document directories in name order, checking each lazily."""
+        names = sorted(entry.name for entry in os.scandir(self.input_dir) if entry.is_dir())
+        for name in names:
+            if document_id is not None and name != document_id:
+                continue
+            if cached_only and not (
+                (self.output_dir / name / "document_meta.json").exists()
+                or (self.output_dir / name / "boundary_evaluations.json").exists()
+            ):
+                continue
+            yield self.input_dir / name
         
         
         
@@ -485,6 +908,73 @@ def main():
         action="store_false",
         help="Process all matching OCR documents, including fresh runs without cache artifacts.",
     )
+    parser.add_argument(
+        "--boundary-concurrency",
+        type=int,
+        default=32,
+        help="Boundary evaluation requests in flight across all documents.",
+    )
+    parser.add_argument(
+        "--planning-concurrency",
+        type=int,
+        default=4,
+        help="Documents loaded and planned at once while evaluations run.",
+    )
+    parser.add_argument(
+        "--boundary-batch-size",
+        type=int,
+        default=1,
+        help="Candidates decided per boundary request; values above 1 enable batched mode.",
+    )
+    parser.add_argument(
+        "--boundary-batch-chars",
+        type=int,
+        default=24000,
+        help="Maximum characters of candidate windows packed into one batched request.",
+    )
+    parser.add_argument(
+        "--boundary-prefilter",
+        type=str,
+        default=None,
+        help=(
+            "Boundary prefilter model (e.g. $CACHE_DIR/02_segmentation_output/boundary_prefilter.json); "
+            "confident candidates skip the LLM."
+        ),
+    )
+    parser.add_argument(
+        "--header-rule-timeout",
+        type=float,
+        default=20.0,
+        help="Seconds a document's header-rule scan may run before slow rules are dropped.",
+    )
+    parser.add_argument(
+        "--no-plan-reuse",
+        dest="plan_reuse",
+        action="store_false",
+        help="Always call the planning model instead of reusing plans from the plan library.",
+    )
+    parser.add_argument(
+        "--plan-min-hit-rate",
+        type=float,
+        default=0.9,
+        help="Share of a document's header lines a stored plan's rules must match to be reused.",
+    )
+    parser.add_argument(
+        "--no-segment-files",
+        dest="write_segment_files",
+        action="store_false",
+        help=(
+            "Keep segments only as spans in document_meta.json instead of also writing "
+            "segments/segment_*.txt (existing segment files are kept but may be stale). "
+            "Every reader of the output must use SegmentStore."
+        ),
+    )
+    parser.add_argument(
+        "--no-llm-cache",
+        dest="llm_cache",
+        action="store_false",
+        help="Bypass the shared LLM response cache ($CACHE_DIR/llm_response_cache.sqlite).",
+    )
     args = parser.parse_args()
 
     cache_dir = os.environ.get("CACHE_DIR")
@@ -498,7 +988,17 @@ def main():
         planning_perc=.1,
         boundary_model='gpt-5-mini',
         boundary_padding=300,
-        provider="openai"
+        provider="openai",
+        boundary_concurrency=args.boundary_concurrency,
+        planning_concurrency=args.planning_concurrency,
+        boundary_batch_size=args.boundary_batch_size,
+        boundary_batch_chars=args.boundary_batch_chars,
+        boundary_prefilter=args.boundary_prefilter,
+        header_rule_timeout=args.header_rule_timeout,
+        plan_reuse=args.plan_reuse,
+        plan_min_hit_rate=args.plan_min_hit_rate,
+        write_segment_files=args.write_segment_files,
+        llm_cache=args.llm_cache,
     )
     runner.run(
         sample_size=args.sample_size,
@@ -12,16 +12,40 @@ import json
 import os
 import random
 import re
+import sys
 from dataclasses import dataclass
 from pathlib import Path
 from threading import Lock
 from typing import Any
 
+import numpy as np
 from dotenv import load_dotenv
 from openai import OpenAI
-from sentence_transformers import SentenceTransformer, util
+from sentence_transformers import SentenceTransformer
 from tqdm import tqdm
 
+try:
+    from pipeline.utils.segment_store import SegmentDocument, SegmentRef, SegmentStore
+    from pipeline.utils.llm_cache import (
+        accept_response,
+        open_response_cache,
+        reject_response,
+        with_response_cache,
+    )
+    from pipeline.utils.embedding_cache import EmbeddingCache, file_sha256
+except ModuleNotFoundError:
+    ROOT_DIR = Path(__file__).resolve().parents[2]
+    if str(ROOT_DIR) not in sys.path:
+        sys.path.insert(0, str(ROOT_DIR))
+    from pipeline.utils.segment_store import SegmentDocument, SegmentRef, SegmentStore
+    from pipeline.utils.llm_cache import (
+        accept_response,
+        open_response_cache,
+        reject_response,
+        with_response_cache,
+    )
+    from pipeline.utils.embedding_cache import EmbeddingCache, file_sha256
+
 load_dotenv()
 
 
@@ -145,10 +169,14 @@ class ClauseExtractionRunner:
         max_tokens: int = 2048,
         max_retries: int = 2,
         timeout: float = 120.0,
+        llm_cache: bool = True,
+        embedding_batch_size: int = 256,
+        embedding_cache: bool = True,
     ):
         self.cache_dir = Path(cache_dir)
         self.input_dir = self.cache_dir / input_dir
         self.output_dir = self.cache_dir / output_dir
+        self.segment_store = SegmentStore(self.input_dir)
 
         if taxonomy_path.is_absolute():
             self.taxonomy_path = taxonomy_path
@@ -159,6 +187,7 @@ class ClauseExtractionRunner:
         self.model = model
         self.embedding_model_name = embedding_model
         self.candidate_k = max(1, int(candidate_k))
+        self.embedding_batch_size = max(1, int(embedding_batch_size))
         self.temperature = temperature
         self.max_tokens = max_tokens
         self.max_retries = max_retries
@@ -169,7 +198,10 @@ class ClauseExtractionRunner:
             raise RuntimeError("OPENROUTER_API_KEY is not set")
 
         base_url = os.environ.get("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
-        self.client = OpenAI(api_key=api_key, base_url=base_url, timeout=timeout)
+        self.llm_cache = open_response_cache(self.cache_dir) if llm_cache else None
+        self.client = with_response_cache(
+            OpenAI(api_key=api_key, base_url=base_url, timeout=timeout), self.llm_cache
+        )
 
         self.features = parse_taxonomy(self.taxonomy_path)
         self.prompt = build_prompt()
@@ -183,22 +215,21 @@ class ClauseExtractionRunner:
 
         self.retrieval_features = [f for f in self.features if f.name != "OTHER"]
         self.embedding_lock = Lock()
-        self.embedding_model = SentenceTransformer(self.embedding_model_name)
-        self.feature_embeddings = None
+        # Loaded on first encode, so runs served entirely from the cache skip it.
+        self._embedding_model: SentenceTransformer | None = None
+        self.embedding_cache = (
+            EmbeddingCache(self.cache_dir / "embedding_cache", self.embedding_model_name)
+            if embedding_cache else None
+        )
+        self.feature_embeddings: np.ndarray | None = None
         if self.retrieval_features:
-            self.feature_embeddings = self.embedding_model.encode(
-                [self._feature_to_embedding_text(f) for f in self.retrieval_features],
-                convert_to_tensor=True,
-                normalize_embeddings=True,
-                show_progress_bar=False,
-            )
-
-    @staticmethod
-    def _parse_segment_number(path: Path) -> int | None:
-        m = re.match(r"segment_(\d+)\.txt$", path.name)
-        if not m:
-            return None
-        return int(m.group(1))
+            feature_texts = [self._feature_to_embedding_text(f) for f in self.retrieval_features]
+            if self.embedding_cache is not None:
+                self.feature_embeddings = self.embedding_cache.taxonomy(
+                    file_sha256(self.taxonomy_path), feature_texts, self._encode_texts
+                )
+            else:
+                self.feature_embeddings = self._encode_texts(feature_texts)
 
     @staticmethod
     def _load_cache(path: Path) -> dict[str, Any]:
@@ -227,43 +258,94 @@ class ClauseExtractionRunner:
     def _format_candidates_for_prompt(candidates: list[dict[str, Any]]) -> str:
         return json.dumps(candidates, ensure_ascii=False, indent=2)
 
-    def _retrieve_top_candidates(self, text: str) -> list[dict[str, Any]]:
-        """Rank likely clause labels via sentence-transformer similarity search."""
-        if not self.retrieval_features or self.feature_embeddings is None:
-            return []
+    def _encode_texts(self, texts: list[str]) -> np.ndarray:
+        if self._embedding_model is None:
+            self._embedding_model = SentenceTransformer(self.embedding_model_name)
+        vectors = self._embedding_model.encode(
+            texts,
+            batch_size=min(len(texts), self.embedding_batch_size),
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False,
+        )
+        return np.asarray(vectors, dtype=np.float32)
 
+    def _encode_segments(self, texts: list[str]) -> np.ndarray:
         with self.embedding_lock:
-            segment_embedding = self.embedding_model.encode(
-                [text],
-                convert_to_tensor=True,
-                normalize_embeddings=True,
-                show_progress_bar=False,
-            )
-            scores = util.cos_sim(segment_embedding, self.feature_embeddings)[0]
+            if self.embedding_cache is not None:
+                return self.embedding_cache.embed(texts, self._encode_texts)
+            return self._encode_texts(texts)
 
+    def _retrieve_top_candidates_batch(self, texts: list[str]) -> list[list[dict[str, Any]]]:
+        """Rank likely clause labels for many segments with one encode and one top-k."""
         k = min(self.candidate_k, len(self.retrieval_features))
-        if k <= 0:
-            return []
-
-        top = scores.topk(k=k)
-        top_indices = top.indices.tolist()
-        top_scores = top.values.tolist()
+        if not texts or k <= 0 or self.feature_embeddings is None:
+            return [[] for _ in texts]
+
+        # Both sides are L2-normalized, so the dot product is the cosine similarity.
+        scores = self._encode_segments(texts) @ self.feature_embeddings.T
+        top_idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top_idx, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top_idx = np.take_along_axis(top_idx, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        results: list[list[dict[str, Any]]] = []
+        for top_indices, top_scores in zip(top_idx.tolist(), top_scores.tolist()):
+            candidates: list[dict[str, Any]] = []
+            for idx, score in zip(top_indices, top_scores):
+                feature = self.retrieval_features[int(idx)]
+                candidates.append(
+                    {
+                        "feature_name": feature.name,
+                        "similarity": float(score),
+                        "tldr": feature.tldr,
+                        "description": feature.description,
+                    }
+                )
+            results.append(candidates)
+        return results
 
-        candidates: list[dict[str, Any]] = []
-        for idx, score in zip(top_indices, top_scores):
-            feature = self.retrieval_features[int(idx)]
-            candidates.append(
-                {
-                    "feature_name": feature.name,
-                    "similarity": float(score),
-                    "tldr": feature.tldr,
-                    "description": feature.description,
-                }
-            )
-        return candidates
+    def _retrieve_top_candidates(self, text: str) -> list[dict[str, Any]]:
+        """Rank likely clause labels via sentence-transformer similarity search."""
+        return self._retrieve_top_candidates_batch([text])[0]
 
-    def _classify_segment(self, text: str) -> tuple[list[str], list[dict[str, Any]]]:
-        candidates = self._retrieve_top_candidates(text)
+    def _iter_job_batches(self, jobs: list[tuple[str, int, SegmentRef, Path]]):
+        """Yield jobs as (doc_id, segment_number, text, output_path) in embedding-sized batches."""
+        # Jobs are in document order, so each full_text.txt is opened once.
+        document: SegmentDocument | None = None
+        batch: list[tuple[str, int, str, Path]] = []
+        try:
+            for doc_id, segment_number, segment, output_path in jobs:
+                if document is None or document.doc_dir.name != doc_id:
+                    if document is not None:
+                        document.close()
+                    document = self.segment_store.open(doc_id)
+                batch.append((doc_id, segment_number, document.text(segment).strip(), output_path))
+                if len(batch) >= self.embedding_batch_size:
+                    yield batch
+                    batch = []
+        finally:
+            if document is not None:
+                document.close()
+        if batch:
+            yield batch
+
+    def _retrieve_candidates_for_batch(self, texts: list[str]) -> list[list[dict[str, Any]] | None]:
+        """Candidates per text; None for empty texts, which skip classification."""
+        results: list[list[dict[str, Any]] | None] = [None] * len(texts)
+        non_empty = [i for i, text in enumerate(texts) if text]
+        for i, candidates in zip(non_empty, self._retrieve_top_candidates_batch([texts[i] for i in non_empty])):
+            results[i] = candidates
+        return results
+
+    def _classify_segment(
+        self,
+        text: str,
+        candidates: list[dict[str, Any]] | None = None,
+    ) -> tuple[list[str], list[dict[str, Any]]]:
+        if candidates is None:
+            candidates = self._retrieve_top_candidates(text)
         candidate_names = [c["feature_name"] for c in candidates]
 
         if not candidate_names:
@@ -303,13 +385,11 @@ class ClauseExtractionRunner:
                 ],
                 max_tokens=self.max_tokens,
                 temperature=self.temperature,
+                response_format={"type": "json_object"},
             )
 
             try:
-                response = self.client.chat.completions.create(
-                    **kwargs,
-                    response_format={"type": "json_object"},
-                )
+                response = self.client.chat.completions.create(**kwargs)
             except Exception as exc:
                 last_error = exc
                 continue
@@ -317,16 +397,21 @@ class ClauseExtractionRunner:
             content = response.choices[0].message.content or ""
             if not content.strip():
                 last_error = ValueError("Model returned empty response text")
+                reject_response(self.client, kwargs)
                 continue
 
             try:
                 maybe = parse_json_loose(content)
-                if isinstance(maybe, dict):
-                    payload = maybe
-                    break
             except Exception as exc:
                 last_error = exc
+                reject_response(self.client, kwargs)
                 continue
+            if isinstance(maybe, dict):
+                payload = maybe
+                accept_response(self.client, kwargs, response)
+                break
+            last_error = ValueError(f"Expected JSON object response, got {type(maybe).__name__}")
+            reject_response(self.client, kwargs)
 
         if payload is None:
             raise ValueError(
@@ -361,14 +446,8 @@ class ClauseExtractionRunner:
             key=lambda p: int(p.name.split("_")[1]),
         )
 
-    def _list_segment_files(self, doc_dir: Path) -> list[Path]:
-        return sorted(
-            [
-                p for p in doc_dir.glob("segments/segment_*.txt")
-                if p.is_file() and self._parse_segment_number(p) is not None
-            ],
-            key=lambda p: self._parse_segment_number(p) or 10**12,
-        )
+    def _list_segments(self, doc_dir: Path) -> list[SegmentRef]:
+        return self.segment_store.segments(doc_dir.name)
 
     async def run(
         self,
@@ -391,28 +470,25 @@ class ClauseExtractionRunner:
 
         print(f"Processing {len(doc_dirs)} segmented documents from {self.input_dir}")
 
-        jobs: list[tuple[str, int, Path, Path]] = []
+        jobs: list[tuple[str, int, SegmentRef, Path]] = []
         done_by_doc: dict[str, set[int]] = {}
 
         for doc_dir in doc_dirs:
             doc_id = doc_dir.name
-            segment_files = self._list_segment_files(doc_dir)
-            if not segment_files:
+            segments = self._list_segments(doc_dir)
+            if not segments:
                 continue
 
             doc_cache = cache.setdefault("documents", {}).setdefault(doc_id, {})
             done = set(doc_cache.get("processed_segments", []))
             done_by_doc[doc_id] = done
-            doc_cache["total_segments"] = len(segment_files)
+            doc_cache["total_segments"] = len(segments)
 
             out_doc_dir = self.output_dir / doc_id
             out_doc_dir.mkdir(parents=True, exist_ok=True)
 
-            for segment_file in segment_files:
-                segment_number = self._parse_segment_number(segment_file)
-                if segment_number is None:
-                    continue
-
+            for segment in segments:
+                segment_number = segment.number
                 if (not force) and (segment_number in done):
                     continue
 
@@ -423,7 +499,7 @@ class ClauseExtractionRunner:
                     doc_cache["last_processed_segment"] = segment_number
                     continue
 
-                jobs.append((doc_id, segment_number, segment_file, output_path))
+                jobs.append((doc_id, segment_number, segment, output_path))
 
         self._save_cache(self.cache_file, cache)
 
@@ -435,14 +511,33 @@ class ClauseExtractionRunner:
         worker_count = max(1, int(workers))
         print(f"Queued {total_jobs} segments for async classification with {worker_count} workers")
 
-        queue: asyncio.Queue[tuple[str, int, Path, Path] | None] = asyncio.Queue(maxsize=worker_count * 4)
+        queue: asyncio.Queue[tuple[str, int, str, list[dict[str, Any]] | None, Path] | None] = asyncio.Queue(maxsize=worker_count * 4)
         cache_lock = asyncio.Lock()
         progress_lock = asyncio.Lock()
         progress_bar = tqdm(total=total_jobs, desc="Clause classification segments", unit="segment")
 
+        async def _drain_batch(batch: list[tuple[str, int, str, Path]], embedding: asyncio.Task):
+            try:
+                candidates = await embedding
+            except Exception as exc:
+                # Workers fall back to embedding these segments one at a time.
+                print(f"Batch embedding failed for {len(batch)} segments: {exc}")
+                candidates = [None] * len(batch)
+            for (doc_id, segment_number, segment_text, output_path), segment_candidates in zip(batch, candidates):
+                await queue.put((doc_id, segment_number, segment_text, segment_candidates, output_path))
+
         async def _enqueue_jobs():
-            for job in jobs:
-                await queue.put(job)
+            # Embed each batch while the previous one is being handed to the LLM workers.
+            in_flight: tuple[list[tuple[str, int, str, Path]], asyncio.Task] | None = None
+            for batch in self._iter_job_batches(jobs):
+                embedding = asyncio.create_task(
+                    asyncio.to_thread(self._retrieve_candidates_for_batch, [job[2] for job in batch])
+                )
+                if in_flight is not None:
+                    await _drain_batch(*in_flight)
+                in_flight = (batch, embedding)
+            if in_flight is not None:
+                await _drain_batch(*in_flight)
             for _ in range(worker_count):
                 await queue.put(None)
 
@@ -453,9 +548,8 @@ class ClauseExtractionRunner:
                     queue.task_done()
                     return
 
-                doc_id, segment_number, segment_file, output_path = job
+                doc_id, segment_number, segment_text, candidates, output_path = job
                 try:
-                    segment_text = segment_file.read_text(encoding="utf-8", errors="replace").strip()
                     if not segment_text:
                         payload = {
                             "document_id": doc_id,
@@ -471,7 +565,9 @@ class ClauseExtractionRunner:
                         }
                     else:
                         try:
-                            labels, details = await asyncio.to_thread(self._classify_segment, segment_text)
+                            labels, details = await asyncio.to_thread(
+                                self._classify_segment, segment_text, candidates
+                            )
                         except Exception as exc:
                             print(f"Failed classification for {doc_id} segment {segment_number}: {exc}")
                             continue
@@ -505,6 +601,10 @@ class ClauseExtractionRunner:
         await asyncio.gather(_enqueue_jobs(), *[asyncio.create_task(_worker()) for _ in range(worker_count)])
         await queue.join()
         progress_bar.close()
+        if self.llm_cache is not None:
+            print(self.llm_cache.summary())
+        if self.embedding_cache is not None:
+            print(self.embedding_cache.summary())
 
 
 def main():
@@ -526,6 +626,24 @@ def main():
     parser.add_argument("--document-id", type=str, default=None)
     parser.add_argument("--force", action="store_true")
     parser.add_argument("--workers", type=int, default=20)
+    parser.add_argument(
+        "--embedding-batch-size",
+        type=int,
+        default=256,
+        help="Segments embedded per batch before their candidates are queued for the LLM.",
+    )
+    parser.add_argument(
+        "--no-llm-cache",
+        dest="llm_cache",
+        action="store_false",
+        help="Bypass the shared LLM response cache ($CACHE_DIR/llm_response_cache.sqlite).",
+    )
+    parser.add_argument(
+        "--no-embedding-cache",
+        dest="embedding_cache",
+        action="store_false",
+        help="Re-encode every segment instead of reusing $CACHE_DIR/embedding_cache.",
+    )
     args = parser.parse_args()
 
     if not args.cache_dir:
@@ -543,6 +661,9 @@ def main():
         max_tokens=args.max_tokens,
         max_retries=args.max_retries,
         timeout=args.timeout,
+        llm_cache=args.llm_cache,
+        embedding_batch_size=args.embedding_batch_size,
+        embedding_cache=args.embedding_cache,
     )
     asyncio.run(
         runner.run(
@@ -14,6 +14,7 @@ import math
 import os
 import random
 import re
+import sys
 from collections import Counter
 from pathlib import Path
 from typing import Any, Iterable
@@ -21,6 +22,14 @@ from typing import Any, Iterable
 from dotenv import load_dotenv
 from tqdm import tqdm
 
+try:
+    from pipeline.utils.segment_store import SegmentStore
+except ModuleNotFoundError:
+    ROOT_DIR = Path(__file__).resolve().parents[2]
+    if str(ROOT_DIR) not in sys.path:
+        sys.path.insert(0, str(ROOT_DIR))
+    from pipeline.utils.segment_store import SegmentStore
+
 load_dotenv()
 
 SENTENCE_TYPES = ("obligations", "rights", "permissions", "prohibitions", "other")
@@ -290,11 +299,6 @@ def _parse_document_num(path: Path) -> int:
     return int(m.group(1)) if m else 10**12
 
 
-def _parse_segment_num(path: Path) -> int:
-    m = re.match(r"segment_(\d+)\.txt$", path.name)
-    return int(m.group(1)) if m else 10**12
-
-
 def _compile_agent_matchers() -> dict[str, list[re.Pattern[str]]]:
     compiled: dict[str, list[re.Pattern[str]]] = {}
     for agent_type, phrases in AGENT_KEYWORDS.items():
@@ -1146,6 +1150,7 @@ class GenerosityAshRunner:
         self.input_dir = _resolve_io_path(input_dir, cache_base)
         self.classification_dir = _resolve_io_path(classification_dir, cache_base)
         self.output_dir = _resolve_io_path(output_dir, cache_base)
+        self.segment_store = SegmentStore(self.input_dir)
         self.model = model
         self.include_tokens = include_tokens
         self.nlp = _load_nlp(self.model)
@@ -1159,16 +1164,6 @@ class GenerosityAshRunner:
         ]
         return sorted(candidates, key=_parse_document_num)
 
-    @staticmethod
-    def _list_segment_files(doc_dir: Path) -> list[Path]:
-        return sorted(
-            [
-                p for p in doc_dir.glob("segments/segment_*.txt")
-                if p.is_file() and _parse_segment_num(p) != 10**12
-            ],
-            key=_parse_segment_num,
-        )
-
     def _load_segment_clause_type(self, document_id: str, segment_number: int) -> str:
         payload_path = self.classification_dir / document_id / f"segment_{segment_number}.json"
         if not payload_path.exists():
@@ -1256,102 +1251,100 @@ class GenerosityAshRunner:
                 doc_out_dir = self.output_dir / doc_id
                 doc_out_dir.mkdir(parents=True, exist_ok=True)
 
-                segment_files = self._list_segment_files(doc_dir)
-                if max_segments is not None:
-                    segment_files = segment_files[:max(0, int(max_segments))]
-
-                doc_sentence_type_counts: Counter = Counter()
-                doc_auth_category_counts: Counter = Counter()
-                doc_agent_counts: Counter = Counter()
-                doc_agent_sentence_type_counts = _init_nested_agent_counter()
-                doc_agent_auth_category_counts = _init_nested_agent_counter()
-                doc_sentences_processed = 0
-                doc_statement_rows = 0
-                doc_worker_benefit_total = 0
-                doc_firm_benefit_total = 0
-                doc_segment_generosity_rows = 0
-
-                for segment_path in tqdm(segment_files, desc=f"04_generosity_ash {doc_id}", unit="segment"):
-                    segment_number = _parse_segment_num(segment_path)
-                    if segment_number == 10**12:
-                        continue
-
-                    segment_text = segment_path.read_text(encoding="utf-8", errors="replace")
-                    sentence_payloads = _parse_segment(self.nlp, segment_text, self.include_tokens)
-                    segment_totals = _segment_totals(sentence_payloads)
-                    segment_clause_type = self._load_segment_clause_type(doc_id, segment_number)
-                    segment_generosity = _compute_segment_generosity(segment_totals)
-                    segment_generosity_row = {
-                        "document_id": doc_id,
-                        "segment_number": segment_number,
-                        "clause_type": segment_clause_type,
-                        **segment_generosity,
-                    }
-
-                    statement_rows: list[dict[str, Any]] = []
-                    for sentence_payload in sentence_payloads:
-                        classification = sentence_payload.get("classification", {})
-                        if isinstance(classification, dict):
-                            _update_counters_from_classification(
-                                classification,
-                                doc_sentence_type_counts,
-                                doc_auth_category_counts,
-                                doc_agent_counts,
-                                doc_agent_sentence_type_counts,
-                                doc_agent_auth_category_counts,
-                            )
-                            _update_counters_from_classification(
-                                classification,
-                                global_sentence_type_counts,
-                                global_auth_category_counts,
-                                global_agent_counts,
-                                global_agent_sentence_type_counts,
-                                global_agent_auth_category_counts,
+                with self.segment_store.open(doc_id) as segment_doc:
+                    segments = segment_doc.segments
+                    if max_segments is not None:
+                        segments = segments[:max(0, int(max_segments))]
+
+                    doc_sentence_type_counts: Counter = Counter()
+                    doc_auth_category_counts: Counter = Counter()
+                    doc_agent_counts: Counter = Counter()
+                    doc_agent_sentence_type_counts = _init_nested_agent_counter()
+                    doc_agent_auth_category_counts = _init_nested_agent_counter()
+                    doc_sentences_processed = 0
+                    doc_statement_rows = 0
+                    doc_worker_benefit_total = 0
+                    doc_firm_benefit_total = 0
+                    doc_segment_generosity_rows = 0
+
+                    for segment in tqdm(segments, desc=f"04_generosity_ash {doc_id}", unit="segment"):
+                        segment_number = segment.number
+                        segment_text = segment_doc.text(segment)
+                        sentence_payloads = _parse_segment(self.nlp, segment_text, self.include_tokens)
+                        segment_totals = _segment_totals(sentence_payloads)
+                        segment_clause_type = self._load_segment_clause_type(doc_id, segment_number)
+                        segment_generosity = _compute_segment_generosity(segment_totals)
+                        segment_generosity_row = {
+                            "document_id": doc_id,
+                            "segment_number": segment_number,
+                            "clause_type": segment_clause_type,
+                            **segment_generosity,
+                        }
+
+                        statement_rows: list[dict[str, Any]] = []
+                        for sentence_payload in sentence_payloads:
+                            classification = sentence_payload.get("classification", {})
+                            if isinstance(classification, dict):
+                                _update_counters_from_classification(
+                                    classification,
+                                    doc_sentence_type_counts,
+                                    doc_auth_category_counts,
+                                    doc_agent_counts,
+                                    doc_agent_sentence_type_counts,
+                                    doc_agent_auth_category_counts,
+                                )
+                                _update_counters_from_classification(
+                                    classification,
+                                    global_sentence_type_counts,
+                                    global_auth_category_counts,
+                                    global_agent_counts,
+                                    global_agent_sentence_type_counts,
+                                    global_agent_auth_category_counts,
+                                )
+                            statement_rows.extend(
+                                _statement_rows_for_sentence(
+                                    document_id=doc_id,
+                                    segment_number=segment_number,
+                                    sentence_payload=sentence_payload,
+                                )
                             )
-                        statement_rows.extend(
-                            _statement_rows_for_sentence(
-                                document_id=doc_id,
-                                segment_number=segment_number,
-                                sentence_payload=sentence_payload,
-                            )
-                        )
-
-                    statement_writer.writerows(statement_rows)
-                    segment_generosity_writer.writerow(segment_generosity_row)
-                    segment_generosity_rows.append(segment_generosity_row)
-
-                    payload = {
-                        "document_id": doc_id,
-                        "segment_file": segment_path.name,
-                        "segment_number": segment_number,
-                        "clause_type": segment_clause_type,
-                        "model": self.model,
-                        "sentence_count": len(sentence_payloads),
-                        "sentences": sentence_payloads,
-                        "segment_generosity": segment_generosity,
-                        "segment_totals": {
-                            **segment_totals,
-                            "statement_rows": len(statement_rows),
-                        },
-                    }
-                    out_path = doc_out_dir / f"segment_{segment_number}.json"
-                    out_path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
-
-                    summary["segments_processed"] += 1
-                    summary["sentences_processed"] += len(sentence_payloads)
-                    summary["statement_rows_written"] += len(statement_rows)
-                    summary["segment_generosity_rows_written"] += 1
-                    doc_sentences_processed += len(sentence_payloads)
-                    doc_statement_rows += len(statement_rows)
-                    doc_segment_generosity_rows += 1
-                    doc_worker_benefit_total += _safe_int(segment_generosity.get("worker_benefit", 0) or 0)
-                    doc_firm_benefit_total += _safe_int(segment_generosity.get("firm_benefit", 0) or 0)
-                    global_worker_benefit_total += _safe_int(segment_generosity.get("worker_benefit", 0) or 0)
-                    global_firm_benefit_total += _safe_int(segment_generosity.get("firm_benefit", 0) or 0)
+
+                        statement_writer.writerows(statement_rows)
+                        segment_generosity_writer.writerow(segment_generosity_row)
+                        segment_generosity_rows.append(segment_generosity_row)
+
+                        payload = {
+                            "document_id": doc_id,
+                            "segment_file": segment.name,
+                            "segment_number": segment_number,
+                            "clause_type": segment_clause_type,
+                            "model": self.model,
+                            "sentence_count": len(sentence_payloads),
+                            "sentences": sentence_payloads,
+                            "segment_generosity": segment_generosity,
+                            "segment_totals": {
+                                **segment_totals,
+                                "statement_rows": len(statement_rows),
+                            },
+                        }
+                        out_path = doc_out_dir / f"segment_{segment_number}.json"
+                        out_path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+
+                        summary["segments_processed"] += 1
+                        summary["sentences_processed"] += len(sentence_payloads)
+                        summary["statement_rows_written"] += len(statement_rows)
+                        summary["segment_generosity_rows_written"] += 1
+                        doc_sentences_processed += len(sentence_payloads)
+                        doc_statement_rows += len(statement_rows)
+                        doc_segment_generosity_rows += 1
+                        doc_worker_benefit_total += _safe_int(segment_generosity.get("worker_benefit", 0) or 0)
+                        doc_firm_benefit_total += _safe_int(segment_generosity.get("firm_benefit", 0) or 0)
+                        global_worker_benefit_total += _safe_int(segment_generosity.get("worker_benefit", 0) or 0)
+                        global_firm_benefit_total += _safe_int(segment_generosity.get("firm_benefit", 0) or 0)
 
                 doc_summary = {
                     "document_id": doc_id,
-                    "segments_processed": len(segment_files),
+                    "segments_processed": len(segments),
                     "sentences_processed": doc_sentences_processed,
                     "statement_rows_written": doc_statement_rows,
                     "segment_generosity_rows_written": doc_segment_generosity_rows,
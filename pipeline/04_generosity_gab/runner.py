@@ -14,12 +14,21 @@ import json
 import os
 import random
 import re
+import sys
 from collections import Counter, defaultdict
 from pathlib import Path
 from typing import Any
 
 from dotenv import load_dotenv
 
+try:
+    from pipeline.utils.segment_store import SegmentStore
+except ModuleNotFoundError:
+    ROOT_DIR = Path(__file__).resolve().parents[2]
+    if str(ROOT_DIR) not in sys.path:
+        sys.path.insert(0, str(ROOT_DIR))
+    from pipeline.utils.segment_store import SegmentStore
+
 load_dotenv()
 
 SEGMENT_ATTRIBUTE_NAME = "segment_generosity"
@@ -107,14 +116,6 @@ def _parse_document_num(path_or_name: str | Path) -> int:
     return int(m.group(1))
 
 
-def _parse_segment_num(path_or_name: str | Path) -> int:
-    name = path_or_name.name if isinstance(path_or_name, Path) else str(path_or_name)
-    m = re.fullmatch(r"segment_(\d+)\.txt", name)
-    if not m:
-        return 10**12
-    return int(m.group(1))
-
-
 def _safe_int(value: Any) -> int:
     try:
         return int(value)
@@ -161,6 +162,7 @@ class GenerosityGabRunner:
             else (self.cache_dir / classification_dir).resolve()
         )
         self.output_dir = output_dir.resolve() if output_dir.is_absolute() else (self.cache_dir / output_dir).resolve()
+        self.segment_store = SegmentStore(self.input_dir)
 
         self.model = str(model).strip() or "gpt-5-nano"
         self.n_rounds = max(1, int(n_rounds))
@@ -171,30 +173,11 @@ class GenerosityGabRunner:
         self.max_chars_per_segment = max(1, int(max_chars_per_segment))
 
     def _list_document_dirs(self) -> list[Path]:
-        if not self.input_dir.exists() or not self.input_dir.is_dir():
-            return []
-        docs = []
-        for p in self.input_dir.iterdir():
-            if not p.is_dir():
-                continue
-            if re.fullmatch(r"document_\d+", p.name) is None:
-                continue
-            seg_dir = p / "segments"
-            if seg_dir.exists() and any(seg_dir.glob("segment_*.txt")):
-                docs.append(p)
-                continue
-            if any(p.glob("segment_*.txt")):
-                docs.append(p)
-        return sorted(docs, key=_parse_document_num)
-
-    @staticmethod
-    def _list_segment_files(doc_dir: Path) -> list[Path]:
-        seg_dir = doc_dir / "segments"
-        if seg_dir.exists():
-            paths = [p for p in seg_dir.glob("segment_*.txt") if p.is_file()]
-        else:
-            paths = [p for p in doc_dir.glob("segment_*.txt") if p.is_file()]
-        return sorted([p for p in paths if _parse_segment_num(p) != 10**12], key=_parse_segment_num)
+        return [
+            self.input_dir / document_id
+            for document_id in self.segment_store.document_ids()
+            if self.segment_store.segments(document_id)
+        ]
 
     @staticmethod
     def _segment_id(document_id: str, segment_number: int) -> str:
@@ -243,31 +226,32 @@ class GenerosityGabRunner:
             doc_dirs = sorted(rng.sample(doc_dirs, int(sample_size)), key=_parse_document_num)
 
         rows: list[dict[str, Any]] = []
-        for doc_dir in doc_dirs:
-            doc_id = doc_dir.name
-            segment_files = self._list_segment_files(doc_dir)
-            if max_segments is not None:
-                segment_files = segment_files[: max(0, int(max_segments))]
-
-            for segment_file in segment_files:
-                segment_number = _parse_segment_num(segment_file)
-                if segment_number == 10**12:
-                    continue
-                raw_text = segment_file.read_text(encoding="utf-8", errors="replace")
-                is_truncated = len(raw_text) > self.max_chars_per_segment
-                segment_text = raw_text[: self.max_chars_per_segment]
-                rows.append(
-                    {
-                        "segment_id": self._segment_id(doc_id, segment_number),
-                        "document_id": doc_id,
-                        "segment_number": int(segment_number),
-                        "clause_type": self._load_segment_clause_type(doc_id, int(segment_number)),
-                        "segment_path": str(segment_file),
-                        "segment_text": segment_text,
-                        "text_char_count": len(raw_text),
-                        "is_truncated": bool(is_truncated),
-                    }
-                )
+        for segment, raw_text in self.segment_store.iter_segments(
+            (d.name for d in doc_dirs), max_segments=max_segments
+        ):
+            doc_id = segment.document_id
+            segment_number = segment.number
+            is_truncated = len(raw_text) > self.max_chars_per_segment
+            # Span-only segmentation outputs have no segment file; point at the
+            # document text and the segment's character span instead.
+            full_text_path = self.segment_store.segmentation_dir / doc_id / "full_text.txt"
+            span_backed = not segment.path.exists() and full_text_path.exists()
+            segment_text = raw_text[: self.max_chars_per_segment]
+            rows.append(
+                {
+                    "segment_id": self._segment_id(doc_id, segment_number),
+                    "document_id": doc_id,
+                    "segment_number": int(segment_number),
+                    "clause_type": self._load_segment_clause_type(doc_id, int(segment_number)),
+                    "segment_path": "" if span_backed else str(segment.path),
+                    "full_text_path": str(full_text_path) if span_backed else "",
+                    "segment_start": segment.start if span_backed else "",
+                    "segment_end": segment.end if span_backed else "",
+                    "segment_text": segment_text,
+                    "text_char_count": len(raw_text),
+                    "is_truncated": bool(is_truncated),
+                }
+            )
         return [
             row
             for row in rows
@@ -657,6 +641,9 @@ class GenerosityGabRunner:
                 "text_char_count",
                 "is_truncated",
                 "segment_path",
+                "full_text_path",
+                "segment_start",
+                "segment_end",
             ]
         ].to_csv(segment_csv, index=False)
         clause_type_document_rankings.to_csv(clause_doc_csv, index=False)
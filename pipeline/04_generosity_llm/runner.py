@@ -14,6 +14,7 @@ import json
 import os
 import random
 import re
+import sys
 from collections import Counter, defaultdict
 from datetime import datetime, timezone
 from pathlib import Path
@@ -24,6 +25,24 @@ from dotenv import load_dotenv
 from openai import OpenAI
 from tqdm import tqdm
 
+try:
+    from pipeline.utils.llm_cache import (
+        accept_response,
+        open_response_cache,
+        reject_response,
+        with_response_cache,
+    )
+except ModuleNotFoundError:
+    ROOT_DIR = Path(__file__).resolve().parents[2]
+    if str(ROOT_DIR) not in sys.path:
+        sys.path.insert(0, str(ROOT_DIR))
+    from pipeline.utils.llm_cache import (
+        accept_response,
+        open_response_cache,
+        reject_response,
+        with_response_cache,
+    )
+
 load_dotenv()
 
 ALLOWED_FIELD_TYPES = {"number", "string", "boolean", "list[string]", "list[number]"}
@@ -345,6 +364,7 @@ class GenerosityLlmRunner:
         top_clause_types: int = 10,
         schema_sample_size: int = 10,
         max_concurrency: int = 8,
+        llm_cache: bool = True,
     ) -> None:
         cache_base = None
         if cache_dir is not None and str(cache_dir).strip():
@@ -373,39 +393,37 @@ class GenerosityLlmRunner:
             raise RuntimeError("OPENROUTER_API_KEY is not set")
         self.base_url = os.environ.get("OPENROUTER_BASE_URL", "").strip() or DEFAULT_OPENROUTER_BASE_URL
 
-        self.client = OpenAI(
-            api_key=api_key,
-            base_url=self.base_url,
-            timeout=self.timeout,
+        self.llm_cache = open_response_cache(cache_base) if llm_cache else None
+        self.client = with_response_cache(
+            OpenAI(
+                api_key=api_key,
+                base_url=self.base_url,
+                timeout=self.timeout,
+            ),
+            self.llm_cache,
         )
 
     def _chat_json(self, system_prompt: str, user_prompt: str) -> dict[str, Any]:
         last_error: Exception | None = None
         for _ in range(self.max_retries):
             response = None
+            request = dict(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt},
+                ],
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                response_format={"type": "json_object"},
+            )
             try:
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt},
-                    ],
-                    temperature=self.temperature,
-                    max_tokens=self.max_tokens,
-                    response_format={"type": "json_object"},
-                )
+                response = self.client.chat.completions.create(**request)
             except Exception as exc_with_response_format:
                 last_error = exc_with_response_format
+                request.pop("response_format")
                 try:
-                    response = self.client.chat.completions.create(
-                        model=self.model,
-                        messages=[
-                            {"role": "system", "content": system_prompt},
-                            {"role": "user", "content": user_prompt},
-                        ],
-                        temperature=self.temperature,
-                        max_tokens=self.max_tokens,
-                    )
+                    response = self.client.chat.completions.create(**request)
                 except Exception as exc_without_response_format:
                     last_error = exc_without_response_format
                     continue
@@ -415,15 +433,19 @@ class GenerosityLlmRunner:
                 content = response.choices[0].message.content or ""
             if not content.strip():
                 last_error = ValueError("Model returned empty response text")
+                reject_response(self.client, request)
                 continue
             try:
                 payload = _parse_json_loose(content)
             except Exception as exc:
                 last_error = exc
+                reject_response(self.client, request)
                 continue
             if isinstance(payload, dict):
+                accept_response(self.client, request, response)
                 return payload
             last_error = ValueError(f"Expected JSON object response, got {type(payload)}")
+            reject_response(self.client, request)
 
         raise RuntimeError(f"Unable to get valid JSON from {self.provider} after {self.max_retries} attempt(s): {last_error}")
 
@@ -1681,6 +1703,12 @@ def main() -> None:
     parser.add_argument("--max-segments-per-clause", type=int, default=None)
     parser.add_argument("--max-concurrency", type=int, default=8)
     parser.add_argument("--force", action="store_true")
+    parser.add_argument(
+        "--no-llm-cache",
+        dest="llm_cache",
+        action="store_false",
+        help="Bypass the shared LLM response cache ($CACHE_DIR/llm_response_cache.sqlite).",
+    )
     args = parser.parse_args()
 
     runner = GenerosityLlmRunner(
@@ -1695,6 +1723,7 @@ def main() -> None:
         top_clause_types=args.top_clause_types,
         schema_sample_size=args.schema_sample_size,
         max_concurrency=args.max_concurrency,
+        llm_cache=args.llm_cache,
     )
     summary = runner.run(
         document_id=_normalize_document_id(args.document_id),
@@ -1704,6 +1733,8 @@ def main() -> None:
         max_segments_per_clause=args.max_segments_per_clause,
         force=args.force,
     )
+    if runner.llm_cache is not None:
+        summary["llm_cache"] = runner.llm_cache.stats()
     print(json.dumps(summary, ensure_ascii=False, indent=2))
 
 
@@ -13,6 +13,7 @@ import json
 import math
 import os
 import re
+import sys
 from collections import Counter
 from datetime import datetime, timezone
 from pathlib import Path
@@ -21,6 +22,24 @@ from typing import Any
 from dotenv import load_dotenv
 from openai import OpenAI
 
+try:
+    from pipeline.utils.llm_cache import (
+        accept_response,
+        open_response_cache,
+        reject_response,
+        with_response_cache,
+    )
+except ModuleNotFoundError:
+    ROOT_DIR = Path(__file__).resolve().parents[2]
+    if str(ROOT_DIR) not in sys.path:
+        sys.path.insert(0, str(ROOT_DIR))
+    from pipeline.utils.llm_cache import (
+        accept_response,
+        open_response_cache,
+        reject_response,
+        with_response_cache,
+    )
+
 load_dotenv()
 
 DEFAULT_OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
@@ -591,17 +610,20 @@ def _chat_summary_with_retries(
         )
         response = None
         finish_reason = ""
+        base_request = dict(
+            model=model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            temperature=float(temperature),
+            max_tokens=int(current_max_tokens),
+            extra_body=extra_body,
+        )
         try:
             # Prefer strict schema-constrained output; this prevents malformed/truncated JSON objects.
-            response = client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                temperature=float(temperature),
-                max_tokens=int(current_max_tokens),
-                extra_body=extra_body,
+            request = dict(
+                base_request,
                 response_format={
                     "type": "json_schema",
                     "json_schema": {
@@ -611,6 +633,7 @@ def _chat_summary_with_retries(
                     },
                 },
             )
+            response = client.chat.completions.create(**request)
             _log(f"{stage_label}: response received with strict json_schema format")
         except Exception as exc_with_json_schema:
             last_error = exc_with_json_schema
@@ -619,17 +642,8 @@ def _chat_summary_with_retries(
                 "retrying with json_object format"
             )
             try:
-                response = client.chat.completions.create(
-                    model=model,
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt},
-                    ],
-                    temperature=float(temperature),
-                    max_tokens=int(current_max_tokens),
-                    extra_body=extra_body,
-                    response_format={"type": "json_object"},
-                )
+                request = dict(base_request, response_format={"type": "json_object"})
+                response = client.chat.completions.create(**request)
                 _log(f"{stage_label}: response received with json_object format")
             except Exception as exc_with_json_object:
                 last_error = exc_with_json_object
@@ -638,16 +652,8 @@ def _chat_summary_with_retries(
                     "retrying without response_format"
                 )
                 try:
-                    response = client.chat.completions.create(
-                        model=model,
-                        messages=[
-                            {"role": "system", "content": system_prompt},
-                            {"role": "user", "content": user_prompt},
-                        ],
-                        temperature=float(temperature),
-                        max_tokens=int(current_max_tokens),
-                        extra_body=extra_body,
-                    )
+                    request = base_request
+                    response = client.chat.completions.create(**request)
                     _log(f"{stage_label}: response received without response_format")
                 except Exception as exc_without_response_format:
                     last_error = exc_without_response_format
@@ -669,6 +675,7 @@ def _chat_summary_with_retries(
             try:
                 summary = _validate_summary_payload(parsed_payload)
                 _log(f"{stage_label}: success with schema-validated parsed payload")
+                accept_response(client, request, response)
                 return summary
             except Exception as exc:
                 last_error = exc
@@ -678,6 +685,7 @@ def _chat_summary_with_retries(
         if not content:
             last_error = ValueError("Model returned empty response text")
             _log(f"{stage_label}: empty response content")
+            reject_response(client, request)
             if _looks_like_truncated_json(content, last_error, finish_reason):
                 next_tokens = _next_retry_max_tokens(current_max_tokens)
                 if next_tokens > current_max_tokens:
@@ -695,6 +703,7 @@ def _chat_summary_with_retries(
             _log(
                 f"{stage_label}: failed to parse JSON ({type(exc).__name__}: {exc})"
             )
+            reject_response(client, request)
             if _looks_like_truncated_json(content, exc, finish_reason):
                 next_tokens = _next_retry_max_tokens(current_max_tokens)
                 if next_tokens > current_max_tokens:
@@ -710,6 +719,7 @@ def _chat_summary_with_retries(
         except Exception as exc:
             last_error = exc
             _log(f"{stage_label}: schema validation failed ({type(exc).__name__}: {exc})")
+            reject_response(client, request)
             if _looks_like_truncated_json(content, exc, finish_reason):
                 next_tokens = _next_retry_max_tokens(current_max_tokens)
                 if next_tokens > current_max_tokens:
@@ -721,6 +731,7 @@ def _chat_summary_with_retries(
             continue
 
         _log(f"{stage_label}: success with schema-validated summary")
+        accept_response(client, request, response)
         return summary
 
     raise RuntimeError(
@@ -802,6 +813,7 @@ def run(
     max_retries: int = 2,
     timeout: float = 120.0,
     verbose: str = "low",
+    llm_cache: bool = True,
 ) -> dict[str, Any]:
     """Generate clause-level high-vs-low comparison summaries and JSON artifacts."""
     verbose_level = _normalize_verbose_level(verbose)
@@ -895,7 +907,8 @@ def run(
         raise RuntimeError("OPENROUTER_API_KEY is not set")
     base_url = os.environ.get("OPENROUTER_BASE_URL", "").strip() or DEFAULT_OPENROUTER_BASE_URL
     _log(f"Initializing OpenRouter client (base_url={base_url})")
-    client = OpenAI(api_key=api_key, base_url=base_url, timeout=float(timeout))
+    cache = open_response_cache(_default_cache_dir()) if llm_cache else None
+    client = with_response_cache(OpenAI(api_key=api_key, base_url=base_url, timeout=float(timeout)), cache)
 
     top_system, top_user = _build_group_summary_prompt(
         clause_type=canonical_clause_type,
@@ -958,6 +971,8 @@ def run(
     )
     comparison_summary = _coerce_single_sentence(comparison_summary)
     _log(f"LLM call 3/3 complete (summary_chars={len(comparison_summary)})")
+    if cache is not None:
+        _log(cache.summary())
 
     top_doc_ids = {str(row["document_id"]) for row in top_rows}
     bottom_doc_ids = {str(row["document_id"]) for row in bottom_rows}
@@ -1044,6 +1059,12 @@ def main() -> None:
         choices=["low", "medium", "high"],
         help="LLM verbosity hint passed to OpenRouter.",
     )
+    parser.add_argument(
+        "--no-llm-cache",
+        dest="llm_cache",
+        action="store_false",
+        help="Bypass the shared LLM response cache ($CACHE_DIR/llm_response_cache.sqlite).",
+    )
     args = parser.parse_args()
 
     summary = run(
@@ -1059,6 +1080,7 @@ def main() -> None:
         max_retries=args.max_retries,
         timeout=args.timeout,
         verbose=args.verbose,
+        llm_cache=args.llm_cache,
     )
     print(json.dumps(summary, ensure_ascii=False, indent=2))
 
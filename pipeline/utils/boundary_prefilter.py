@@ -0,0 +1,414 @@
+"""Local pre-filter for segmentation boundary candidates.
+
+Most regex candidates are easy calls: an `ARTICLE 12` line between blank
+lines in the body of the contract is a boundary, while the same header in a
+table of contents, or a mid-sentence cross-reference, is not. This module
+learns those calls from the LLM decisions already cached in
+`boundary_evaluations.json`. A small logistic model over layout features
+decides a candidate locally only when it is confident, and every other
+candidate is still sent to the boundary model.
+
+Features cover line position, surrounding newlines, header casing and length,
+table-of-contents density around the candidate, spacing to neighbouring
+candidates, and whether the header's number continues the candidate sequence.
+
+Train it, then check its agreement on the held-out documents, offline
+against cached labels:
+
+    python -m pipeline.utils.boundary_prefilter train \\
+        --segmentation-dir "$CACHE_DIR/02_segmentation_output/dol_archive" \\
+        --model-path "$CACHE_DIR/02_segmentation_output/boundary_prefilter.json"
+    python -m pipeline.utils.boundary_prefilter evaluate \\
+        --segmentation-dir "$CACHE_DIR/02_segmentation_output/dol_archive" \\
+        --model-path "$CACHE_DIR/02_segmentation_output/boundary_prefilter.json"
+"""
+
+from __future__ import annotations
+
+import argparse
+import bisect
+import json
+import math
+import re
+import sys
+import zlib
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+try:
+    from pipeline.utils.header_rules import find_header_candidates
+except ModuleNotFoundError:
+    ROOT_DIR = Path(__file__).resolve().parents[2]
+    if str(ROOT_DIR) not in sys.path:
+        sys.path.insert(0, str(ROOT_DIR))
+    from pipeline.utils.header_rules import find_header_candidates
+
+FEATURE_NAMES = [
+    "relative_position",
+    "at_line_start",
+    "newlines_before",
+    "newlines_after",
+    "header_line_length",
+    "upper_ratio",
+    "is_title_case",
+    "ends_with_page_number",
+    "has_dot_leader",
+    "toc_density",
+    "contents_heading_before",
+    "log_gap_prev",
+    "log_gap_next",
+    "neighbour_density",
+    "has_number",
+    "number_continues_sequence",
+    "number_seen_before",
+    "number_seen_after",
+]
+
+_TOC_LINE_RE = re.compile(r"(\.{3,}|…|\s{2,}|\t)\s*\d{1,4}\s*$")
+_PAGE_NUMBER_END_RE = re.compile(r"\s\d{1,4}\s*$")
+_CONTENTS_RE = re.compile(r"table\s+of\s+contents|\bcontents\b|\bindex\b", re.IGNORECASE)
+_NUMBER_RE = re.compile(r"\b(\d{1,3}|[IVXLC]{1,7})\b")
+_ROMAN = {"I": 1, "V": 5, "X": 10, "L": 50, "C": 100}
+
+
+def _roman_to_int(token: str) -> int | None:
+    total = 0
+    prev = 0
+    for ch in reversed(token):
+        value = _ROMAN.get(ch)
+        if value is None:
+            return None
+        total = total - value if value < prev else total + value
+        prev = max(prev, value)
+    return total or None
+
+
+def _header_number(header: str) -> int | None:
+    match = _NUMBER_RE.search(header)
+    if match is None:
+        return None
+    token = match.group(1)
+    return int(token) if token.isdigit() else _roman_to_int(token)
+
+
+def _line_bounds(text: str, pos: int) -> tuple[int, int]:
+    line_start = text.rfind("\n", 0, pos) + 1
+    line_end = text.find("\n", pos)
+    return line_start, len(text) if line_end == -1 else line_end
+
+
+def _count_newlines(whitespace: str) -> int:
+    return min(whitespace.count("\n"), 4)
+
+
+def candidate_features(text: str, spans: list[tuple[int, int]]) -> np.ndarray:
+    """Return one feature row per candidate span, in `FEATURE_NAMES` order."""
+    n = len(spans)
+    rows = np.zeros((n, len(FEATURE_NAMES)), dtype=np.float64)
+    if n == 0:
+        return rows
+
+    text_len = max(1, len(text))
+    starts = [start for start, _ in spans]
+    numbers = []
+    for start, end in spans:
+        _, line_end = _line_bounds(text, start)
+        numbers.append(_header_number(text[start:max(end, line_end)]))
+    seen_counts: dict[int, int] = {}
+    for number in numbers:
+        if number is not None:
+            seen_counts[number] = seen_counts.get(number, 0) + 1
+    seen_so_far: dict[int, int] = {}
+
+    for i, (start, end) in enumerate(spans):
+        line_start, line_end = _line_bounds(text, start)
+        header_line = text[line_start:line_end].strip()
+        letters = [ch for ch in header_line if ch.isalpha()]
+
+        before = text[max(0, start - 12):start]
+        ws_before = before[len(before.rstrip()):]
+        after_line = text[line_end:line_end + 12]
+        ws_after = after_line[:len(after_line) - len(after_line.lstrip())]
+
+        window = text[max(0, start - 800):min(len(text), end + 800)]
+        window_lines = [line for line in window.splitlines() if line.strip()]
+        toc_lines = sum(1 for line in window_lines if _TOC_LINE_RE.search(line))
+
+        gap_prev = start - starts[i - 1] if i > 0 else start
+        gap_next = starts[i + 1] - start if i + 1 < n else len(text) - start
+        neighbours = (
+            bisect.bisect_right(starts, start + 1000) - bisect.bisect_left(starts, start - 1000) - 1
+        )
+
+        number = numbers[i]
+        prev_number = next((numbers[j] for j in range(i - 1, -1, -1) if numbers[j] is not None), None)
+        seen_before = seen_so_far.get(number, 0) if number is not None else 0
+        seen_after = seen_counts.get(number, 0) - seen_before - 1 if number is not None else 0
+        if number is not None:
+            seen_so_far[number] = seen_before + 1
+
+        rows[i] = [
+            start / text_len,
+            float(not text[line_start:start].strip()),
+            _count_newlines(ws_before) / 4,
+            _count_newlines(ws_after) / 4,
+            min(len(header_line), 200) / 200,
+            sum(ch.isupper() for ch in letters) / len(letters) if letters else 0.0,
+            float(header_line.istitle()),
+            float(bool(_PAGE_NUMBER_END_RE.search(header_line))),
+            float(bool(re.search(r"\.{3,}|…", header_line))),
+            toc_lines / len(window_lines) if window_lines else 0.0,
+            float(bool(_CONTENTS_RE.search(text[max(0, start - 3000):start]))),
+            math.log1p(max(gap_prev, 0)) / 12,
+            math.log1p(max(gap_next, 0)) / 12,
+            math.log1p(max(neighbours, 0)) / 4,
+            float(number is not None),
+            float(number is not None and prev_number is not None and number == prev_number + 1),
+            float(seen_before > 0),
+            float(seen_after > 0),
+        ]
+    return rows
+
+
+@dataclass
+class BoundaryPrefilter:
+    """Standardized logistic regression with an abstain band."""
+
+    weights: list[float]
+    bias: float
+    mean: list[float]
+    std: list[float]
+    low: float
+    high: float
+    feature_names: list[str]
+    metrics: dict[str, Any]
+
+    def predict_proba(self, features: np.ndarray) -> np.ndarray:
+        if len(features) == 0:
+            return np.zeros(0)
+        z = (features - np.asarray(self.mean)) / np.asarray(self.std)
+        return 1.0 / (1.0 + np.exp(-(z @ np.asarray(self.weights) + self.bias)))
+
+    def decide(self, features: np.ndarray) -> list[tuple[bool | None, float]]:
+        """Return (decision, probability) per row; None means ask the LLM."""
+        decisions = []
+        for p in self.predict_proba(features):
+            if p >= self.high:
+                decisions.append((True, float(p)))
+            elif p <= self.low:
+                decisions.append((False, float(p)))
+            else:
+                decisions.append((None, float(p)))
+        return decisions
+
+    def save(self, path: str | Path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(asdict(self), indent=2), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: str | Path) -> "BoundaryPrefilter":
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        if data.get("feature_names") != FEATURE_NAMES:
+            raise ValueError(f"{path} was trained with a different feature set; retrain it")
+        return cls(**data)
+
+
+def _fit_logistic(
+    x: np.ndarray,
+    y: np.ndarray,
+    l2: float = 1e-2,
+    lr: float = 0.5,
+    iterations: int = 800,
+) -> tuple[np.ndarray, float, np.ndarray, np.ndarray]:
+    """Class-balanced L2 logistic regression by full-batch gradient descent."""
+    mean = x.mean(axis=0)
+    std = x.std(axis=0)
+    std[std == 0] = 1.0
+    z = (x - mean) / std
+    positives = max(1, int(y.sum()))
+    negatives = max(1, len(y) - positives)
+    sample_weight = np.where(y == 1, len(y) / (2 * positives), len(y) / (2 * negatives))
+
+    w = np.zeros(z.shape[1])
+    b = 0.0
+    for _ in range(iterations):
+        p = 1.0 / (1.0 + np.exp(-(z @ w + b)))
+        err = (p - y) * sample_weight
+        w -= lr * (z.T @ err / len(y) + l2 * w)
+        b -= lr * err.mean()
+    return w, b, mean, std
+
+
+def _band_edge(p_sorted: np.ndarray, agree_sorted: np.ndarray, target: float, min_count: int = 20):
+    """Last probability before the running agreement first drops below target.
+
+    Returns None when fewer than `min_count` candidates stay within the target,
+    since agreement on a smaller band is not measured.
+    """
+    counts = np.arange(1, len(p_sorted) + 1)
+    agreement = np.cumsum(agree_sorted) / counts
+    failing = np.nonzero((counts >= min_count) & (agreement < target))[0]
+    stop = failing[0] if len(failing) else len(p_sorted)
+    return float(p_sorted[stop - 1]) if stop >= min_count else None
+
+
+def _pick_thresholds(p: np.ndarray, y: np.ndarray, target_agreement: float) -> tuple[float, float]:
+    """Widest confident bands whose agreement with the labels stays at the target."""
+    order = np.argsort(-p)
+    high = _band_edge(p[order], y[order], target_agreement)
+    order = np.argsort(p)
+    low = _band_edge(p[order], 1 - y[order], target_agreement)
+    # Infinite edges decide nothing on that side; a saturated sigmoid can
+    # return exactly 0.0 or 1.0, so those values would not be safe.
+    high = math.inf if high is None else high
+    low = -math.inf if low is None else low
+    if low >= high:
+        low, high = -math.inf, math.inf
+    return low, high
+
+
+def load_labeled_candidates(segmentation_dir: Path) -> list[tuple[str, np.ndarray, np.ndarray]]:
+    """Rebuild (features, LLM labels) for every document with cached evaluations.
+
+    Candidates are re-derived from the stored plan so they line up with the
+    evaluation list; documents where the counts or stored spans disagree are
+    skipped, as are decisions that came from the pre-filter itself.
+    """
+    documents = []
+    for doc_dir in sorted(p for p in segmentation_dir.iterdir() if p.is_dir()):
+        evaluations_path = doc_dir / "boundary_evaluations.json"
+        meta_path = doc_dir / "document_meta.json"
+        text_path = doc_dir / "full_text.txt"
+        if not (evaluations_path.exists() and meta_path.exists() and text_path.exists()):
+            continue
+        try:
+            evaluations = json.loads(evaluations_path.read_text(encoding="utf-8"))
+            plan = json.loads(meta_path.read_text(encoding="utf-8")).get("plan") or {}
+        except json.JSONDecodeError:
+            continue
+        text = text_path.read_text(encoding="utf-8")
+        spans = find_header_candidates(text, plan.get("segment_header_rules", []))
+        if not spans or len(spans) != len(evaluations):
+            continue
+        if any(
+            isinstance(e, dict) and "span" in e and tuple(e["span"]) != span
+            for e, span in zip(evaluations, spans)
+        ):
+            continue
+        features = candidate_features(text, spans)
+        keep = [
+            i for i, e in enumerate(evaluations)
+            if isinstance(e, dict) and "is_new_segment" in e and e.get("source") != "prefilter"
+        ]
+        if not keep:
+            continue
+        labels = np.array([float(bool(evaluations[i]["is_new_segment"])) for i in keep])
+        documents.append((doc_dir.name, features[keep], labels))
+    return documents
+
+
+def _is_holdout(document_id: str, holdout_frac: float) -> bool:
+    return (zlib.crc32(document_id.encode("utf-8")) % 1000) < holdout_frac * 1000
+
+
+def _stack(documents):
+    if not documents:
+        return np.zeros((0, len(FEATURE_NAMES))), np.zeros(0)
+    return (
+        np.vstack([features for _, features, _ in documents]),
+        np.concatenate([labels for _, _, labels in documents]),
+    )
+
+
+def evaluate(model: BoundaryPrefilter, features: np.ndarray, labels: np.ndarray) -> dict[str, Any]:
+    """Agreement with cached LLM labels and the share of calls the model avoids."""
+    decisions = model.decide(features)
+    decided = [(d, y) for (d, _), y in zip(decisions, labels) if d is not None]
+    agree = sum(1 for d, y in decided if d == bool(y))
+    true_pos = sum(1 for d, y in decided if d and y)
+    pred_pos = sum(1 for d, _ in decided if d)
+    return {
+        "candidates": int(len(labels)),
+        "llm_positive_rate": round(float(labels.mean()), 4) if len(labels) else 0.0,
+        "decided_locally": len(decided),
+        "calls_avoided": round(len(decided) / len(labels), 4) if len(labels) else 0.0,
+        "agreement": round(agree / len(decided), 4) if decided else None,
+        "positive_precision": round(true_pos / pred_pos, 4) if pred_pos else None,
+        "disagreements": len(decided) - agree,
+    }
+
+
+def train(
+    segmentation_dir: Path,
+    holdout_frac: float = 0.2,
+    target_agreement: float = 0.98,
+) -> BoundaryPrefilter:
+    documents = load_labeled_candidates(segmentation_dir)
+    train_docs = [d for d in documents if not _is_holdout(d[0], holdout_frac)]
+    holdout_docs = [d for d in documents if _is_holdout(d[0], holdout_frac)]
+    x_train, y_train = _stack(train_docs)
+    x_holdout, y_holdout = _stack(holdout_docs)
+    if len(y_train) == 0 or y_train.min() == y_train.max():
+        raise ValueError(f"Not enough labelled candidates with both outcomes under {segmentation_dir}")
+
+    w, b, mean, std = _fit_logistic(x_train, y_train)
+    model = BoundaryPrefilter(
+        weights=w.tolist(), bias=float(b), mean=mean.tolist(), std=std.tolist(),
+        low=-math.inf, high=math.inf, feature_names=list(FEATURE_NAMES), metrics={},
+    )
+    # Thresholds come from held-out documents so the agreement target is honest.
+    calib_x, calib_y = (x_holdout, y_holdout) if len(y_holdout) >= 100 else (x_train, y_train)
+    model.low, model.high = _pick_thresholds(model.predict_proba(calib_x), calib_y, target_agreement)
+    model.metrics = {
+        "holdout_frac": holdout_frac,
+        "train_documents": len(train_docs),
+        "holdout_documents": len(holdout_docs),
+        "train": evaluate(model, x_train, y_train),
+        "holdout": evaluate(model, x_holdout, y_holdout) if len(y_holdout) else None,
+    }
+    return model
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train or evaluate the boundary candidate pre-filter.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("train", "evaluate"):
+        cmd = sub.add_parser(name)
+        cmd.add_argument("--segmentation-dir", type=Path, required=True,
+                         help="02_segmentation_output/<archive> directory with cached evaluations")
+        cmd.add_argument("--model-path", type=Path, required=True)
+    sub.choices["train"].add_argument("--holdout-frac", type=float, default=0.2,
+                                      help="Share of documents held out for threshold calibration")
+    sub.choices["train"].add_argument("--target-agreement", type=float, default=0.98,
+                                      help="Required agreement with LLM labels for local decisions")
+    args = parser.parse_args()
+
+    if args.command == "train":
+        model = train(args.segmentation_dir, args.holdout_frac, args.target_agreement)
+        model.save(args.model_path)
+        print(json.dumps({"low": model.low, "high": model.high, **model.metrics}, indent=2))
+        print(f"Saved pre-filter to {args.model_path}")
+        return
+
+    model = BoundaryPrefilter.load(args.model_path)
+    # Only documents the model never trained on give an honest agreement rate.
+    holdout_frac = model.metrics.get("holdout_frac", 0.2)
+    documents = [
+        d for d in load_labeled_candidates(args.segmentation_dir) if _is_holdout(d[0], holdout_frac)
+    ]
+    features, labels = _stack(documents)
+    report = {
+        "holdout_documents": len(documents),
+        "low": model.low,
+        "high": model.high,
+        **evaluate(model, features, labels),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Adaptive concurrency control for queue-driven API workers.
+
+The limiter follows an AIMD scheme with a latency-gradient check: the in-flight
+limit grows by roughly one slot per window of healthy completions, shrinks
+multiplicatively when the backend signals overload (429/503/timeouts), and
+also backs off when the recent p95 latency drifts well above the best p95 seen
+so far in the run.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Any, Literal
+
+Outcome = Literal["ok", "overload", "error"]
+
+
+def percentile(values: list[float], pct: float) -> float | None:
+    """Return the nearest-rank percentile of `values`, or None when empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class AdaptiveConcurrencyLimiter:
+    """Gate in-flight requests behind a limit that adapts to backend health."""
+
+    def __init__(
+        self,
+        initial_limit: int,
+        min_limit: int = 1,
+        max_limit: int = 256,
+        overload_factor: float = 0.5,
+        latency_factor: float = 0.8,
+        latency_tolerance: float = 2.0,
+        window_size: int = 50,
+        cooldown: float = 5.0,
+    ):
+        self.min_limit = max(1, int(min_limit))
+        self.max_limit = max(self.min_limit, int(max_limit))
+        self.limit = float(min(self.max_limit, max(self.min_limit, int(initial_limit))))
+        self.overload_factor = overload_factor
+        self.latency_factor = latency_factor
+        self.latency_tolerance = latency_tolerance
+        self.window_size = max(1, int(window_size))
+        self.cooldown = cooldown
+
+        self.in_flight = 0
+        self.baseline_p95: float | None = None
+        self.last_p95: float | None = None
+        self.increases = 0
+        self.decreases = 0
+        self.overloads = 0
+        self._window: deque[float] = deque(maxlen=self.window_size)
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+
+    @property
+    def current_limit(self) -> int:
+        return max(self.min_limit, int(self.limit))
+
+    async def acquire(self) -> None:
+        """Wait until a slot under the current limit is free and take it."""
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self.current_limit)
+            self.in_flight += 1
+
+    async def release(self, latency: float | None, outcome: Outcome) -> None:
+        """Return a slot and feed the request's latency and outcome back in."""
+        async with self._condition:
+            saturated = self.in_flight >= self.current_limit
+            self.in_flight -= 1
+            if outcome == "overload":
+                self.overloads += 1
+                self._decrease(self.overload_factor)
+            elif outcome == "ok":
+                if latency is not None:
+                    self._observe_latency(latency)
+                # Only grow when demand actually reached the limit.
+                if saturated and self.limit < self.max_limit:
+                    before = self.current_limit
+                    self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+                    if self.current_limit > before:
+                        self.increases += 1
+            self._condition.notify_all()
+
+    def _observe_latency(self, latency: float) -> None:
+        self._window.append(latency)
+        if len(self._window) < self.window_size:
+            return
+        p95 = percentile(list(self._window), 95)
+        self._window.clear()
+        self.last_p95 = p95
+        if p95 is None:
+            return
+        if self.baseline_p95 is None or p95 < self.baseline_p95:
+            self.baseline_p95 = p95
+            return
+        if p95 > self.baseline_p95 * self.latency_tolerance:
+            self._decrease(self.latency_factor)
+
+    def _decrease(self, factor: float) -> None:
+        now = time.monotonic()
+        # One congestion event should only cut the limit once.
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        new_limit = max(float(self.min_limit), self.limit * factor)
+        if int(new_limit) < self.current_limit:
+            self.decreases += 1
+        self.limit = new_limit
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "limit": self.current_limit,
+            "in_flight": self.in_flight,
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "baseline_p95": self.baseline_p95,
+            "last_p95": self.last_p95,
+            "increases": self.increases,
+            "decreases": self.decreases,
+            "overloads": self.overloads,
+        }
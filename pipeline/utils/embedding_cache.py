@@ -0,0 +1,214 @@
+"""Persistent text-embedding cache keyed by (model name, text SHA-256).
+
+Each model gets its own directory holding two append-only files plus metadata:
+
+    <root>/<model slug>/
+        meta.json        {"version": 1, "model": ..., "dim": 768, "dtype": "float32"}
+        keys.bin         32-byte SHA-256 digest of each row's text
+        vectors.bin      row-major `dtype` vectors, memory-mapped read-only
+        taxonomy-<sha>.npy
+        .lock
+
+Several processes (e.g. classification shards) may share one cache. Appends
+hold an exclusive `flock` on `.lock`, pick up rows other processes added, and
+take the start row from the size of `vectors.bin`, never from memory.
+Vectors are written before their keys, so a crash at worst leaves an unkeyed
+tail, which the next writer trims back to the last complete row.
+
+Taxonomy embeddings are stored whole under a hash of the taxonomy file and
+the exact texts that were embedded, so they are recomputed when either the
+file or the way features are rendered to text changes.
+"""
+
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+
+CACHE_VERSION = 1
+_KEY_BYTES = 32
+
+
+def text_key(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+def file_sha256(path: Path) -> str:
+    with path.open("rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+class EmbeddingCache:
+    """Memory-mapped embedding store for one model."""
+
+    def __init__(self, root: str | Path, model_name: str, dtype: str = "float32"):
+        slug = re.sub(r"[^a-zA-Z0-9._-]+", "_", model_name).strip("_") or "model"
+        self.model_name = model_name
+        self.dir = Path(root) / slug
+        self.dtype = np.dtype(dtype)
+        self.dim: int | None = None
+        self.index: dict[bytes, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self._vectors: np.memmap | None = None
+        self._lock = threading.Lock()
+        self._load()
+
+    @property
+    def _meta_path(self) -> Path:
+        return self.dir / "meta.json"
+
+    @property
+    def _keys_path(self) -> Path:
+        return self.dir / "keys.bin"
+
+    @property
+    def _vectors_path(self) -> Path:
+        return self.dir / "vectors.bin"
+
+    @contextmanager
+    def _file_lock(self):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        with open(self.dir / ".lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load(self) -> None:
+        if self.dir.exists():
+            with self._file_lock():
+                self._refresh(trim=True)
+
+    def _read_meta(self) -> bool:
+        if not self._meta_path.exists():
+            return False
+        meta = json.loads(self._meta_path.read_text(encoding="utf-8"))
+        if meta.get("version") != CACHE_VERSION or meta.get("model") != self.model_name:
+            raise RuntimeError(
+                f"{self.dir} holds embeddings for {meta.get('model')!r} "
+                f"(version {meta.get('version')}), not {self.model_name!r}"
+            )
+        self.dim = int(meta["dim"])
+        self.dtype = np.dtype(meta["dtype"])
+        return True
+
+    def _refresh(self, trim: bool = False) -> int:
+        """Index rows appended since the last refresh; call with the file lock held.
+
+        Returns the number of complete rows on disk. With `trim`, a partial
+        tail left by a crashed writer is truncated away.
+        """
+        if self.dim is None and not self._read_meta():
+            return 0
+        row_bytes = self.dim * self.dtype.itemsize
+        key_rows = self._keys_path.stat().st_size // _KEY_BYTES if self._keys_path.exists() else 0
+        vector_rows = self._vectors_path.stat().st_size // row_bytes if self._vectors_path.exists() else 0
+        rows = min(key_rows, vector_rows)
+        if trim:
+            for path, size in ((self._keys_path, rows * _KEY_BYTES), (self._vectors_path, rows * row_bytes)):
+                if path.exists() and path.stat().st_size != size:
+                    with path.open("r+b") as f:
+                        f.truncate(size)
+
+        known = len(self.index)
+        if rows > known:
+            with self._keys_path.open("rb") as f:
+                f.seek(known * _KEY_BYTES)
+                keys = f.read((rows - known) * _KEY_BYTES)
+            for i in range(rows - known):
+                self.index.setdefault(keys[i * _KEY_BYTES:(i + 1) * _KEY_BYTES], known + i)
+            self._map(rows)
+        return rows
+
+    def _map(self, rows: int) -> None:
+        self._vectors = (
+            np.memmap(self._vectors_path, dtype=self.dtype, mode="r", shape=(rows, self.dim))
+            if rows else None
+        )
+
+    def _append(self, vectors_by_key: dict[bytes, np.ndarray]) -> None:
+        """Append rows for keys no process has stored yet."""
+        with self._file_lock():
+            self._refresh(trim=True)
+            if self.dim is None:
+                self.dim = int(next(iter(vectors_by_key.values())).shape[0])
+                self._meta_path.write_text(
+                    json.dumps({
+                        "version": CACHE_VERSION,
+                        "model": self.model_name,
+                        "dim": self.dim,
+                        "dtype": self.dtype.name,
+                    }),
+                    encoding="utf-8",
+                )
+            keys = [key for key in vectors_by_key if key not in self.index]
+            if not keys:
+                return
+            row_bytes = self.dim * self.dtype.itemsize
+            start = self._vectors_path.stat().st_size // row_bytes if self._vectors_path.exists() else 0
+            vectors = np.stack([vectors_by_key[key] for key in keys])
+            with self._vectors_path.open("ab") as f:
+                f.write(np.ascontiguousarray(vectors, dtype=self.dtype).tobytes())
+            with self._keys_path.open("ab") as f:
+                f.write(b"".join(keys))
+            for offset, key in enumerate(keys):
+                self.index[key] = start + offset
+            self._map(start + len(keys))
+
+    def embed(self, texts: list[str], encode: Callable[[list[str]], np.ndarray]) -> np.ndarray:
+        """Return float32 embeddings for `texts`, encoding and storing only unseen ones."""
+        keys = [text_key(text) for text in texts]
+        with self._lock:
+            missing = {key: text for key, text in zip(keys, texts) if key not in self.index}
+            if missing and self.dir.exists():
+                # Another process may already have stored them.
+                with self._file_lock():
+                    self._refresh()
+                missing = {key: text for key, text in missing.items() if key not in self.index}
+            self.hits += len(texts) - sum(1 for key in keys if key in missing)
+            self.misses += len(missing)
+            if missing:
+                vectors = np.asarray(encode(list(missing.values())), dtype=np.float32)
+                self._append(dict(zip(missing, vectors)))
+            if not texts:
+                return np.zeros((0, self.dim or 0), dtype=np.float32)
+            rows = np.fromiter((self.index[key] for key in keys), dtype=np.int64, count=len(keys))
+            return np.asarray(self._vectors[rows], dtype=np.float32)
+
+    def taxonomy(self, taxonomy_sha: str, texts: list[str], encode: Callable[[list[str]], np.ndarray]) -> np.ndarray:
+        """Embeddings of the taxonomy texts, recomputed when the file or the texts change."""
+        digest = hashlib.sha256(taxonomy_sha.encode("utf-8"))
+        for text in texts:
+            digest.update(b"\0" + text.encode("utf-8"))
+        path = self.dir / f"taxonomy-{digest.hexdigest()[:16]}.npy"
+        if path.exists():
+            cached = np.load(path)
+            if cached.shape[0] == len(texts):
+                return np.asarray(cached, dtype=np.float32)
+        vectors = np.asarray(encode(texts), dtype=np.float32)
+        with self._file_lock():
+            for stale in self.dir.glob("taxonomy-*.npy"):
+                if stale != path:
+                    stale.unlink()
+            tmp_path = path.with_name(f"{path.name}.tmp")
+            with tmp_path.open("wb") as f:
+                np.save(f, vectors)
+            os.replace(tmp_path, path)
+        return vectors
+
+    def summary(self) -> str:
+        return (
+            f"Embedding cache {self.dir}: {self.hits} hits, {self.misses} encoded, "
+            f"{len(self.index)} stored"
+        )
@@ -0,0 +1,181 @@
+"""Route requests across several OpenAI-compatible endpoints.
+
+`EndpointPool` holds one pooled `AsyncOpenAI` client per base URL, sends each
+request to the healthy endpoint with the fewest outstanding requests, and runs
+a background health check against `GET {base_url}/models`. An endpoint stops
+receiving traffic after `max_failures` consecutive failed checks or connection
+errors and rejoins on its next successful check.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator
+
+import httpx
+import openai
+from openai import AsyncOpenAI
+
+
+@dataclass
+class Endpoint:
+    base_url: str
+    client: AsyncOpenAI
+    http_client: httpx.AsyncClient
+    outstanding: int = 0
+    healthy: bool = True
+    consecutive_failures: int = 0
+    requests: int = 0
+    errors: int = 0
+    last_error: str | None = field(default=None, repr=False)
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "base_url": self.base_url,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "errors": self.errors,
+            "last_error": self.last_error,
+        }
+
+
+class EndpointPool:
+    """Least-outstanding-requests router over OpenAI-compatible endpoints."""
+
+    def __init__(
+        self,
+        base_urls: list[str],
+        api_key: str = "EMPTY",
+        max_connections: int = 100,
+        timeout: float = 120.0,
+        health_interval: float = 5.0,
+        max_failures: int = 3,
+        unavailable_timeout: float = 300.0,
+        max_retries: int = openai.DEFAULT_MAX_RETRIES,
+    ):
+        if not base_urls:
+            raise ValueError("EndpointPool needs at least one base URL")
+        self.health_interval = health_interval
+        self.max_failures = max(1, int(max_failures))
+        self.unavailable_timeout = unavailable_timeout
+        self.endpoints: list[Endpoint] = []
+        for base_url in base_urls:
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_connections,
+                ),
+                timeout=httpx.Timeout(timeout, connect=10.0),
+            )
+            client = AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                timeout=timeout,
+                max_retries=max_retries,
+                http_client=http_client,
+            )
+            self.endpoints.append(Endpoint(base_url.rstrip("/"), client, http_client))
+        self._health_task: asyncio.Task | None = None
+        self._available = asyncio.Event()
+        self._available.set()
+
+    def __len__(self) -> int:
+        return len(self.endpoints)
+
+    def _pick(self) -> Endpoint | None:
+        healthy = [e for e in self.endpoints if e.healthy]
+        if not healthy:
+            return None
+        return min(healthy, key=lambda e: (e.outstanding, e.requests))
+
+    @asynccontextmanager
+    async def lease(self) -> AsyncIterator[Endpoint]:
+        """Borrow the least-loaded healthy endpoint for one request."""
+        deadline = time.monotonic() + self.unavailable_timeout
+        endpoint = self._pick()
+        while endpoint is None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise RuntimeError("No healthy OCR endpoints available")
+            self._available.clear()
+            try:
+                await asyncio.wait_for(self._available.wait(), timeout=min(remaining, self.health_interval))
+            except asyncio.TimeoutError:
+                pass
+            endpoint = self._pick()
+
+        endpoint.outstanding += 1
+        endpoint.requests += 1
+        try:
+            yield endpoint
+        except (openai.APIConnectionError, httpx.TransportError) as exc:
+            # Timeouts are load, not health; only connection failures count.
+            if not isinstance(exc, (openai.APITimeoutError, httpx.TimeoutException)):
+                self._record_failure(endpoint, exc)
+            endpoint.errors += 1
+            raise
+        except Exception:
+            endpoint.errors += 1
+            raise
+        else:
+            endpoint.consecutive_failures = 0
+        finally:
+            endpoint.outstanding -= 1
+
+    def _record_failure(self, endpoint: Endpoint, exc: Exception) -> None:
+        endpoint.consecutive_failures += 1
+        endpoint.last_error = str(exc)
+        if endpoint.healthy and endpoint.consecutive_failures >= self.max_failures:
+            endpoint.healthy = False
+            print(f"Endpoint {endpoint.base_url} marked unhealthy: {exc}")
+
+    def _record_success(self, endpoint: Endpoint) -> None:
+        endpoint.consecutive_failures = 0
+        if not endpoint.healthy:
+            endpoint.healthy = True
+            print(f"Endpoint {endpoint.base_url} is healthy again")
+        self._available.set()
+
+    async def check(self, endpoint: Endpoint) -> bool:
+        try:
+            response = await endpoint.http_client.get(
+                f"{endpoint.base_url}/models",
+                headers={"Authorization": f"Bearer {endpoint.client.api_key}"},
+                timeout=5.0,
+            )
+            response.raise_for_status()
+        except Exception as exc:
+            self._record_failure(endpoint, exc)
+            return False
+        self._record_success(endpoint)
+        return True
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.gather(*(self.check(e) for e in self.endpoints))
+            await asyncio.sleep(self.health_interval)
+
+    def start_health_checks(self) -> None:
+        if self._health_task is None:
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    async def stop_health_checks(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+
+    async def aclose(self) -> None:
+        await self.stop_health_checks()
+        for endpoint in self.endpoints:
+            await endpoint.client.close()
+
+    def snapshot(self) -> list[dict[str, Any]]:
+        return [e.snapshot() for e in self.endpoints]
@@ -0,0 +1,203 @@
+"""Find segment-header candidates from a segmentation plan's regex rules.
+
+Each rule is matched with its own `re.finditer`. Candidates are returned as
+(start, end) character spans, sorted by start and with overlapping matches
+collapsed to the earliest one (ties go to the rule listed first). The
+segmentation runner and anything that needs to line up with its
+`boundary_evaluations.json` (one entry per candidate, in this order) must use
+the same function.
+
+The rules are written by the planning model, so they are validated before use:
+rules that do not compile, are longer than `MAX_RULE_LENGTH`, can match the
+empty string, or repeat an earlier rule are dropped.
+
+Python's `re` cannot be interrupted, and a backtracking rule can run for
+hours on a long contract. Matching therefore runs in a worker process that
+is killed after `timeout` seconds. When a document's scan times out, each
+rule is retried on its own with the same timeout and only the slow rules are
+dropped.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import re
+import threading
+from dataclasses import dataclass, field
+
+MAX_RULE_LENGTH = 512
+DEFAULT_TIMEOUT = 20.0
+
+
+@dataclass
+class HeaderRuleSet:
+    """Validated rules, in plan order, and the reasons others were dropped."""
+
+    rules: list[str]
+    rejected: dict[str, str] = field(default_factory=dict)
+
+    def patterns(self) -> list[tuple[str, int]]:
+        """(pattern, rule index) pairs to scan."""
+        return list(enumerate(self.rules))
+
+
+@dataclass
+class HeaderMatchResult:
+    spans: list[tuple[int, int]]
+    rejected: dict[str, str]
+
+
+def compile_header_rules(rules: list[str]) -> HeaderRuleSet:
+    """Validate and deduplicate `rules`."""
+    kept: list[str] = []
+    rejected: dict[str, str] = {}
+    for rule in rules:
+        if not isinstance(rule, str) or not rule.strip():
+            rejected[str(rule)] = "empty rule"
+            continue
+        if rule in kept:
+            continue
+        if len(rule) > MAX_RULE_LENGTH:
+            rejected[rule] = f"longer than {MAX_RULE_LENGTH} characters"
+            continue
+        try:
+            compiled = re.compile(rule, flags=re.MULTILINE)
+        except re.error as exc:
+            rejected[rule] = f"invalid regex: {exc}"
+            continue
+        if compiled.match("") is not None:
+            rejected[rule] = "matches the empty string"
+            continue
+        kept.append(rule)
+
+    return HeaderRuleSet(rules=kept, rejected=rejected)
+
+
+def _scan(text: str, pattern: str, rule_index: int) -> list[tuple[int, int, int]]:
+    """Return (start, end, rule index) for every match of one rule."""
+    return [(m.start(), m.end(), rule_index) for m in re.finditer(pattern, text, flags=re.MULTILINE)]
+
+
+def _merge(matches: list[tuple[int, int, int]]) -> list[tuple[int, int]]:
+    matches.sort(key=lambda match: (match[0], match[2]))
+    unique: list[tuple[int, int]] = []
+    last_end = -1
+    for start, end, _ in matches:
+        if start >= last_end:
+            unique.append((start, end))
+            last_end = end
+    return unique
+
+
+def _worker_main(conn) -> None:
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            return
+        if request is None:
+            return
+        text, scans = request
+        try:
+            matches = []
+            for pattern, rule_index in scans:
+                matches.extend(_scan(text, pattern, rule_index))
+            conn.send(("ok", matches))
+        except Exception as exc:
+            conn.send(("error", repr(exc)))
+
+
+class _MatchWorker:
+    def __init__(self):
+        ctx = multiprocessing.get_context("spawn")
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def run(self, text: str, scans: list[tuple[str, int]], timeout: float):
+        """Return the worker's reply, or None after killing it on timeout."""
+        self.conn.send((text, scans))
+        if self.conn.poll(timeout):
+            return self.conn.recv()
+        self.kill()
+        return None
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def close(self) -> None:
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+        self.conn.close()
+
+
+class HeaderMatcher:
+    """Thread-safe pool of match workers with a per-scan timeout."""
+
+    def __init__(self, timeout: float = DEFAULT_TIMEOUT):
+        self.timeout = timeout
+        self._idle: list[_MatchWorker] = []
+        self._lock = threading.Lock()
+
+    def _scan(self, text: str, scans: list[tuple[str, int]]):
+        with self._lock:
+            worker = self._idle.pop() if self._idle else None
+        if worker is None:
+            worker = _MatchWorker()
+        reply = worker.run(text, scans, self.timeout)
+        if reply is not None:
+            with self._lock:
+                self._idle.append(worker)
+        return reply
+
+    def match(self, text: str, rules: list[str]) -> HeaderMatchResult:
+        """Return candidate spans for `rules` and the rules that were dropped."""
+        rule_set = compile_header_rules(rules)
+        rejected = dict(rule_set.rejected)
+        scans = rule_set.patterns()
+        if not scans:
+            return HeaderMatchResult([], rejected)
+
+        # All rules in one worker round trip; per-rule only to isolate a failure.
+        reply = self._scan(text, scans)
+        if reply is not None and reply[0] == "ok":
+            return HeaderMatchResult(_merge(reply[1]), rejected)
+
+        # Find the slow or failing rules by running each one alone.
+        matches = []
+        for i, rule in enumerate(rule_set.rules):
+            reply = self._scan(text, [(rule, i)])
+            if reply is None:
+                rejected[rule] = f"timed out after {self.timeout:g}s"
+            elif reply[0] != "ok":
+                rejected[rule] = f"failed: {reply[1]}"
+            else:
+                matches.extend(reply[1])
+        return HeaderMatchResult(_merge(matches), rejected)
+
+    def close(self) -> None:
+        with self._lock:
+            workers, self._idle = self._idle, []
+        for worker in workers:
+            worker.close()
+
+
+_default_matcher: HeaderMatcher | None = None
+_default_lock = threading.Lock()
+
+
+def find_header_candidates(text: str, rules: list[str]) -> list[tuple[int, int]]:
+    """Return ordered, non-overlapping spans matched by any valid rule in `rules`."""
+    global _default_matcher
+    with _default_lock:
+        if _default_matcher is None:
+            _default_matcher = HeaderMatcher()
+    return _default_matcher.match(text, rules).spans
@@ -0,0 +1,118 @@
+"""Append-only progress journal for the per-document JSON run caches.
+
+Stage caches such as `01_ocr_cache.json` map document ids to progress fields.
+Rewriting that whole file after every finished unit costs O(units^2) bytes
+over a run, so progress is appended to a sidecar `*.journal.jsonl` instead,
+one line per event, and folded back into the JSON snapshot on startup.
+
+Journal lines look like:
+
+    {"document_id": "document_8", "page": 3}
+    {"document_id": "document_8", "page": 4}
+
+A torn final line from a crash is ignored during replay.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Any, TextIO
+
+
+class CacheJournal:
+    """JSON snapshot plus an append-only JSONL log of per-document updates."""
+
+    def __init__(self, cache_file: Path, fsync: bool = False):
+        self.cache_file = Path(cache_file)
+        self.journal_path = self.cache_file.with_name(f"{self.cache_file.stem}.journal.jsonl")
+        self.fsync = fsync
+        self.cache: dict[str, Any] = {"documents": {}}
+        self._handle: TextIO | None = None
+
+    def load(self) -> dict[str, Any]:
+        """Return the snapshot with every journaled event replayed on top.
+
+        The returned dict stays bound to the journal: `record_page` calls update
+        it in place before appending to disk.
+        """
+        cache = self._read_snapshot()
+        if self.journal_path.exists():
+            with self.journal_path.open("r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        event = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if isinstance(event, dict):
+                        self.apply(cache, event)
+        self.cache = cache
+        return cache
+
+    def _read_snapshot(self) -> dict[str, Any]:
+        if not self.cache_file.exists():
+            return {"documents": {}}
+        try:
+            cache = json.loads(self.cache_file.read_text(encoding="utf-8"))
+        except Exception:
+            return {"documents": {}}
+        if not isinstance(cache, dict):
+            return {"documents": {}}
+        cache.setdefault("documents", {})
+        return cache
+
+    @staticmethod
+    def apply(cache: dict[str, Any], event: dict[str, Any]) -> None:
+        """Fold a single journal event into an in-memory cache."""
+        doc_id = event.get("document_id")
+        if not doc_id:
+            return
+        doc_cache = cache.setdefault("documents", {}).setdefault(doc_id, {})
+
+        page = event.get("page")
+        if isinstance(page, int):
+            pages = set(doc_cache.get("processed_pages", []))
+            pages.add(page)
+            doc_cache["processed_pages"] = sorted(pages)
+            doc_cache["last_processed_page"] = max(pages)
+            meta = event.get("meta")
+            if isinstance(meta, dict):
+                doc_cache.setdefault("page_meta", {})[str(page)] = meta
+
+    def compact(self, cache: dict[str, Any] | None = None) -> None:
+        """Atomically rewrite the snapshot from `cache` and truncate the journal."""
+        if cache is None:
+            cache = self.cache
+        self.close()
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_file.with_name(f"{self.cache_file.name}.tmp")
+        tmp_path.write_text(json.dumps(cache, indent=2, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, self.cache_file)
+        if self.journal_path.exists():
+            self.journal_path.unlink()
+
+    def append(self, event: dict[str, Any]) -> None:
+        """Apply one event to the bound cache and append it (flushed; fsynced if `fsync`)."""
+        self.apply(self.cache, event)
+        if self._handle is None:
+            self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+            self._handle = self.journal_path.open("a", encoding="utf-8")
+        self._handle.write(json.dumps(event, ensure_ascii=False) + "\n")
+        self._handle.flush()
+        if self.fsync:
+            os.fsync(self._handle.fileno())
+
+    def record_page(self, document_id: str, page: int, meta: dict[str, Any] | None = None) -> None:
+        event: dict[str, Any] = {"document_id": document_id, "page": int(page)}
+        if meta:
+            event["meta"] = meta
+        self.append(event)
+
+    def close(self) -> None:
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
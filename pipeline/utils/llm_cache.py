@@ -0,0 +1,327 @@
+"""Content-addressed cache for chat-completion responses, shared by all stages.
+
+Every stage that calls an LLM wraps its OpenAI client with
+`with_response_cache`. A request is keyed by the SHA-256 of its endpoint and
+request body (base URL, model, messages, response_format, temperature,
+max tokens and any other body parameters). An identical request, from any
+stage or any earlier run, is then answered from SQLite without an API call.
+Re-running a stage after a crash, or after changing an unrelated step, costs
+no duplicate calls.
+
+A response is stored only after the calling stage has validated it and
+called `accept_response`, and only if it finished (`finish_reason == "stop"`)
+and, for JSON requests, parses. A stage that rejects a response calls
+`reject_response`, which also evicts it if it was served from the cache, so
+the stage's retry reaches the API. Entries can expire after `ttl_seconds`.
+When the database grows past `max_bytes`, the least recently used entries
+are evicted.
+
+Stages open the cache with `open_response_cache(cache_dir)`. It defaults to
+`<cache_dir>/llm_response_cache.sqlite`, and the environment can override it:
+`LLM_CACHE_PATH`, `LLM_CACHE_TTL_HOURS` and `LLM_CACHE_MAX_MB`.
+
+    cache = open_response_cache(cache_dir)
+    client = with_response_cache(OpenAI(...), cache)
+    request = dict(model=..., messages=...)
+    response = client.chat.completions.create(**request)
+    if valid(response):
+        accept_response(client, request, response)
+    else:
+        reject_response(client, request)
+    print(cache.summary())
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+DEFAULT_CACHE_NAME = "llm_response_cache.sqlite"
+
+# Client-side options that do not change what the model is asked.
+_TRANSPORT_KEYS = {"timeout", "extra_headers", "extra_query", "stream"}
+_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$", re.IGNORECASE)
+
+
+def default_cache_path(cache_dir: str | Path | None) -> Path | None:
+    """`$LLM_CACHE_PATH`, else `<cache_dir>/llm_response_cache.sqlite`, else None."""
+    override = os.environ.get("LLM_CACHE_PATH", "").strip()
+    if override:
+        return Path(override)
+    if cache_dir is None or not str(cache_dir).strip():
+        return None
+    return Path(cache_dir) / DEFAULT_CACHE_NAME
+
+
+def open_response_cache(cache_dir: str | Path | None) -> LLMResponseCache | None:
+    """Open the shared cache, or return None when no location is configured."""
+    path = default_cache_path(cache_dir)
+    if path is None:
+        return None
+    ttl_hours = os.environ.get("LLM_CACHE_TTL_HOURS", "").strip()
+    max_mb = os.environ.get("LLM_CACHE_MAX_MB", "").strip()
+    return LLMResponseCache(
+        path,
+        ttl_seconds=float(ttl_hours) * 3600 if ttl_hours else None,
+        max_bytes=int(float(max_mb) * 1e6) if max_mb else None,
+    )
+
+
+def request_key(base_url: str, request: dict[str, Any]) -> str:
+    body = {k: v for k, v in request.items() if k not in _TRANSPORT_KEYS}
+    canonical = json.dumps(
+        {"base_url": base_url.rstrip("/"), "request": body},
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _parses_as_json(content: str) -> bool:
+    text = _FENCE_RE.sub("", content.strip())
+    for candidate in (text, text[text.find("{"):text.rfind("}") + 1]):
+        try:
+            json.loads(candidate)
+            return True
+        except ValueError:
+            continue
+    return False
+
+
+def _cacheable(request: dict[str, Any], response: dict[str, Any]) -> bool:
+    choices = response.get("choices") or []
+    if not choices or any(choice.get("finish_reason") != "stop" for choice in choices):
+        return False
+    message = choices[0].get("message") or {}
+    content = message.get("content") or ""
+    if not content.strip():
+        return bool(message.get("tool_calls"))
+    response_format = request.get("response_format") or {}
+    if isinstance(response_format, dict) and str(response_format.get("type", "")).startswith("json"):
+        return _parses_as_json(content)
+    return True
+
+
+class LLMResponseCache:
+    """SQLite store of chat-completion responses with TTL and LRU size eviction."""
+
+    def __init__(
+        self,
+        path: str | Path,
+        ttl_seconds: float | None = None,
+        max_bytes: int | None = None,
+    ):
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self._puts_since_evict = 0
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT,"
+            " response TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_used_at REAL NOT NULL,"
+            " hits INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses(last_used_at)")
+        self._conn.commit()
+        if self.ttl_seconds is not None or self.max_bytes is not None:
+            with self._lock:
+                self._evict()
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl_seconds is not None and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE responses SET last_used_at = ?, hits = hits + 1 WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, model: str | None, response: dict[str, Any]) -> None:
+        """Store a response; an existing entry for `key` is kept as is."""
+        payload = json.dumps(response, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO responses (key, model, response, size, created_at, last_used_at, hits)"
+                " VALUES (?, ?, ?, ?, ?, ?, 0)",
+                (key, model, payload, len(payload.encode("utf-8")), now, now),
+            )
+            self._conn.commit()
+            if cursor.rowcount == 0:
+                return
+            self.stores += 1
+            self._puts_since_evict += 1
+            if self.max_bytes is not None and self._puts_since_evict >= 100:
+                self._evict()
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._conn.commit()
+            self.evictions += cursor.rowcount
+
+    def _evict(self) -> None:
+        """Drop expired entries, then least recently used ones beyond `max_bytes`."""
+        self._puts_since_evict = 0
+        if self.ttl_seconds is not None:
+            cursor = self._conn.execute(
+                "DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            )
+            self.evictions += cursor.rowcount
+        if self.max_bytes is not None:
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                # Evict down to 90% so the next few puts do not trigger another pass.
+                target = total - int(self.max_bytes * 0.9)
+                freed = 0
+                stale = []
+                for key, size in self._conn.execute(
+                    "SELECT key, size FROM responses ORDER BY last_used_at"
+                ):
+                    if freed >= target:
+                        break
+                    stale.append((key,))
+                    freed += size
+                self._conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+                self.evictions += len(stale)
+        self._conn.commit()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def summary(self) -> str:
+        stats = self.stats()
+        return (
+            f"LLM cache {self.path}: {stats['hits']} hits, {stats['misses']} misses, "
+            f"{stats['stores']} stored, {stats['entries']} entries ({stats['bytes'] / 1e6:.1f} MB)"
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class _CachedCompletions:
+    def __init__(self, completions, cache: LLMResponseCache, base_url: str):
+        self._completions = completions
+        self._cache = cache
+        self._base_url = base_url
+
+    def _lookup(self, kwargs: dict[str, Any]):
+        if kwargs.get("stream"):
+            return None
+        from openai.types.chat import ChatCompletion
+
+        cached = self._cache.get(request_key(self._base_url, kwargs))
+        return ChatCompletion.model_validate(cached) if cached is not None else None
+
+    def accept(self, kwargs: dict[str, Any], response) -> None:
+        if kwargs.get("stream"):
+            return
+        data = response.model_dump(mode="json")
+        if _cacheable(kwargs, data):
+            self._cache.put(request_key(self._base_url, kwargs), kwargs.get("model"), data)
+
+    def reject(self, kwargs: dict[str, Any]) -> None:
+        self._cache.discard(request_key(self._base_url, kwargs))
+
+    def create(self, **kwargs):
+        cached = self._lookup(kwargs)
+        if cached is not None:
+            return cached
+        return self._completions.create(**kwargs)
+
+    def __getattr__(self, name: str):
+        return getattr(self._completions, name)
+
+
+class _AsyncCachedCompletions(_CachedCompletions):
+    async def create(self, **kwargs):
+        cached = await asyncio.to_thread(self._lookup, kwargs)
+        if cached is not None:
+            return cached
+        return await self._completions.create(**kwargs)
+
+
+class _CachedChat:
+    def __init__(self, completions):
+        self.completions = completions
+
+
+class CachedChatClient:
+    """Proxy for an OpenAI/AsyncOpenAI client whose chat completions go through the cache."""
+
+    def __init__(self, client, cache: LLMResponseCache):
+        from openai import AsyncOpenAI
+
+        self._client = client
+        self.cache = cache
+        wrapper = _AsyncCachedCompletions if isinstance(client, AsyncOpenAI) else _CachedCompletions
+        self.chat = _CachedChat(wrapper(client.chat.completions, cache, str(client.base_url)))
+
+    def __getattr__(self, name: str):
+        return getattr(self._client, name)
+
+
+def with_response_cache(client, cache: LLMResponseCache | None):
+    """Return `client` unchanged when caching is off, otherwise a caching proxy."""
+    return client if cache is None else CachedChatClient(client, cache)
+
+
+def accept_response(client, request: dict[str, Any], response) -> None:
+    """Store `response` to `request` after the caller has validated it."""
+    if isinstance(client, CachedChatClient):
+        client.chat.completions.accept(request, response)
+
+
+def reject_response(client, request: dict[str, Any]) -> None:
+    """Drop any cached response to `request` so the next attempt reaches the API."""
+    if isinstance(client, CachedChatClient):
+        client.chat.completions.reject(request)
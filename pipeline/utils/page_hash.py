@@ -0,0 +1,100 @@
+"""Perceptual fingerprints for rendered pages: blank detection and duplicate keys.
+
+The ink ratio (share of dark pixels) is measured on the grayscale page at
+render resolution and flags blank separator pages. Downscaling would lighten
+thin strokes, and a page holding only a page number has a few dozen dark
+pixels, so the runner's default treats only pages with no ink as blank. A
+binarized `hash_size` x
+`hash_size` average hash, digested to a short hex key, identifies pages that
+render identically, such as repeated signature or boilerplate pages.
+
+Dense text pages with the same layout look alike at coarse resolutions, so the
+default hash is deliberately fine-grained and only exact key matches count as
+duplicates.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import io
+from dataclasses import dataclass
+from typing import Any
+
+INK_THRESHOLD = 160
+
+
+@dataclass
+class PageFingerprint:
+    phash: str
+    ink_ratio: float
+
+    def is_blank(self, max_ink_ratio: float) -> bool:
+        return self.ink_ratio <= max_ink_ratio
+
+
+def page_fingerprint(png_bytes: bytes, hash_size: int = 64) -> PageFingerprint:
+    """Fingerprint a rendered page image."""
+    from PIL import Image
+
+    with Image.open(io.BytesIO(png_bytes)) as image:
+        gray = image.convert("L")
+
+    # Count from the 256-bin histogram rather than looping over pixels in
+    # Python: this runs on the event-loop process and would hold the GIL.
+    histogram = gray.histogram()
+    total = sum(histogram)
+    ink_ratio = sum(histogram[:INK_THRESHOLD]) / total if total else 0.0
+
+    small = gray.resize((hash_size, hash_size), Image.Resampling.BOX)
+    histogram = small.histogram()
+    mean = sum(value * count for value, count in enumerate(histogram)) / sum(histogram)
+    bits = small.point(lambda value: 1 if value < mean else 0).tobytes()
+    phash = hashlib.sha1(bits + hash_size.to_bytes(2, "big")).hexdigest()
+    return PageFingerprint(phash=phash, ink_ratio=round(ink_ratio, 8))
+
+
+class DuplicatePageIndex:
+    """Track which page first produced OCR text for each fingerprint.
+
+    Workers call `acquire` before sending a page to the model. It returns the
+    (document_id, page) to copy from when one is known, waits while another
+    worker is OCR'ing the same fingerprint, and otherwise returns None and
+    makes the caller the owner, who must later call `release`.
+    """
+
+    def __init__(self):
+        self._known: dict[str, tuple[str, int]] = {}
+        self._pending: dict[str, asyncio.Future] = {}
+
+    @classmethod
+    def from_cache(cls, cache: dict[str, Any]) -> "DuplicatePageIndex":
+        """Rebuild the index from model-OCR'd pages recorded in the run cache."""
+        index = cls()
+        for doc_id, doc_cache in cache.get("documents", {}).items():
+            for page, meta in doc_cache.get("page_meta", {}).items():
+                if meta.get("source") == "model" and meta.get("phash"):
+                    index._known.setdefault(meta["phash"], (doc_id, int(page)))
+        return index
+
+    def __len__(self) -> int:
+        return len(self._known)
+
+    async def acquire(self, phash: str) -> tuple[str, int] | None:
+        while True:
+            source = self._known.get(phash)
+            if source is not None:
+                return source
+            pending = self._pending.get(phash)
+            if pending is None:
+                self._pending[phash] = asyncio.get_running_loop().create_future()
+                return None
+            await asyncio.shield(pending)
+
+    def release(self, phash: str, source: tuple[str, int] | None) -> None:
+        """Publish the owner's result; on failure the next waiter takes over."""
+        if source is not None:
+            self._known.setdefault(phash, source)
+        pending = self._pending.pop(phash, None)
+        if pending is not None and not pending.done():
+            pending.set_result(source)
@@ -0,0 +1,140 @@
+"""Persistent manifest of input PDFs: size, mtime, SHA-256 and page count.
+
+Planning an OCR run needs every PDF's page count, and noticing a replaced PDF
+needs its content hash. Both are expensive for thousands of archive files, so
+they are computed once in a process pool and stored in a JSON manifest. Later
+runs re-scan only files whose size or mtime changed; an unchanged archive
+loads straight from the manifest.
+
+    {"version": 1, "files": {"document_8.pdf": {"size": 81234, "mtime_ns": ...,
+     "sha256": "9f...", "page_count": 42, "error": null}}}
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+MANIFEST_VERSION = 1
+
+
+@dataclass
+class PdfManifestEntry:
+    size: int
+    mtime_ns: int
+    sha256: str | None
+    page_count: int | None
+    error: str | None = None
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+def count_pages(pdf_path: str | Path) -> int | None:
+    """Return the PDF page count, or None when the file cannot be parsed."""
+    from pypdf import PdfReader
+
+    try:
+        with Path(pdf_path).open("rb") as f:
+            return len(PdfReader(f, strict=False).pages)
+    except Exception:
+        return None
+
+
+def scan_pdf(pdf_path: str) -> PdfManifestEntry:
+    """Stat, hash and count the pages of one PDF (runs in a worker process)."""
+    path = Path(pdf_path)
+    stat = path.stat()
+    try:
+        with path.open("rb") as f:
+            sha256 = hashlib.file_digest(f, "sha256").hexdigest()
+    except OSError as exc:
+        return PdfManifestEntry(stat.st_size, stat.st_mtime_ns, None, None, str(exc))
+    page_count = count_pages(path)
+    return PdfManifestEntry(
+        size=stat.st_size,
+        mtime_ns=stat.st_mtime_ns,
+        sha256=sha256,
+        page_count=page_count,
+        error=None if page_count is not None else "unable to read page count",
+    )
+
+
+class PdfManifest:
+    """JSON-backed manifest keyed by PDF file name."""
+
+    def __init__(self, manifest_path: str | Path):
+        self.manifest_path = Path(manifest_path)
+        self.entries: dict[str, PdfManifestEntry] = {}
+        self.scanned = 0
+        self.reused = 0
+        self._load()
+
+    def _load(self) -> None:
+        if not self.manifest_path.exists():
+            return
+        try:
+            data = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+        except Exception:
+            return
+        if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION:
+            return
+        for name, raw in data.get("files", {}).items():
+            try:
+                self.entries[name] = PdfManifestEntry(**raw)
+            except TypeError:
+                continue
+
+    def get(self, pdf_path: str | Path) -> PdfManifestEntry | None:
+        return self.entries.get(Path(pdf_path).name)
+
+    def refresh(self, pdfs: list[Path], workers: int | None = None) -> dict[str, PdfManifestEntry]:
+        """Bring entries for `pdfs` up to date and return those that were re-scanned.
+
+        A file is re-scanned only when its size or mtime differs from the
+        manifest. The returned mapping lets callers compare old and new hashes.
+        """
+        stale: list[Path] = []
+        self.scanned = 0
+        self.reused = 0
+        for pdf_path in pdfs:
+            entry = self.entries.get(pdf_path.name)
+            stat = pdf_path.stat()
+            if entry is not None and entry.size == stat.st_size and entry.mtime_ns == stat.st_mtime_ns:
+                self.reused += 1
+            else:
+                stale.append(pdf_path)
+
+        rescanned: dict[str, PdfManifestEntry] = {}
+        if stale:
+            workers = max(1, min(workers or os.cpu_count() or 1, len(stale)))
+            if workers == 1:
+                results = [scan_pdf(str(p)) for p in stale]
+            else:
+                ctx = multiprocessing.get_context("spawn")
+                with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+                    results = list(
+                        pool.map(scan_pdf, [str(p) for p in stale], chunksize=max(1, len(stale) // (workers * 4)))
+                    )
+            for pdf_path, entry in zip(stale, results):
+                self.entries[pdf_path.name] = entry
+                rescanned[pdf_path.name] = entry
+            self.scanned = len(stale)
+            self.save()
+        return rescanned
+
+    def save(self) -> None:
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {
+            "version": MANIFEST_VERSION,
+            "files": {name: entry.to_dict() for name, entry in sorted(self.entries.items())},
+        }
+        tmp_path = self.manifest_path.with_name(f"{self.manifest_path.name}.tmp")
+        tmp_path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+        os.replace(tmp_path, self.manifest_path)
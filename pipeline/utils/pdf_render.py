@@ -0,0 +1,315 @@
+"""Process-pool PDF page rendering for the OCR stage.
+
+Pages are rasterized inside dedicated worker processes so that rendering does
+not compete with the HTTP client for the GIL. The default renderer is
+olmocr's `render_pdf_to_base64png` (pdftoppm), the same images the OCR model
+has always been sent. `renderer="pdfium"` opts into pypdfium2, which keeps a
+small LRU of open documents per worker instead of re-opening the PDF for
+every page. Both scale the page so its longest side is
+`target_longest_image_dim` pixels, but the rasterizers differ, so pdfium
+images are not pixel-identical to pdftoppm ones. Pages are routed to workers
+in contiguous chunks so consecutive pages of a document land on the same
+process.
+
+Pages are PNG by default. `ImageEncoding` selects JPEG or WebP at a given
+quality, optionally in grayscale, which makes request bodies for scanned
+pages several times smaller.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import difflib
+import functools
+import io
+import multiprocessing
+import re
+import subprocess
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+IMAGE_FORMATS = ("png", "jpeg", "webp")
+RENDERERS = ("pdftoppm", "pdfium")
+DEFAULT_RENDERER = "pdftoppm"
+
+_MAX_OPEN_DOCUMENTS = 8
+_OPEN_DOCUMENTS: OrderedDict[str, object] = OrderedDict()
+
+
+@dataclass(frozen=True)
+class ImageEncoding:
+    """How a rendered page is encoded before it is sent to the model."""
+
+    format: str = "png"
+    quality: int = 85
+    grayscale: bool = False
+
+    def __post_init__(self):
+        fmt = self.format.lower()
+        if fmt == "jpg":
+            fmt = "jpeg"
+        if fmt not in IMAGE_FORMATS:
+            raise ValueError(f"Unsupported image format {self.format!r}; expected one of {IMAGE_FORMATS}")
+        object.__setattr__(self, "format", fmt)
+        object.__setattr__(self, "quality", max(1, min(100, int(self.quality))))
+
+    @property
+    def mime_type(self) -> str:
+        return f"image/{self.format}"
+
+    @property
+    def is_default(self) -> bool:
+        return self.format == "png" and not self.grayscale
+
+    def cache_size_key(self, target_longest_image_dim: int) -> int | str:
+        """Render-cache size component; plain PNG keeps the historical key."""
+        if self.is_default:
+            return target_longest_image_dim
+        key = f"{target_longest_image_dim}"
+        if self.format != "png":
+            key += f"_q{self.quality}"
+        if self.grayscale:
+            key += "_gray"
+        return key
+
+    def describe(self) -> str:
+        label = self.format if self.format == "png" else f"{self.format} q{self.quality}"
+        return f"{label}{' grayscale' if self.grayscale else ''}"
+
+
+PNG = ImageEncoding()
+
+
+def encode_image(image, encoding: ImageEncoding = PNG) -> bytes:
+    """Encode a PIL image with the given settings."""
+    if encoding.grayscale and image.mode != "L":
+        image = image.convert("L")
+    elif encoding.format == "jpeg" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    buf = io.BytesIO()
+    if encoding.format == "png":
+        image.save(buf, format="PNG")
+    elif encoding.format == "jpeg":
+        image.save(buf, format="JPEG", quality=encoding.quality, optimize=True)
+    else:
+        image.save(buf, format="WEBP", quality=encoding.quality, method=4)
+    return buf.getvalue()
+
+
+def transcode_image(data: bytes, encoding: ImageEncoding = PNG) -> bytes:
+    """Re-encode image bytes (e.g. a PNG from another renderer) with `encoding`."""
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as image:
+        image.load()
+        return encode_image(image, encoding)
+
+
+@functools.lru_cache(maxsize=None)
+def renderer_id(renderer: str = DEFAULT_RENDERER) -> str:
+    """Renderer name plus the version of the library that rasterizes, e.g. "pdftoppm-24.02.0"."""
+    version = "unknown"
+    if renderer == "pdfium":
+        try:
+            import pypdfium2
+
+            info = getattr(getattr(pypdfium2, "version", None), "PDFIUM_INFO", None)
+            version = str(info if info is not None else getattr(pypdfium2, "V_PDFIUM", version))
+        except ImportError:
+            pass
+    else:
+        try:
+            proc = subprocess.run(["pdftoppm", "-v"], capture_output=True, text=True, timeout=10)
+            match = re.search(r"version\s+(\S+)", proc.stderr + proc.stdout)
+            if match:
+                version = match.group(1)
+        except (OSError, subprocess.SubprocessError):
+            pass
+    return f"{renderer}-{version}"
+
+
+def _init_worker(max_open_documents: int) -> None:
+    global _MAX_OPEN_DOCUMENTS
+    _MAX_OPEN_DOCUMENTS = max(1, int(max_open_documents))
+
+
+def _open_document(pdf_path: str):
+    import pypdfium2 as pdfium
+
+    pdf = _OPEN_DOCUMENTS.get(pdf_path)
+    if pdf is not None:
+        _OPEN_DOCUMENTS.move_to_end(pdf_path)
+        return pdf
+
+    pdf = pdfium.PdfDocument(pdf_path)
+    _OPEN_DOCUMENTS[pdf_path] = pdf
+    while len(_OPEN_DOCUMENTS) > _MAX_OPEN_DOCUMENTS:
+        _, evicted = _OPEN_DOCUMENTS.popitem(last=False)
+        evicted.close()
+    return pdf
+
+
+def render_page_image(
+    pdf_path: str,
+    page: int,
+    target_longest_image_dim: int,
+    encoding: ImageEncoding = PNG,
+) -> bytes:
+    """Render a 1-indexed page with its longest side at the target size."""
+    pdf = _open_document(pdf_path)
+    page_obj = pdf[page - 1]
+    try:
+        width, height = page_obj.get_size()
+        scale = target_longest_image_dim / max(width, height, 1.0)
+        bitmap = page_obj.render(scale=scale, grayscale=encoding.grayscale)
+        return encode_image(bitmap.to_pil(), encoding)
+    finally:
+        page_obj.close()
+
+
+def render_page_png(pdf_path: str, page: int, target_longest_image_dim: int) -> bytes:
+    """Render a 1-indexed page to PNG bytes with its longest side at the target size."""
+    return render_page_image(pdf_path, page, target_longest_image_dim)
+
+
+def render_page_pdftoppm(
+    pdf_path: str,
+    page: int,
+    target_longest_image_dim: int,
+    encoding: ImageEncoding = PNG,
+) -> str:
+    """Render a page with olmocr's pdftoppm renderer, as the OCR runner always has."""
+    from olmocr.data.renderpdf import render_pdf_to_base64png
+
+    image_base64 = render_pdf_to_base64png(
+        local_pdf_path=pdf_path,
+        page_num=page - 1,
+        target_longest_image_dim=target_longest_image_dim,
+    )
+    if encoding.is_default:
+        return image_base64
+    return base64.b64encode(transcode_image(base64.b64decode(image_base64), encoding)).decode("ascii")
+
+
+def _render_page_base64(
+    pdf_path: str,
+    page: int,
+    target_longest_image_dim: int,
+    encoding: ImageEncoding = PNG,
+    renderer: str = DEFAULT_RENDERER,
+) -> tuple[str, float]:
+    started = time.perf_counter()
+    if renderer == "pdfium":
+        image_bytes = render_page_image(pdf_path, page, target_longest_image_dim, encoding)
+        image_base64 = base64.b64encode(image_bytes).decode("ascii")
+    else:
+        image_base64 = render_page_pdftoppm(pdf_path, page, target_longest_image_dim, encoding)
+    return image_base64, time.perf_counter() - started
+
+
+def split_image_base64(
+    image_base64: str,
+    encoding: ImageEncoding = PNG,
+    overlap: float = 0.03,
+) -> list[str]:
+    """Split a base64 page image into top and bottom halves that overlap slightly.
+
+    The overlap keeps a text line that straddles the midpoint whole in at
+    least one half.
+    """
+    from PIL import Image
+
+    with Image.open(io.BytesIO(base64.b64decode(image_base64))) as image:
+        image.load()
+        width, height = image.size
+        cut = height // 2
+        margin = int(height * overlap)
+        halves = [
+            image.crop((0, 0, width, min(height, cut + margin))),
+            image.crop((0, max(0, cut - margin), width, height)),
+        ]
+    return [base64.b64encode(encode_image(half, encoding)).decode("ascii") for half in halves]
+
+
+def _same_line(a: str, b: str) -> bool:
+    a, b = " ".join(a.split()), " ".join(b.split())
+    return a == b or (bool(a) and bool(b) and difflib.SequenceMatcher(None, a, b).ratio() >= 0.9)
+
+
+def join_split_text(top: str, bottom: str, max_overlap_lines: int = 12) -> str:
+    """Join the OCR text of the two halves from `split_image_base64`.
+
+    Lines in the overlap band are read twice. The longest run of trailing
+    `top` lines that matches the leading `bottom` lines (ignoring whitespace
+    and small OCR differences) is kept only once.
+    """
+    top_lines = top.strip().splitlines()
+    bottom_lines = bottom.strip().splitlines()
+    overlap = 0
+    for k in range(min(max_overlap_lines, len(top_lines), len(bottom_lines)), 0, -1):
+        pairs = list(zip(top_lines[-k:], bottom_lines[:k]))
+        if any(a.strip() for a, _ in pairs) and all(_same_line(a, b) for a, b in pairs):
+            overlap = k
+            break
+    return "\n".join(top_lines + bottom_lines[overlap:])
+
+
+class PageRenderPool:
+    """Route page renders to single-process executors with document affinity."""
+
+    def __init__(
+        self,
+        workers: int,
+        renderer: str = DEFAULT_RENDERER,
+        pages_per_chunk: int = 16,
+        max_open_documents: int = 8,
+    ):
+        if renderer not in RENDERERS:
+            raise ValueError(f"Unsupported renderer {renderer!r}; expected one of {RENDERERS}")
+        ctx = multiprocessing.get_context("spawn")
+        self.renderer = renderer
+        self.pages_per_chunk = max(1, int(pages_per_chunk))
+        self._executors = [
+            ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=ctx,
+                initializer=_init_worker,
+                initargs=(max_open_documents,),
+            )
+            for _ in range(max(1, int(workers)))
+        ]
+
+    def __len__(self) -> int:
+        return len(self._executors)
+
+    def _executor_for(self, pdf_path: str, page: int) -> ProcessPoolExecutor:
+        key = f"{pdf_path}:{(page - 1) // self.pages_per_chunk}"
+        return self._executors[zlib.crc32(key.encode("utf-8")) % len(self._executors)]
+
+    async def render(
+        self,
+        pdf_path: str | Path,
+        page: int,
+        target_longest_image_dim: int,
+        encoding: ImageEncoding = PNG,
+    ) -> tuple[str, float]:
+        """Return the base64 image for a page and the seconds spent rendering it."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor_for(str(pdf_path), page),
+            _render_page_base64,
+            str(pdf_path),
+            page,
+            target_longest_image_dim,
+            encoding,
+            self.renderer,
+        )
+
+    def close(self) -> None:
+        for executor in self._executors:
+            executor.shutdown(wait=True, cancel_futures=True)
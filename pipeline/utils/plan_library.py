@@ -0,0 +1,213 @@
+"""Reuse segmentation plans across contracts with the same header conventions.
+
+Renewals and contracts between the same parties tend to use identical header
+styles (`ARTICLE 12 - SENIORITY`, `Section 4.` ...), so the plan the planning
+model wrote for one of them usually works for the others. Each document is
+fingerprinted by the *shapes* of its header-like lines in the planning prefix:
+the leading keyword with numbers folded to `#`, e.g. `article #` or `#.`.
+
+When a plan is stored, the library records which shapes its regex rules
+actually hit in the source document. A later document can reuse the plan
+only when it has at least `min_lines` lines of those shapes and the rules hit
+at least `min_hit_rate` of them. Candidates are tried in order of fingerprint
+similarity. The index is a JSON file, written atomically:
+
+    {"version": 1, "plans": {"<fingerprint key>": {"document_id": "document_8",
+     "shapes": {"article #": 31, ...}, "matched_shapes": ["article #"],
+     "plan": {...}, "reuses": 4}}}
+"""
+
+from __future__ import annotations
+
+import bisect
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable
+
+LIBRARY_VERSION = 1
+
+_KEYWORD_RE = re.compile(
+    r"^(article|section|part|chapter|appendix|schedule|exhibit|addendum|annex|attachment|"
+    r"rule|title|clause|division|subpart|memorandum|letter)\b[\s.:]*([0-9]+|[ivxlc]+|[a-z])?\b",
+    re.IGNORECASE,
+)
+_NUMBERED_RE = re.compile(r"^([0-9]{1,3}|[IVXLC]{1,6})([.)])(\d+[.)]?)?\s+[A-Z]")
+
+
+@dataclass
+class HeaderLine:
+    start: int
+    end: int
+    shape: str
+
+
+def header_lines(text: str, max_length: int = 100) -> list[HeaderLine]:
+    """Return short header-like lines with their normalized shapes."""
+    lines = []
+    offset = 0
+    for raw in text.splitlines(keepends=True):
+        line = raw.strip()
+        start, offset = offset, offset + len(raw)
+        if not 2 < len(line) <= max_length:
+            continue
+        match = _KEYWORD_RE.match(line)
+        if match is not None:
+            shape = match.group(1).lower() + (" #" if match.group(2) else "")
+        else:
+            match = _NUMBERED_RE.match(line)
+            if match is None:
+                continue
+            shape = "#" + match.group(2) + ("#" if match.group(3) else "")
+        lines.append(HeaderLine(start=start, end=start + len(raw.rstrip("\r\n")), shape=shape))
+    return lines
+
+
+def fingerprint(lines: list[HeaderLine]) -> Counter:
+    return Counter(line.shape for line in lines)
+
+
+def fingerprint_key(shapes: Counter) -> str:
+    """Stable key over the recurring shapes, ignoring one-off lines."""
+    recurring = sorted(shape for shape, count in shapes.items() if count >= 2)
+    return hashlib.sha1("\n".join(recurring).encode("utf-8")).hexdigest()[:16]
+
+
+def _similarity(a: Counter, b: Counter) -> float:
+    keys = set(a) | set(b)
+    if not keys:
+        return 0.0
+    return sum(min(a[k], b[k]) for k in keys) / sum(max(a[k], b[k]) for k in keys)
+
+
+def _hit_counts(lines: list[HeaderLine], spans: list[tuple[int, int]]) -> Counter:
+    """Per shape, how many header lines contain the start of a matched span."""
+    starts = [start for start, _ in spans]
+    hits: Counter = Counter()
+    for line in lines:
+        i = bisect.bisect_left(starts, line.start)
+        if i < len(starts) and starts[i] < line.end:
+            hits[line.shape] += 1
+    return hits
+
+
+class PlanLibrary:
+    """Thread-safe, JSON-backed index from header fingerprints to plans."""
+
+    def __init__(
+        self,
+        library_path: str | Path,
+        min_hit_rate: float = 0.9,
+        min_lines: int = 3,
+        max_tries: int = 3,
+    ):
+        self.library_path = Path(library_path)
+        self.min_hit_rate = min_hit_rate
+        self.min_lines = min_lines
+        self.max_tries = max_tries
+        self.entries: dict[str, dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        if not self.library_path.exists():
+            return
+        try:
+            data = json.loads(self.library_path.read_text(encoding="utf-8"))
+        except Exception:
+            return
+        if isinstance(data, dict) and data.get("version") == LIBRARY_VERSION:
+            self.entries = data.get("plans", {})
+
+    def save(self) -> None:
+        with self._lock:
+            self._save()
+
+    def _save(self) -> None:
+        self.library_path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {"version": LIBRARY_VERSION, "plans": self.entries}
+        tmp_path = self.library_path.with_name(f"{self.library_path.name}.tmp")
+        tmp_path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+        os.replace(tmp_path, self.library_path)
+
+    def _accepts(self, entry: dict[str, Any], lines: list[HeaderLine], hits: Counter) -> float | None:
+        """Hit rate of the entry's rules on its matched shapes, or None if too low."""
+        relevant = [line for line in lines if line.shape in entry["matched_shapes"]]
+        if len(relevant) < self.min_lines:
+            return None
+        hit = sum(hits[shape] for shape in entry["matched_shapes"])
+        rate = hit / len(relevant)
+        return rate if rate >= self.min_hit_rate else None
+
+    def lookup(
+        self,
+        text: str,
+        match: Callable[[str, list[str]], list[tuple[int, int]]],
+    ) -> tuple[dict[str, Any], str, float] | None:
+        """Return (plan, source document id, hit rate) for the best reusable plan.
+
+        `text` is the planning prefix and `match(text, rules)` returns the
+        candidate spans the segmentation runner would use.
+        """
+        lines = header_lines(text)
+        shapes = fingerprint(lines)
+        if not lines:
+            return None
+        key = fingerprint_key(shapes)
+        with self._lock:
+            ranked = sorted(
+                self.entries.items(),
+                key=lambda item: (item[0] != key, -_similarity(shapes, Counter(item[1]["shapes"]))),
+            )
+        for entry_key, entry in ranked[:self.max_tries]:
+            if entry_key != key and _similarity(shapes, Counter(entry["shapes"])) == 0:
+                break
+            hits = _hit_counts(lines, match(text, entry["plan"].get("segment_header_rules", [])))
+            rate = self._accepts(entry, lines, hits)
+            if rate is not None:
+                # Reuse counts are persisted with the next add() or save().
+                with self._lock:
+                    entry["reuses"] = entry.get("reuses", 0) + 1
+                return entry["plan"], entry["document_id"], rate
+        return None
+
+    def add(
+        self,
+        document_id: str,
+        text: str,
+        plan: dict[str, Any],
+        match: Callable[[str, list[str]], list[tuple[int, int]]],
+    ) -> bool:
+        """Store a planner-written plan if its rules reliably hit this document's headers."""
+        lines = header_lines(text)
+        shapes = fingerprint(lines)
+        if not lines:
+            return False
+        key = fingerprint_key(shapes)
+        with self._lock:
+            if key in self.entries:
+                return False
+        hits = _hit_counts(lines, match(text, plan.get("segment_header_rules", [])))
+        matched_shapes = sorted(
+            shape for shape, count in shapes.items()
+            if count >= self.min_lines and hits[shape] / count >= self.min_hit_rate
+        )
+        if not matched_shapes:
+            return False
+        with self._lock:
+            if key in self.entries:
+                return False
+            self.entries[key] = {
+                "document_id": document_id,
+                "shapes": dict(shapes),
+                "matched_shapes": matched_shapes,
+                "plan": plan,
+                "reuses": 0,
+            }
+            self._save()
+        return True
@@ -0,0 +1,159 @@
+"""Content-addressed on-disk cache of rendered PDF page images.
+
+Entries are keyed by (PDF SHA-256, page number, render size, renderer, image
+format), so re-running OCR with a different model or prompt reuses the
+rasterized pages instead of rendering them again. The size component is the
+longest side in pixels for the OCR stage, or a label such as "200dpi" for
+DPI-based renderers. The renderer component names the rasterizer and its
+version (see `pdf_render.renderer_id`), since pdftoppm and pdfium images
+differ.
+
+The cache is capped in bytes and evicts least-recently-used entries; a hit
+refreshes the entry's mtime, which is what the LRU order is rebuilt from when
+a new process opens the directory.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable
+
+
+class RenderCache:
+    """Thread-safe LRU cache of page images stored under `cache_dir`."""
+
+    def __init__(self, cache_dir: str | Path, max_bytes: int = 20 * 1024**3):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max(0, int(max_bytes))
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._index: OrderedDict[Path, int] | None = None
+        self._total_bytes = 0
+        self._pdf_hashes: dict[tuple[str, int, int], str] = {}
+
+    def pdf_sha256(self, pdf_path: str | Path) -> str:
+        """Hash a PDF once per (path, size, mtime) seen by this process."""
+        path = Path(pdf_path).resolve()
+        stat = path.stat()
+        memo_key = (str(path), stat.st_size, stat.st_mtime_ns)
+        digest = self._pdf_hashes.get(memo_key)
+        if digest is None:
+            with path.open("rb") as f:
+                digest = hashlib.file_digest(f, "sha256").hexdigest()
+            self._pdf_hashes[memo_key] = digest
+        return digest
+
+    def _entry_path(self, pdf_path: str | Path, page: int, size: int | str, fmt: str, renderer: str) -> Path:
+        digest = self.pdf_sha256(pdf_path)
+        renderer = re.sub(r"[^A-Za-z0-9.-]+", "-", renderer)
+        return self.cache_dir / digest[:2] / f"{digest}_p{int(page):05d}_{size}_{renderer}.{fmt.lower()}"
+
+    def _ensure_index(self) -> OrderedDict[Path, int]:
+        if self._index is None:
+            entries: list[tuple[float, Path, int]] = []
+            if self.cache_dir.exists():
+                for path in self.cache_dir.glob("*/*"):
+                    if not path.is_file() or path.name.endswith(".tmp"):
+                        continue
+                    stat = path.stat()
+                    entries.append((stat.st_mtime, path, stat.st_size))
+            entries.sort(key=lambda e: e[0])
+            self._index = OrderedDict((path, size) for _, path, size in entries)
+            self._total_bytes = sum(self._index.values())
+        return self._index
+
+    def get(
+        self, pdf_path: str | Path, page: int, size: int | str, fmt: str = "png", *, renderer: str
+    ) -> bytes | None:
+        path = self._entry_path(pdf_path, page, size, fmt, renderer)
+        with self._lock:
+            index = self._ensure_index()
+            if path not in index:
+                self.misses += 1
+                return None
+            index.move_to_end(path)
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._forget(path)
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(
+        self,
+        pdf_path: str | Path,
+        page: int,
+        size: int | str,
+        data: bytes,
+        fmt: str = "png",
+        *,
+        renderer: str,
+    ) -> None:
+        if len(data) > self.max_bytes:
+            return
+        path = self._entry_path(pdf_path, page, size, fmt, renderer)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            index = self._ensure_index()
+            self._forget(path)
+            index[path] = len(data)
+            self._total_bytes += len(data)
+            self._evict()
+
+    def get_or_render(
+        self,
+        pdf_path: str | Path,
+        page: int,
+        size: int | str,
+        render: Callable[[], bytes],
+        fmt: str = "png",
+        *,
+        renderer: str,
+    ) -> bytes:
+        """Return the cached image, rendering and storing it on a miss."""
+        data = self.get(pdf_path, page, size, fmt, renderer=renderer)
+        if data is None:
+            data = render()
+            self.put(pdf_path, page, size, data, fmt, renderer=renderer)
+        return data
+
+    def _forget(self, path: Path) -> None:
+        size = self._index.pop(path, None) if self._index is not None else None
+        if size is not None:
+            self._total_bytes -= size
+
+    def _evict(self) -> None:
+        while self._index and self._total_bytes > self.max_bytes:
+            path, size = self._index.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._index or {}),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,187 @@
+"""Read segment text by span from segmentation outputs.
+
+Segmentation writes each document's `full_text.txt` and, in
+`document_meta.json`, the exact `[start, end, length]` character span of every
+segment. `SegmentStore` memory-maps `full_text.txt` once per document and
+serves segments as slices of it, instead of opening one `segment_*.txt` file
+per segment. ASCII text (most OCR output) is sliced directly by span. For other
+text, the character spans are converted to byte offsets in one pass.
+
+Documents without spans (older outputs, or flat `document_*/segment_*.txt`
+layouts) fall back to the segment files, so callers never need to check
+which layout is on disk:
+
+    store = SegmentStore(cache_dir / "02_segmentation_output" / "dol_archive")
+    for ref, text in store.iter_segments():
+        ...
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator
+
+_DOCUMENT_RE = re.compile(r"document_(\d+)")
+_SEGMENT_FILE_RE = re.compile(r"segment_(\d+)\.txt")
+_NON_ASCII_RE = re.compile(rb"[\x80-\xff]")
+
+
+@dataclass(frozen=True)
+class SegmentRef:
+    """One segment of a document; offsets are characters in `full_text.txt`."""
+
+    document_id: str
+    number: int
+    start: int
+    end: int
+    path: Path
+
+    @property
+    def name(self) -> str:
+        return f"segment_{self.number}.txt"
+
+
+def _document_num(document_id: str) -> int:
+    m = _DOCUMENT_RE.fullmatch(document_id)
+    return int(m.group(1)) if m else 10**12
+
+
+class SegmentDocument:
+    """A document's segments backed by a memory-mapped `full_text.txt`."""
+
+    def __init__(self, doc_dir: Path, segments: list[SegmentRef], use_spans: bool):
+        self.doc_dir = doc_dir
+        self.segments = segments
+        self._file = None
+        self._mm: mmap.mmap | None = None
+        self._byte_spans: dict[int, tuple[int, int]] = {}
+        if use_spans:
+            self._open_full_text()
+
+    def _open_full_text(self) -> None:
+        self._file = (self.doc_dir / "full_text.txt").open("rb")
+        if self._file.seek(0, 2) == 0:
+            self._byte_spans = {ref.number: (0, 0) for ref in self.segments}
+            return
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if _NON_ASCII_RE.search(self._mm) is None:
+            self._byte_spans = {ref.number: (ref.start, ref.end) for ref in self.segments}
+            return
+
+        # Walk the segment boundaries in order, encoding only the text between them.
+        text = str(self._mm, "utf-8", "replace")
+        boundaries = sorted({pos for ref in self.segments for pos in (ref.start, ref.end)})
+        byte_offsets: dict[int, int] = {}
+        prev_char = prev_byte = 0
+        for pos in boundaries:
+            prev_byte += len(text[prev_char:pos].encode("utf-8"))
+            prev_char = pos
+            byte_offsets[pos] = prev_byte
+        self._byte_spans = {
+            ref.number: (byte_offsets[ref.start], byte_offsets[ref.end]) for ref in self.segments
+        }
+
+    def view(self, ref: SegmentRef) -> memoryview:
+        """Zero-copy UTF-8 bytes of a span-backed segment; release before `close()`."""
+        if ref.number not in self._byte_spans:
+            raise KeyError(f"{ref.document_id} segment {ref.number} is not span-backed")
+        start, end = self._byte_spans[ref.number]
+        return memoryview(self._mm)[start:end] if self._mm is not None else memoryview(b"")
+
+    def text(self, ref: SegmentRef) -> str:
+        if ref.number not in self._byte_spans:
+            return ref.path.read_text(encoding="utf-8", errors="replace")
+        with self.view(ref) as view:
+            return str(view, "utf-8", "replace")
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> SegmentDocument:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class SegmentStore:
+    """Segments of every document under a segmentation output directory."""
+
+    def __init__(self, segmentation_dir: str | Path):
+        self.segmentation_dir = Path(segmentation_dir)
+
+    def document_ids(self) -> list[str]:
+        """`document_<n>` directories in document-number order."""
+        if not self.segmentation_dir.is_dir():
+            return []
+        ids = [
+            p.name for p in self.segmentation_dir.iterdir()
+            if p.is_dir() and _DOCUMENT_RE.fullmatch(p.name)
+        ]
+        return sorted(ids, key=_document_num)
+
+    def _span_segments(self, document_id: str) -> list[SegmentRef] | None:
+        doc_dir = self.segmentation_dir / document_id
+        meta_path = doc_dir / "document_meta.json"
+        if not meta_path.exists() or not (doc_dir / "full_text.txt").exists():
+            return None
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            raw_segments = meta.get("segments") or {}
+            refs = [
+                SegmentRef(
+                    document_id=document_id,
+                    number=int(number),
+                    start=int(entry["span"][0]),
+                    end=int(entry["span"][1]),
+                    path=doc_dir / "segments" / f"segment_{int(number)}.txt",
+                )
+                for number, entry in raw_segments.items()
+            ]
+        except (ValueError, KeyError, TypeError, IndexError):
+            return None
+        return sorted(refs, key=lambda ref: ref.number) or None
+
+    def _file_segments(self, document_id: str) -> list[SegmentRef]:
+        doc_dir = self.segmentation_dir / document_id
+        seg_dir = doc_dir / "segments"
+        base = seg_dir if seg_dir.exists() else doc_dir
+        refs = []
+        for p in base.glob("segment_*.txt"):
+            m = _SEGMENT_FILE_RE.fullmatch(p.name)
+            if m and p.is_file():
+                refs.append(SegmentRef(document_id, int(m.group(1)), 0, 0, p))
+        return sorted(refs, key=lambda ref: ref.number)
+
+    def segments(self, document_id: str) -> list[SegmentRef]:
+        """Segment references in segment order, without reading any text."""
+        return self._span_segments(document_id) or self._file_segments(document_id)
+
+    def open(self, document_id: str) -> SegmentDocument:
+        spans = self._span_segments(document_id)
+        if spans is not None:
+            return SegmentDocument(self.segmentation_dir / document_id, spans, use_spans=True)
+        return SegmentDocument(
+            self.segmentation_dir / document_id, self._file_segments(document_id), use_spans=False
+        )
+
+    def iter_segments(
+        self,
+        document_ids: Iterable[str] | None = None,
+        max_segments: int | None = None,
+    ) -> Iterator[tuple[SegmentRef, str]]:
+        """Yield (ref, text) corpus-wide in document then segment order."""
+        for document_id in self.document_ids() if document_ids is None else document_ids:
+            with self.open(document_id) as doc:
+                refs = doc.segments if max_segments is None else doc.segments[:max(0, int(max_segments))]
+                for ref in refs:
+                    yield ref, doc.text(ref)
@@ -1,8 +1,15 @@
 import asyncio
+import fcntl
+import hashlib
+import json
 import os
 import datetime as dt
+import signal
 import subprocess
 import sys
+import time
+import uuid
+from contextlib import contextmanager
 from openai import AsyncOpenAI
 from dotenv import load_dotenv
 from pathlib import Path
@@ -11,23 +18,125 @@ from pipeline.utils.transformers_compat import register_qwen35_compat
 
 load_dotenv()
 
+DAEMON_IDLE_TIMEOUT = 15 * 60
+REAPER_INTERVAL = 30
+
+
+def presets_path() -> Path:
+    """Named engine-argument presets, shared by every run on this cache."""
+    return Path(os.environ.get("CACHE_DIR")) / "vllm_presets.json"
+
+
+def load_presets() -> dict[str, dict]:
+    path = presets_path()
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def load_preset(name: str, model_name: str | None = None) -> dict:
+    """Return a preset saved by the serving-parameter sweep.
+
+    With `model_name`, the preset must have been tuned for that model.
+    """
+    presets = load_presets()
+    if name not in presets:
+        raise KeyError(f"Unknown vLLM preset {name!r}; known presets: {sorted(presets)}")
+    preset = presets[name]
+    if model_name is not None and preset.get("model") != model_name:
+        raise ValueError(
+            f"vLLM preset {name!r} was tuned for {preset.get('model')!r}, not {model_name!r}"
+        )
+    return preset
+
+
+def save_preset(name: str, model_name: str, engine_args: dict, metrics: dict | None = None) -> Path:
+    path = presets_path()
+    presets = load_presets()
+    presets[name] = {
+        "model": model_name,
+        "engine_args": engine_args,
+        "metrics": metrics or {},
+        "saved_at": dt.datetime.now().isoformat(timespec="seconds"),
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    tmp_path.write_text(json.dumps(presets, indent=2), encoding="utf-8")
+    os.replace(tmp_path, path)
+    return path
+
+
+def engine_args_to_cli(engine_args: dict) -> list[str]:
+    """Turn {"max_num_seqs": 128, "enable_prefix_caching": False} into vLLM flags."""
+    flags: list[str] = []
+    for key, value in engine_args.items():
+        flag = "--" + key.replace("_", "-")
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            flags.append(flag if value else "--no-" + flag[2:])
+        else:
+            flags.extend([flag, str(value)])
+    return flags
+
+
+def _pid_alive(pid: int | None) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
 class VLLMServer:
-    
+    """Launch (or, in daemon mode, share) a `vllm serve` process.
+
+    By default the server is a child of the caller and `close()` stops it.
+    With `daemon=True` the server is registered under
+    `$CACHE_DIR/vllm_daemons/` keyed by model and serving config: `start()`
+    attaches to a live server with the same key instead of loading the model
+    again, each attached runner holds a lease, and `close()` only drops that
+    lease. A detached reaper stops the server once it has had no leases for
+    `idle_timeout` seconds.
+    """
+
     def __init__(
         self,
         model_name: str,
         port: int = 8000,
         max_model_len: int = 16384,
+        cuda_visible_devices: str | None = None,
+        daemon: bool = False,
+        idle_timeout: float = DAEMON_IDLE_TIMEOUT,
+        engine_args: dict | None = None,
+        preset: str | None = None,
     ):
-        
+
         self.model_name = model_name
+        # Extra `vllm serve` engine arguments; explicit ones override the preset's.
+        self.engine_args = dict(load_preset(preset, model_name)["engine_args"]) if preset else {}
+        self.engine_args.update(engine_args or {})
         self.port = port
         self.max_model_len = max_model_len
+        self.cuda_visible_devices = cuda_visible_devices
+        self.daemon = daemon
+        self.idle_timeout = idle_timeout
         self.server = None
         self.client = None
-        
+        self.attached = False
+        self._lease_id: str | None = None
+
         self.log_dir = Path(os.environ.get("LOG_DIR"))
         self.cache_dir = Path(os.environ.get("CACHE_DIR"))
+        self.registry_dir = self.cache_dir / "vllm_daemons"
+
+    @property
+    def base_url(self) -> str:
+        return f"http://localhost:{self.port}/v1"
 
     def _validate_model_dependencies(self) -> None:
         if not self.model_name.startswith("Qwen/Qwen3.5"):
@@ -52,22 +161,29 @@ class VLLMServer:
             "`pip install --upgrade \"git+https://github.com/huggingface/transformers.git\"` "
             "or switch `--vllm-model` to a model family supported by your current transformers install."
         )
-        
-    def start(self):
-        self._validate_model_dependencies()
-        
-        cmd = [
+
+    def _serve_args(self) -> list[str]:
+        """Engine arguments that define what the server is (everything but the port)."""
+        return [
+            self.model_name,
+            "--dtype", "bfloat16",
+            "--max-model-len", str(self.max_model_len),
+            "--trust-remote-code",
+            *engine_args_to_cli(self.engine_args),
+        ]
+
+    def _build_command(self) -> list[str]:
+        return [
             sys.executable,
             "-m",
             "vllm",
             "serve",
-            self.model_name,
+            *self._serve_args(),
             "--port", str(self.port),
-            "--dtype", "bfloat16",
-            "--max-model-len", str(self.max_model_len),
-            "--trust-remote-code",
+            "--download_dir", os.environ["XDG_CACHE_HOME"],
         ]
-        
+
+    def _build_env(self) -> dict[str, str]:
         env = os.environ.copy()
         env["VLLM_CACHE_ROOT"] = os.environ["XDG_CACHE_HOME"]
         env["VLLM_ASSETS_CACHE"] = os.environ["XDG_CACHE_HOME"]
@@ -83,27 +199,48 @@ class VLLMServer:
         env["PYTHONPATH"] = os.pathsep.join(
             [str(repo_root), env["PYTHONPATH"]] if env.get("PYTHONPATH") else [str(repo_root)]
         )
-        cmd.extend(["--download_dir", os.environ["XDG_CACHE_HOME"]])
-        
-        time = dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        if self.cuda_visible_devices is not None:
+            env["CUDA_VISIBLE_DEVICES"] = self.cuda_visible_devices
+        return env
+
+    def _launch(self, detached: bool = False) -> subprocess.Popen:
+        time_str = dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         log_file = open(
-            self.log_dir / f"vllm_server_{self.model_name.replace('/', '_')}_{time}.log", 
+            self.log_dir / f"vllm_server_{self.model_name.replace('/', '_')}_{self.port}_{time_str}.log",
             "w"
         )
-        self.server = subprocess.Popen(
-            cmd, stdout=log_file, stderr=log_file,
-            env=env
+        # A detached server gets its own session so it outlives this process
+        # and can be stopped as a group by the reaper.
+        return subprocess.Popen(
+            self._build_command(), stdout=log_file, stderr=log_file,
+            env=self._build_env(),
+            start_new_session=detached,
         )
-        
+
+    def start(self):
+        self._validate_model_dependencies()
+
+        if self.daemon:
+            self._attach_or_launch()
+        else:
+            self.server = self._launch()
+            print("Started VLLM server with model:", self.model_name)
+
         self.client = AsyncOpenAI(
             api_key="EMPTY",
-            base_url=f"http://localhost:{self.port}/v1",
+            base_url=self.base_url,
         )
-        
-        print("Started VLLM server with model:", self.model_name)
         asyncio.run(self._wait())
-        print(f"VLLM server is ready at http://localhost:{self.port}/v1")
-        
+        print(f"VLLM server is ready at {self.base_url}")
+
+    def _server_alive(self) -> bool:
+        if self.server is not None:
+            return self.server.poll() is None
+        if self.attached:
+            record = self._read_record()
+            return record is not None and _pid_alive(record.get("pid"))
+        return True
+
     async def _wait(self, timeout=3600):
         """
         Poll the server until it responds to health checks.
@@ -121,19 +258,133 @@ class VLLMServer:
                 await self.client.models.list()
                 break
             except Exception as e:
+                if not self._server_alive():
+                    self.close()
+                    raise RuntimeError("VLLM server exited before becoming ready") from e
                 if dt.datetime.now().timestamp() - start > timeout:
                     self.close()
                     raise RuntimeError(
                         f"VLLM server did not start within {timeout/60:.1f} minutes"
                     ) from e
                 await asyncio.sleep(1)
-        
-        
+
+    # ------------------------------------------------------------------
+    # Daemon registry
+    # ------------------------------------------------------------------
+
+    @property
+    def daemon_key(self) -> str:
+        config = {"serve_args": self._serve_args(), "cuda_visible_devices": self.cuda_visible_devices}
+        if self.cuda_visible_devices is None:
+            # Unpinned replicas of one config differ only by port; without it they
+            # would all attach to whichever replica started first.
+            config["port"] = self.port
+        digest = hashlib.sha1(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+        return f"{self.model_name.replace('/', '_')}_{digest}"
+
+    @property
+    def record_path(self) -> Path:
+        return self.registry_dir / f"{self.daemon_key}.json"
+
+    @contextmanager
+    def _registry_lock(self):
+        self.registry_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.registry_dir / f"{self.daemon_key}.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_record(self) -> dict | None:
+        try:
+            return json.loads(self.record_path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _write_record(self, record: dict) -> None:
+        tmp_path = self.record_path.with_name(f"{self.record_path.name}.tmp")
+        tmp_path.write_text(json.dumps(record, indent=2), encoding="utf-8")
+        os.replace(tmp_path, self.record_path)
+
+    @staticmethod
+    def _prune_leases(record: dict) -> None:
+        leases = record.setdefault("leases", {})
+        for lease_id in [k for k, v in leases.items() if not _pid_alive(v.get("pid"))]:
+            del leases[lease_id]
+            record["last_release"] = time.time()
+
+    def _attach_or_launch(self) -> None:
+        self._lease_id = uuid.uuid4().hex
+        lease = {"pid": os.getpid(), "since": time.time()}
+        with self._registry_lock():
+            record = self._read_record()
+            if record is not None and _pid_alive(record.get("pid")):
+                self._prune_leases(record)
+                record["leases"][self._lease_id] = lease
+                self._write_record(record)
+                self.port = record["port"]
+                self.attached = True
+                print(
+                    f"Attached to running VLLM daemon for {self.model_name} "
+                    f"(pid {record['pid']}, {len(record['leases'])} lease(s))"
+                )
+                return
+
+            self.server = self._launch(detached=True)
+            self._write_record({
+                "key": self.daemon_key,
+                "model": self.model_name,
+                "pid": self.server.pid,
+                "port": self.port,
+                "serve_args": self._serve_args(),
+                "cuda_visible_devices": self.cuda_visible_devices,
+                "idle_timeout": self.idle_timeout,
+                "started_at": time.time(),
+                "last_release": time.time(),
+                "leases": {self._lease_id: lease},
+            })
+            self._spawn_reaper()
+            print(f"Started VLLM daemon with model: {self.model_name} (idle timeout {self.idle_timeout:.0f}s)")
+
+    def _spawn_reaper(self) -> None:
+        subprocess.Popen(
+            [sys.executable, "-m", "pipeline.utils.vllm_server", "--reap", str(self.record_path)],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            env=self._build_env(),
+            cwd=Path(__file__).resolve().parents[2],
+            start_new_session=True,
+        )
+
+    def _release(self) -> None:
+        with self._registry_lock():
+            record = self._read_record()
+            if record is not None:
+                record.get("leases", {}).pop(self._lease_id, None)
+                record["last_release"] = time.time()
+                self._write_record(record)
+                remaining = len(record["leases"])
+                print(
+                    f"Released VLLM daemon lease ({remaining} remaining; "
+                    f"idle shutdown after {record.get('idle_timeout', self.idle_timeout):.0f}s)"
+                )
+        self._lease_id = None
+
     def close(self):
-        
+
+        if self.daemon:
+            if self._lease_id is not None:
+                self._release()
+            # The daemon outlives this runner; the reaper decides when it stops.
+            self.server = None
+            self.client = None
+            self.attached = False
+            return
+
         if self.server is not None:
             self.server.terminate()
-            
+
             try:
                 self.server.wait(timeout=10)
             except subprocess.TimeoutExpired:
@@ -142,6 +393,79 @@ class VLLMServer:
             self.client = None
             print("VLLM server has been stopped.")
 
+
+def _stop_daemon(record: dict) -> None:
+    pid = record.get("pid")
+    if not _pid_alive(pid):
+        return
+    try:
+        os.killpg(pid, signal.SIGTERM)
+    except ProcessLookupError:
+        return
+    deadline = time.time() + 30
+    while time.time() < deadline and _pid_alive(pid):
+        time.sleep(1)
+    if _pid_alive(pid):
+        os.killpg(pid, signal.SIGKILL)
+
+
+def reap(record_path: Path, interval: float = REAPER_INTERVAL) -> None:
+    """Stop a daemon once it has held no leases for its idle timeout."""
+    lock_path = record_path.with_suffix(".lock")
+    while True:
+        time.sleep(interval)
+        with open(lock_path, "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                try:
+                    record = json.loads(record_path.read_text(encoding="utf-8"))
+                except (FileNotFoundError, json.JSONDecodeError):
+                    return
+                if not _pid_alive(record.get("pid")):
+                    record_path.unlink(missing_ok=True)
+                    return
+                VLLMServer._prune_leases(record)
+                idle_for = time.time() - record.get("last_release", 0)
+                if not record["leases"] and idle_for >= record.get("idle_timeout", DAEMON_IDLE_TIMEOUT):
+                    _stop_daemon(record)
+                    record_path.unlink(missing_ok=True)
+                    return
+                tmp_path = record_path.with_name(f"{record_path.name}.tmp")
+                tmp_path.write_text(json.dumps(record, indent=2), encoding="utf-8")
+                os.replace(tmp_path, record_path)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def stop_registered_daemon(registry_dir: Path, key: str) -> dict | None:
+    """Stop the daemon registered under `key`; return its record, or None if there was none."""
+    registry_dir.mkdir(parents=True, exist_ok=True)
+    record_path = registry_dir / f"{key}.json"
+    with open(registry_dir / f"{key}.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            try:
+                record = json.loads(record_path.read_text(encoding="utf-8"))
+            except (FileNotFoundError, json.JSONDecodeError):
+                return None
+            _stop_daemon(record)
+            record_path.unlink(missing_ok=True)
+            return record
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def list_daemons(registry_dir: Path) -> list[dict]:
+    records = []
+    for path in sorted(registry_dir.glob("*.json")):
+        try:
+            record = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            continue
+        record["alive"] = _pid_alive(record.get("pid"))
+        records.append(record)
+    return records
+
 def main():
 
     parser = argparse.ArgumentParser(description="Run a vLLM server interactively.")
@@ -159,13 +483,64 @@ def main():
         default=16384,
         help="Context length for vLLM",
     )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Start (or attach to) a shared daemon that outlives this process",
+    )
+    parser.add_argument(
+        "--idle-timeout",
+        type=float,
+        default=DAEMON_IDLE_TIMEOUT,
+        help="Seconds a daemon with no attached runners stays up",
+    )
+    parser.add_argument("--preset", type=str, default=None,
+                        help="Named engine-argument preset saved by the serving-parameter sweep")
+    parser.add_argument("--list", action="store_true", help="List registered vLLM daemons and exit")
+    parser.add_argument("--stop", nargs="?", const="", default=None, metavar="KEY",
+                        help="Stop the daemon with this registry key (see --list), or the one "
+                             "registered for --model/--port/--max-model-len, and exit")
+    parser.add_argument("--reap", type=Path, default=None, help=argparse.SUPPRESS)
     args = parser.parse_args()
 
-    server = VLLMServer(
-        args.model,
-        port=args.port,
-        max_model_len=args.max_model_len,
-    )
+    if args.reap is not None:
+        reap(args.reap)
+        return
+
+    if args.list:
+        registry_dir = Path(os.environ.get("CACHE_DIR")) / "vllm_daemons"
+        for record in list_daemons(registry_dir):
+            print(
+                f"{record['key']}: model={record['model']} port={record['port']} pid={record['pid']} "
+                f"alive={record['alive']} leases={len(record.get('leases', {}))}"
+            )
+        return
+
+    if args.model is None and not args.stop:
+        parser.error("--model is required unless --list or --stop KEY is given")
+
+    if args.stop is not None and args.model is None:
+        registry_dir = Path(os.environ.get("CACHE_DIR")) / "vllm_daemons"
+        key = args.stop
+    else:
+        server = VLLMServer(
+            args.model,
+            port=args.port,
+            max_model_len=args.max_model_len,
+            daemon=args.daemon,
+            idle_timeout=args.idle_timeout,
+            preset=args.preset,
+        )
+        registry_dir, key = server.registry_dir, args.stop or server.daemon_key
+
+    if args.stop is not None:
+        record = stop_registered_daemon(registry_dir, key)
+        if record is None:
+            print(f"No daemon registered under {key} (see --list).")
+            return
+        print(f"Stopped VLLM daemon {record['key']}.")
+        return
+
     server.start()
 
     try:
@@ -1847,6 +1847,9 @@ def _load_gab_segment_rankings_csv(gab_root: Path):
                         "text_char_count": _to_int(row.get("text_char_count", 0)),
                         "is_truncated": str(row.get("is_truncated", "")).strip().lower() in truthy,
                         "segment_path": str(row.get("segment_path", "")).strip(),
+                        "full_text_path": str(row.get("full_text_path", "") or "").strip(),
+                        "segment_start": _to_int(row.get("segment_start", 0)),
+                        "segment_end": _to_int(row.get("segment_end", 0)),
                     }
                 )
     except Exception:
@@ -2084,11 +2087,17 @@ def _render_gab_clause_type_segment_examples(
             st.rerun()
 
         segment_text_path = _resolve_gab_segment_text_path(row, segmentation_root)
+        span = None
+        if segment_text_path is None:
+            full_text_path = Path(str(row.get("full_text_path", "") or "")).expanduser()
+            if str(row.get("full_text_path", "") or "").strip() and full_text_path.exists():
+                segment_text_path = full_text_path
+                span = (_to_int(row.get("segment_start", 0)), _to_int(row.get("segment_end", 0)))
         if segment_text_path is None:
             st.info("Segment source text file not found.")
             continue
 
-        preview = _load_text_preview(segment_text_path, max_chars=2200)
+        preview = _load_text_preview(segment_text_path, max_chars=2200, span=span)
         st.code(str(preview.get("text", "")))
         if bool(preview.get("truncated")):
             st.caption("Preview truncated to first 2,200 characters.")
@@ -2096,10 +2105,12 @@ def _render_gab_clause_type_segment_examples(
 
 
 @st.cache_data(show_spinner=False)
-def _load_text_preview(path: Path, max_chars: int = 7000):
+def _load_text_preview(path: Path, max_chars: int = 7000, span: tuple[int, int] | None = None):
     if not path.exists():
         return {"text": "", "char_count": 0, "truncated": False}
     text = path.read_text(encoding="utf-8", errors="replace")
+    if span is not None:
+        text = text[span[0]:span[1]]
     return {
         "text": text[:max_chars],
         "char_count": len(text),
@@ -0,0 +1,81 @@
+"""End-to-end check of the segmentation stage's async pipeline with stubbed LLM clients."""
+
+import asyncio
+import importlib.util
+import json
+from pathlib import Path
+from types import SimpleNamespace
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+_spec = importlib.util.spec_from_file_location("segment_runner", ROOT_DIR / "pipeline" / "02_segment" / "runner.py")
+segment_runner = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(segment_runner)
+
+PLAN = {
+    "segment_type": "Article",
+    "segment_header_examples": ["ARTICLE 1"],
+    "segment_header_rules": [r"ARTICLE \d+"],
+}
+
+
+def _response(payload: dict) -> SimpleNamespace:
+    message = SimpleNamespace(content=json.dumps(payload))
+    return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop")])
+
+
+class _PlanningClient:
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=lambda **request: _response(PLAN)))
+
+
+class _BoundaryClient:
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **request):
+        self.calls += 1
+        await asyncio.sleep(0)
+        return _response({"is_new_segment": True})
+
+    async def close(self):
+        pass
+
+
+def test_run_async_segments_every_document(tmp_path, capsys, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    input_dir = tmp_path / "01_ocr_output" / "dol_archive"
+    for doc in range(3):
+        doc_dir = input_dir / f"document_{doc}"
+        doc_dir.mkdir(parents=True)
+        (doc_dir / "page_1.txt").write_text("Preamble\nARTICLE 1\nRecognition\n")
+        (doc_dir / "page_2.txt").write_text("ARTICLE 2\nWages\nARTICLE 3\nHours\n")
+
+    runner = segment_runner.SegmentationRunner(
+        cache_dir=str(tmp_path),
+        input_dir=Path("01_ocr_output") / "dol_archive",
+        output_dir=Path("02_segmentation_output") / "dol_archive",
+        planning_model="planner",
+        planning_perc=0.5,
+        boundary_model="boundary",
+        boundary_padding=20,
+        provider="openai",
+        boundary_concurrency=2,
+        planning_concurrency=2,
+        plan_reuse=False,
+        llm_cache=False,
+    )
+    runner.client = _PlanningClient()
+    runner.async_client = boundary_client = _BoundaryClient()
+
+    runner.run(cached_only=False)
+
+    out = capsys.readouterr().out
+    assert "Segmented 3/3 documents" in out
+    assert "failed" not in out
+    assert boundary_client.calls == 9
+    for doc in range(3):
+        meta = json.loads(
+            (tmp_path / "02_segmentation_output" / "dol_archive" / f"document_{doc}" / "document_meta.json").read_text()
+        )
+        assert len(meta["segments"]) == 4